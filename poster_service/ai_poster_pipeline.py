@@ -8,26 +8,40 @@ Complete end-to-end pipeline that:
 """
 
 import os
+import re
 import sys
+import time
+import queue
 import logging
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from dataclasses import asdict, dataclass
 
 # Add services directory to path
 sys.path.append(str(Path(__file__).parent / 'services'))
 
-from services.replicate import FloridaMapGenerator, MapStyle
-from services.poster import FloridaSurfBreakPosterService, PosterStyle, MapBounds
+from services.backends import GeneratorBackend, create_backend
+from services.replicate import FloridaMapGenerator, GeneratedTemplate, MapStyle, load_environment
+from services.poster import DecodedTemplate, FloridaSurfBreakPosterService, PosterStyle, MapBounds, output_format
+from services.catalog import POSTER, TEMPLATE, AssetCatalog
+from services.content_cache import ContentCache, hash_inputs
+from services.storage import StorageManager
+from services.manifest import CollectionManifest
+from services.resilience import RetryBudget
+from services.metrics import serve_from_environment, write_from_environment
+from services.tracing import configure_from_environment, span
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
+def file_slug(name: str, default: str) -> str:
+    """Reduce a user-supplied name to lowercase letters, digits and underscores for use in file names"""
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_') or default
+
+
 @dataclass
 class PosterConfig:
     """Configuration for a poster generation job"""
@@ -39,6 +53,15 @@ class PosterConfig:
     height: int = 1024
 
 
+@dataclass
+class OverlayVariant:
+    """One overlay rendered onto a shared map template"""
+    poster_style: PosterStyle
+    title: Optional[str] = None
+    bounds: Optional[MapBounds] = None
+    name: Optional[str] = None  # output file suffix, the poster style by default
+
+
 class AIPosterPipeline:
     """
     Complete AI-powered poster generation pipeline.
@@ -58,25 +81,73 @@ class AIPosterPipeline:
         MapStyle.BOTANICAL: PosterStyle.CLASSIC,   # Use classic overlay for botanical
     }
     
-    def __init__(self, replicate_api_token: Optional[str] = None):
+    # Disk space for cached AI templates before the least recently used are evicted
+    TEMPLATE_CACHE_BYTES = 2 << 30
+    
+    # Disk space for saved templates and finished posters, and seconds between eviction passes
+    TEMPLATES_DIR_BYTES = 4 << 30
+    POSTERS_DIR_BYTES = 16 << 30
+    STORAGE_INTERVAL = 60.0
+    
+    # Posters rendered at once during a collection, and templates waiting for them
+    RENDER_CONCURRENCY = 2
+    TEMPLATE_QUEUE_SIZE = 4
+    
+    def __init__(self, replicate_api_token: Optional[str] = None,
+                 backend: Optional[GeneratorBackend] = None,
+                 base_dir: str = ".",
+                 data_path: Optional[str] = None,
+                 manage_storage: bool = True):
         """
         Initialize the AI poster pipeline.
         
         Args:
             replicate_api_token: Replicate API token for AI generation
+            backend: Map generator backend, chosen by POSTER_GENERATOR_BACKEND by default
+            base_dir: Directory the template, poster and cache directories are created in
+            data_path: Surf break JSON data file, the poster service's default if None
+            manage_storage: Evict least recently used templates and posters in the background
+                to keep each directory within its budget
         """
         try:
-            # Initialize map generator
-            self.map_generator = FloridaMapGenerator(api_token=replicate_api_token)
+            # Create directories
+            self.templates_dir = Path(base_dir) / "ai_generated_templates"
+            self.output_dir = Path(base_dir) / "ai_generated_posters"
+            self.cache_dir = Path(base_dir) / ".poster_cache"
+            
+            # Initialize map generator, reusing templates generated from identical inputs
+            self.map_generator = FloridaMapGenerator(
+                api_token=replicate_api_token,
+                template_cache=ContentCache(self.cache_dir / "templates", max_bytes=self.TEMPLATE_CACHE_BYTES,
+                                            suffix=".png"),
+                backend=backend
+            )
             
             # Initialize poster service
-            self.poster_service = FloridaSurfBreakPosterService()
+            poster_options = {'data_path': data_path} if data_path else {}
+            self.poster_service = FloridaSurfBreakPosterService(
+                output_cache=ContentCache(self.cache_dir / "posters", suffix=".png"),
+                **poster_options
+            )
+            self.templates_dir.mkdir(parents=True, exist_ok=True)
+            self.output_dir.mkdir(parents=True, exist_ok=True)
             
-            # Create directories
-            self.templates_dir = Path("ai_generated_templates")
-            self.output_dir = Path("ai_generated_posters")
-            self.templates_dir.mkdir(exist_ok=True)
-            self.output_dir.mkdir(exist_ok=True)
+            # Every template and poster written is recorded here
+            self.catalog = AssetCatalog(self.cache_dir / "catalog.sqlite3")
+            
+            # Keeps the template, poster and cache directories within their budgets
+            self.storage = StorageManager(self.catalog, interval=self.STORAGE_INTERVAL)
+            self.storage.add_budget(self.templates_dir, self.TEMPLATES_DIR_BYTES)
+            self.storage.add_budget(self.output_dir, self.POSTERS_DIR_BYTES)
+            self.storage.add_cache(self.map_generator.template_cache)
+            self.storage.add_cache(self.poster_service.output_cache)
+            if manage_storage:
+                self.storage.start()
+            
+            # Templates are written to disk in the background while posters render
+            self._template_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="template-writer")
+            self._pending_writes: List[Future] = []
+            self._writes_lock = threading.Lock()
             
             logger.info("AI Poster Pipeline initialized successfully")
             
@@ -91,11 +162,17 @@ class AIPosterPipeline:
         output_name: Optional[str] = None,
         width: int = 1024,
         height: int = 1024,
-        model: str = 'flux-schnell'
+        model: str = 'flux-schnell',
+        force_regenerate: bool = False,
+        retry_budget: Optional[RetryBudget] = None,
+        persist_template: bool = True
     ) -> str:
         """
         Generate a complete poster from scratch using AI.
         
+        The downloaded template is decoded once and rendered from memory;
+        writing it to the templates directory happens in the background.
+        
         Args:
             ai_style: AI map style to generate
             poster_title: Title for the poster
@@ -103,6 +180,9 @@ class AIPosterPipeline:
             width: Image width in pixels
             height: Image height in pixels
             model: AI model to use for map generation
+            force_regenerate: Generate a new map template even if one is cached
+            retry_budget: Retries for transient AI errors, shared with the rest of a collection
+            persist_template: Also save the map template (see flush_template_writes)
             
         Returns:
             str: Path to the generated poster
@@ -112,42 +192,116 @@ class AIPosterPipeline:
         
         logger.info(f"🎨 Starting AI poster generation: {ai_style.value}")
         
-        try:
-            # Step 1: Generate AI map template
-            logger.info("📍 Generating AI map template...")
-            template_path = self.templates_dir / f"template_{ai_style.value}.png"
-            
-            map_path = self.map_generator.generate_map_template(
-                style=ai_style,
-                width=width,
-                height=height,
-                model=model,
-                save_path=str(template_path)
-            )
+        poster_style = self.STYLE_MAPPINGS[ai_style]
+        with span('pipeline.generate_single_poster', style=ai_style.value,
+                  poster_style=poster_style.value, model=model, width=width, height=height):
+            try:
+                # Step 1: Generate AI map template
+                logger.info("📍 Generating AI map template...")
+                template_path = self.templates_dir / f"template_{ai_style.value}.png"
+                
+                with span('pipeline.template', style=ai_style.value, model=model):
+                    template = self.map_generator.generate_map_bytes(
+                        style=ai_style,
+                        width=width,
+                        height=height,
+                        model=model,
+                        force_regenerate=force_regenerate,
+                        retry_budget=retry_budget
+                    )
+                
+                logger.info(f"✅ AI map template generated: {template_path}")
+                
+                # Step 2: Apply surf break overlays
+                logger.info("🏄‍♂️ Adding surf break markers and labels...")
+                return self._render_poster(template, template_path, poster_style, poster_title,
+                                           self.output_dir / f"{output_name}.png", persist_template)
+                    
+            except Exception as e:
+                logger.error(f"Error generating {ai_style.value} poster: {e}")
+                raise
+    
+    def generate_poster_variants(
+        self,
+        ai_style: MapStyle,
+        variants: List[OverlayVariant],
+        output_prefix: Optional[str] = None,
+        width: int = 1024,
+        height: int = 1024,
+        model: str = 'flux-schnell',
+        force_regenerate: bool = False,
+        retry_budget: Optional[RetryBudget] = None,
+        persist_template: bool = True,
+        render_concurrency: Optional[int] = None
+    ) -> Dict[str, str]:
+        """
+        Render many overlays onto one AI map template.
+        
+        The template is generated once and decoded once. The variants render
+        from it in parallel, each with its own poster style, bounds and title,
+        so a single paid generation yields a whole set of posters.
+        
+        Args:
+            ai_style: AI map style to generate
+            variants: Overlays to render onto the template
+            output_prefix: Poster file name prefix (ai_poster_<style> by default)
+            width: Image width in pixels
+            height: Image height in pixels
+            model: AI model to use for map generation
+            force_regenerate: Generate a new map template even if one is cached
+            retry_budget: Retries for transient AI errors
+            persist_template: Also save the map template (see flush_template_writes)
+            render_concurrency: Variants rendered at once (RENDER_CONCURRENCY)
             
-            logger.info(f"✅ AI map template generated: {map_path}")
+        Returns:
+            Dict mapping variant names to poster paths; failed variants are logged and left out
             
-            # Step 2: Apply surf break overlays
-            logger.info("🏄‍♂️ Adding surf break markers and labels...")
-            poster_style = self.STYLE_MAPPINGS[ai_style]
-            final_poster_path = self.output_dir / f"{output_name}.png"
+        Raises:
+            ValueError: If two variants have the same name
+        """
+        names = [variant.name or variant.poster_style.value for variant in variants]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Variant names must be unique, got {names}; name the variants explicitly")
+        output_prefix = output_prefix or f"ai_poster_{ai_style.value}"
+        workers = max(1, min(render_concurrency or self.RENDER_CONCURRENCY, len(variants) or 1))
+        
+        logger.info(f"🎨 Rendering {len(variants)} overlays onto one {ai_style.value} template")
+        
+        with span('pipeline.generate_poster_variants', style=ai_style.value, model=model,
+                  variants=len(variants), width=width, height=height) as variants_span:
+            with span('pipeline.template', style=ai_style.value, model=model):
+                template = self.map_generator.generate_map_bytes(
+                    style=ai_style,
+                    width=width,
+                    height=height,
+                    model=model,
+                    force_regenerate=force_regenerate,
+                    retry_budget=retry_budget
+                )
+            template_path = self.templates_dir / f"template_{ai_style.value}.png"
+            # Shared by every render, which leaves its base image unmodified
+            map_image = self._decode_template(template, template_path, persist_template)
             
-            success = self.poster_service.generate_poster(
-                map_image_path=map_path,
-                output_path=str(final_poster_path),
-                style=poster_style,
-                title=poster_title
-            )
+            posters = {}
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="overlay-renderer") as pool:
+                futures = {
+                    pool.submit(contextvars.copy_context().run, self._render_overlay, map_image, template,
+                                variant.poster_style, variant.title, variant.bounds,
+                                self.output_dir / f"{output_prefix}_{name}.png"): name
+                    for name, variant in zip(names, variants)
+                }
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        posters[name] = future.result()
+                        logger.info(f"✅ {name} overlay completed")
+                    except Exception as e:
+                        logger.error(f"❌ Failed to render {name} overlay: {e}")
             
-            if success:
-                logger.info(f"🎉 Complete AI poster generated: {final_poster_path}")
-                return str(final_poster_path)
-            else:
-                raise Exception("Failed to generate poster overlay")
-                
-        except Exception as e:
-            logger.error(f"Error generating {ai_style.value} poster: {e}")
-            raise
+            variants_span.set_attributes(posters_generated=len(posters))
+        
+        logger.info(f"🎉 Rendered {len(posters)} of {len(variants)} overlays from one template")
+        return {name: posters[name] for name in names if name in posters}
     
     def generate_poster_collection(
         self,
@@ -155,17 +309,38 @@ class AIPosterPipeline:
         styles_to_generate: Optional[List[MapStyle]] = None,
         width: int = 1024,
         height: int = 1024,
-        model: str = 'flux-schnell'
+        model: str = 'flux-schnell',
+        force_regenerate: bool = False,
+        generation_concurrency: Optional[int] = None,
+        render_concurrency: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        resume: bool = True
     ) -> Dict[MapStyle, str]:
         """
         Generate a complete collection of posters in different AI styles.
         
+        Templates are generated and downloaded by one pool of workers and
+        rendered by another, connected by a bounded queue, so rendering one
+        poster overlaps generating the next. A collection takes about as long
+        as the slower of the two stages rather than their sum.
+        
+        Each job's progress is checkpointed in a manifest next to the posters.
+        A rerun of the same collection skips posters that are already done and
+        renders from templates that are already saved, for every job whose
+        inputs are unchanged.
+        
         Args:
             collection_name: Base name for the collection
             styles_to_generate: List of styles to generate (defaults to all)
             width: Image width in pixels
             height: Image height in pixels
             model: AI model to use
+            force_regenerate: Generate new map templates even if they are cached
+            generation_concurrency: Templates generated at once (the generator's DEFAULT_CONCURRENCY)
+            render_concurrency: Posters rendered at once (RENDER_CONCURRENCY)
+            queue_size: Generated templates waiting for a renderer before generation pauses
+                (TEMPLATE_QUEUE_SIZE)
+            resume: Continue from the manifest of an earlier run of this collection
             
         Returns:
             Dict mapping styles to their generated poster paths
@@ -177,30 +352,132 @@ class AIPosterPipeline:
         logger.info(f"📊 Styles to generate: {[s.value for s in styles_to_generate]}")
         
         generated_posters = {}
+        # Transient AI errors may be retried this often across the whole collection
+        retry_budget = RetryBudget(self.map_generator.RETRIES_PER_STYLE * len(styles_to_generate))
+        generation_workers = max(1, min(generation_concurrency or self.map_generator.DEFAULT_CONCURRENCY,
+                                        len(styles_to_generate) or 1))
+        render_workers = max(1, min(render_concurrency or self.RENDER_CONCURRENCY,
+                                    len(styles_to_generate) or 1))
+        # Holds encoded templates, so a slow renderer bounds the memory in use
+        templates: queue.Queue = queue.Queue(maxsize=queue_size or self.TEMPLATE_QUEUE_SIZE)
+        results_lock = threading.Lock()
+        manifest = CollectionManifest(self.manifest_path(collection_name))
         
-        for ai_style in styles_to_generate:
+        def generate(ai_style: MapStyle, cache_key: str, saved_template: Optional[Path]) -> None:
+            logger.info(f"\n🖼️  Processing {ai_style.value} style...")
             try:
-                logger.info(f"\n🖼️  Processing {ai_style.value} style...")
-                
-                poster_title = f"{collection_name} - {ai_style.value.title()} Edition"
-                output_name = f"collection_{ai_style.value}_poster"
-                
-                poster_path = self.generate_single_poster(
-                    ai_style=ai_style,
-                    poster_title=poster_title,
-                    output_name=output_name,
-                    width=width,
-                    height=height,
-                    model=model
-                )
-                
-                generated_posters[ai_style] = poster_path
-                logger.info(f"✅ {ai_style.value.title()} poster completed")
-                
+                if saved_template is not None:
+                    logger.info(f"♻️  Reusing saved {ai_style.value} template: {saved_template}")
+                    template = GeneratedTemplate(saved_template.read_bytes(), ai_style.value, cache_key, {},
+                                                 cached=True)
+                else:
+                    with span('pipeline.template', style=ai_style.value, model=model):
+                        template = self.map_generator.generate_map_bytes(
+                            style=ai_style,
+                            width=width,
+                            height=height,
+                            model=model,
+                            force_regenerate=force_regenerate,
+                            retry_budget=retry_budget
+                        )
             except Exception as e:
                 logger.error(f"❌ Failed to generate {ai_style.value} poster: {e}")
-                continue
+                manifest.record_error(ai_style.value, e)
+                return
+            # Blocks while the queue is full, until a renderer catches up
+            templates.put((ai_style, template, saved_template is None, time.perf_counter()))
         
+        def render() -> None:
+            while True:
+                item = templates.get()
+                if item is None:
+                    return
+                ai_style, template, persist, queued_at = item
+                job_id = ai_style.value
+                try:
+                    with span('pipeline.render', style=job_id,
+                              queue_seconds=time.perf_counter() - queued_at):
+                        poster_path = self._render_poster(
+                            template,
+                            self.templates_dir / f"template_{job_id}.png",
+                            self.STYLE_MAPPINGS[ai_style],
+                            f"{collection_name} - {job_id.title()} Edition",
+                            self.output_dir / f"collection_{job_id}_poster.png",
+                            persist_template=persist,
+                            on_persisted=lambda path, job_id=job_id: manifest.record(
+                                job_id, CollectionManifest.TEMPLATE, template=path)
+                        )
+                    manifest.record(job_id, CollectionManifest.OVERLAY)
+                    manifest.record(job_id, CollectionManifest.EXPORTED, poster=poster_path)
+                    with results_lock:
+                        generated_posters[ai_style] = poster_path
+                    logger.info(f"✅ {job_id.title()} poster completed")
+                except Exception as e:
+                    logger.error(f"❌ Failed to generate {job_id} poster: {e}")
+                    manifest.record_error(job_id, e)
+        
+        with span('pipeline.generate_poster_collection', collection=collection_name,
+                  styles=len(styles_to_generate), model=model, generation_workers=generation_workers,
+                  render_workers=render_workers) as collection_span:
+            # Find what earlier runs finished
+            jobs = []
+            for ai_style in styles_to_generate:
+                job_id = ai_style.value
+                poster_title = f"{collection_name} - {job_id.title()} Edition"
+                cache_key = self.map_generator.style_template_key(ai_style, width, height, model)
+                inputs_hash = self.job_inputs_hash(cache_key, self.STYLE_MAPPINGS[ai_style], poster_title)
+                stage = manifest.start_job(job_id, inputs_hash, reset=force_regenerate or not resume)
+                
+                if stage == CollectionManifest.EXPORTED:
+                    poster_path = manifest.artifact(job_id, 'poster')
+                    if poster_path is not None:
+                        self.catalog.touch(poster_path)
+                        generated_posters[ai_style] = str(poster_path)
+                        logger.info(f"⏭️  {job_id.title()} poster already done: {poster_path}")
+                        continue
+                saved_template = None
+                if stage != CollectionManifest.PENDING:
+                    saved_template = manifest.artifact(job_id, 'template')
+                if saved_template is not None:
+                    self.catalog.touch(saved_template)
+                jobs.append((ai_style, cache_key, saved_template))
+            
+            resumed_templates = sum(1 for _, _, saved_template in jobs if saved_template is not None)
+            collection_span.set_attributes(resumed_posters=len(generated_posters),
+                                           resumed_templates=resumed_templates)
+            if generated_posters or resumed_templates:
+                logger.info(f"♻️  Resuming {collection_name}: {len(generated_posters)} posters done, "
+                            f"{resumed_templates} templates saved")
+            
+            # Run each worker in a copy of this context so its spans nest under the collection
+            renderers = [
+                threading.Thread(target=contextvars.copy_context().run, args=(render,),
+                                 name=f"poster-renderer-{i}", daemon=True)
+                for i in range(render_workers)
+            ]
+            for renderer in renderers:
+                renderer.start()
+            # Saved templates stay on disk until their posters are rendered from them
+            saved_templates = [saved_template for _, _, saved_template in jobs if saved_template is not None]
+            try:
+                with self.storage.pinned(saved_templates), \
+                        ThreadPoolExecutor(max_workers=generation_workers,
+                                           thread_name_prefix="template-generator") as generators:
+                    for job in jobs:
+                        generators.submit(contextvars.copy_context().run, generate, *job)
+            finally:
+                for _ in renderers:
+                    templates.put(None)
+                for renderer in renderers:
+                    renderer.join()
+                # Checkpoint the templates still being written before returning
+                self.flush_template_writes()
+            
+            collection_span.set_attributes(posters_generated=len(generated_posters),
+                                           retries_left=retry_budget.remaining)
+        
+        generated_posters = {style: generated_posters[style]
+                             for style in styles_to_generate if style in generated_posters}
         logger.info(f"\n🎉 Collection complete! Generated {len(generated_posters)} posters")
         return generated_posters
     
@@ -212,7 +489,9 @@ class AIPosterPipeline:
         poster_style: PosterStyle = PosterStyle.CLASSIC,
         width: int = 1024,
         height: int = 1024,
-        model: str = 'flux-schnell'
+        model: str = 'flux-schnell',
+        force_regenerate: bool = False,
+        persist_template: bool = True
     ) -> str:
         """
         Generate a poster with a custom AI map prompt.
@@ -225,6 +504,8 @@ class AIPosterPipeline:
             width: Image width in pixels
             height: Image height in pixels
             model: AI model to use
+            force_regenerate: Generate a new map template even if one is cached
+            persist_template: Also save the map template (see flush_template_writes)
             
         Returns:
             str: Path to the generated poster
@@ -235,63 +516,203 @@ class AIPosterPipeline:
             # Step 1: Generate custom AI map
             template_path = self.templates_dir / f"custom_{output_name}_template.png"
             
-            map_path = self.map_generator.generate_custom_map(
-                custom_prompt=custom_prompt,
-                style_name=output_name,
-                width=width,
-                height=height,
-                model=model,
-                save_path=str(template_path)
-            )
+            with span('pipeline.template', style=output_name, model=model, custom=True):
+                template = self.map_generator.generate_custom_map_bytes(
+                    custom_prompt=custom_prompt,
+                    style_name=output_name,
+                    width=width,
+                    height=height,
+                    model=model,
+                    force_regenerate=force_regenerate
+                )
             
-            logger.info(f"✅ Custom AI map generated: {map_path}")
+            logger.info(f"✅ Custom AI map generated: {template_path}")
             
             # Step 2: Apply surf break overlays
-            final_poster_path = self.output_dir / f"custom_{output_name}.png"
-            
-            success = self.poster_service.generate_poster(
-                map_image_path=map_path,
-                output_path=str(final_poster_path),
-                style=poster_style,
-                title=poster_title
-            )
-            
-            if success:
-                logger.info(f"🎉 Custom poster completed: {final_poster_path}")
-                return str(final_poster_path)
-            else:
-                raise Exception("Failed to generate custom poster overlay")
+            return self._render_poster(template, template_path, poster_style, poster_title,
+                                       self.output_dir / f"custom_{output_name}.png", persist_template)
                 
         except Exception as e:
             logger.error(f"Error generating custom poster: {e}")
             raise
     
+    def _render_poster(self, template: GeneratedTemplate, template_path: Path, poster_style: PosterStyle,
+                       poster_title: str, final_poster_path: Path, persist_template: bool,
+                       on_persisted: Optional[Callable[[str], None]] = None) -> str:
+        """Decode a generated template and render the poster overlay onto it"""
+        map_image = self._decode_template(template, template_path, persist_template, on_persisted)
+        poster_path = self._render_overlay(map_image, template, poster_style, poster_title, None,
+                                           final_poster_path)
+        logger.info(f"🎉 Poster completed: {poster_path}")
+        return poster_path
+    
+    def _render_overlay(self, map_image: DecodedTemplate, template: GeneratedTemplate,
+                        poster_style: PosterStyle, poster_title: Optional[str],
+                        bounds: Optional[MapBounds], output_path: Path) -> str:
+        """Render one overlay onto a decoded template and catalog the poster"""
+        start = time.perf_counter()
+        # Kept from eviction at least until it is cataloged
+        with self.storage.pinned([output_path]):
+            with span('pipeline.overlay', poster_style=poster_style.value, output=output_path.name):
+                success = self.poster_service.generate_poster(
+                    map_image_path=map_image,
+                    output_path=str(output_path),
+                    style=poster_style,
+                    custom_bounds=bounds,
+                    title=poster_title
+                )
+            if not success:
+                raise Exception("Failed to generate poster overlay")
+            
+            width, height = map_image.image.size
+            self.catalog.record(
+                output_path, POSTER,
+                inputs_hash=self.job_inputs_hash(template.cache_key, poster_style, poster_title or '', bounds,
+                                                 output_format(str(output_path))),
+                style=poster_style.value, model=template.metadata.get('model'),
+                width=width, height=height, seconds=time.perf_counter() - start
+            )
+        return str(output_path)
+    
+    def _decode_template(self, template: GeneratedTemplate, template_path: Path, persist: bool,
+                         on_persisted: Optional[Callable[[str], None]] = None) -> DecodedTemplate:
+        """Decode a generated template for rendering, queueing its write to disk"""
+        with span('pipeline.decode', bytes=len(template.data), cached=template.cached):
+            decoded = DecodedTemplate.from_bytes(template.data, source=str(template_path))
+        if persist:
+            def write() -> str:
+                path = self.map_generator.persist_template(template, str(template_path))
+                width, height = decoded.image.size
+                self.catalog.record(path, TEMPLATE, inputs_hash=template.cache_key, style=template.name,
+                                    model=template.metadata.get('model'), width=width, height=height,
+                                    seconds=template.seconds, size=len(template.data))
+                if on_persisted is not None:
+                    on_persisted(path)
+                return path
+            
+            future = self._template_writer.submit(write)
+            with self._writes_lock:
+                self._pending_writes.append(future)
+        return decoded
+    
+    def flush_template_writes(self) -> List[str]:
+        """
+        Wait for queued template writes to finish.
+        
+        Returns:
+            List of template paths written; failed writes are logged
+        """
+        with self._writes_lock:
+            pending, self._pending_writes = self._pending_writes, []
+        
+        written = []
+        for future in pending:
+            try:
+                written.append(future.result())
+            except Exception as e:
+                logger.error(f"Failed to save map template: {e}")
+        return written
+    
+    def manifest_path(self, collection_name: str) -> Path:
+        """Get the path of a collection's job manifest"""
+        return self.output_dir / f"{file_slug(collection_name, 'collection')}_manifest.json"
+    
+    def job_inputs_hash(self, template_key: str, poster_style: PosterStyle, poster_title: str,
+                        bounds: Optional[MapBounds] = None, image_format: str = 'PNG') -> str:
+        """
+        Hash everything a poster depends on, for manifests and catalog lookups.
+        
+        Args:
+            template_key: Template cache key of the poster's map template
+            poster_style: Poster overlay style
+            poster_title: Poster title
+            bounds: Custom geographic bounds, if any
+            image_format: Pillow format the poster is encoded in
+        """
+        data_path = self.poster_service.data_path
+        try:
+            stat = data_path.stat()
+            dataset = [str(data_path), stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            dataset = [str(data_path)]
+        return hash_inputs({
+            'template': template_key,
+            'poster_style': poster_style.value,
+            'title': poster_title,
+            'bounds': asdict(bounds) if bounds else None,
+            'format': image_format,
+            'dataset': dataset,
+        })
+    
+    def find_poster(self, template_key: str, poster_style: PosterStyle, poster_title: str,
+                    bounds: Optional[MapBounds] = None, image_format: str = 'PNG') -> Optional[str]:
+        """
+        Look up a poster already rendered from the given inputs.
+        
+        Returns:
+            Path to the newest such poster still on disk, or None
+        """
+        asset = self.catalog.find(POSTER, self.job_inputs_hash(template_key, poster_style, poster_title,
+                                                               bounds, image_format))
+        if asset is not None and Path(asset.path).exists():
+            self.catalog.touch(asset.path)
+            return asset.path
+        return None
+    
+    def close(self):
+        """Finish queued template writes, then shut down the writer, eviction, catalog and generator"""
+        self.flush_template_writes()
+        self._template_writer.shutdown()
+        self.storage.stop()
+        self.catalog.close()
+        self.map_generator.close()
+        self.poster_service.close()
+    
     def get_pipeline_status(self) -> Dict:
         """Get status information about the pipeline"""
+        # Pending template writes are cataloged once they land
+        self.flush_template_writes()
+        totals = self.catalog.totals()
+        templates, template_bytes = totals[TEMPLATE]
+        posters, poster_bytes = totals[POSTER]
         return {
             'templates_directory': str(self.templates_dir),
             'output_directory': str(self.output_dir),
             'available_ai_styles': [style.value for style in MapStyle],
             'available_poster_styles': [style.value for style in PosterStyle],
             'available_models': self.map_generator.get_available_models(),
-            'templates_generated': len(list(self.templates_dir.glob("*.png"))),
-            'posters_generated': len(list(self.output_dir.glob("*.png")))
+            'templates_generated': templates,
+            'posters_generated': posters,
+            'templates_bytes': template_bytes,
+            'posters_bytes': poster_bytes,
+            'storage': {directory: {'bytes': used, 'budget': budget}
+                        for directory, (used, budget) in self.storage.usage().items()},
         }
 
 
 def main():
     """Example usage of the AI Poster Pipeline"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
     
     # Check for API token
-    if not os.getenv('REPLICATE_API_TOKEN'):
+    load_environment()
+    configure_from_environment()
+    serve_from_environment()
+    backend = create_backend()
+    if backend.requires_token and not os.getenv('REPLICATE_API_TOKEN'):
         print("❌ REPLICATE_API_TOKEN environment variable is required!")
         print("Get your token at: https://replicate.com/account/api-tokens")
         print("Then run: export REPLICATE_API_TOKEN=your_token_here")
+        print("Or run offline with: export POSTER_GENERATOR_BACKEND=local")
         return
     
+    pipeline = None
     try:
         # Initialize pipeline
-        pipeline = AIPosterPipeline()
+        pipeline = AIPosterPipeline(backend=backend)
         
         print("🎨 AI-Powered Florida Surf Break Poster Pipeline")
         print("=" * 50)
@@ -348,6 +769,14 @@ def main():
         
     except Exception as e:
         print(f"❌ Pipeline Error: {e}")
+    
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+        backend.close()
+        metrics_path = write_from_environment()
+        if metrics_path:
+            print(f"📈 Metrics written to {metrics_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Poster Rendering Benchmark Suite
+
+Benchmarks FloridaSurfBreakPosterService.generate_poster on synthetic surf
+break datasets and synthetic map templates, per poster style, per background
+effect and per render stage, and the whole AIPosterPipeline on the offline
+generator backend. Each case runs in a fresh process so its peak
+RSS can be reported. Results can be saved as a JSON baseline and compared
+against one, failing when a case regresses past a threshold.
+
+Runs fully offline:
+
+    python -m benchmarks.poster_benchmark --save-baseline benchmarks/baseline.json
+    python -m benchmarks.poster_benchmark --baseline benchmarks/baseline.json --threshold 0.2
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import resource
+import statistics
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from services.poster import FloridaSurfBreakPosterService, PosterStyle
+from services.tracing import Tracer, set_tracer, summarize
+
+
+logger = logging.getLogger(__name__)
+
+
+# Benchmark matrices
+QUICK_PROFILE = {'breaks': [100, 1000], 'sizes': [1024], 'repeat': 3}
+FULL_PROFILE = {'breaks': [100, 1000, 10000, 100000], 'sizes': [1024, 2048, 4096, 8192], 'repeat': 3}
+
+# Poster styles with overlay configurations
+DEFAULT_STYLES = [PosterStyle.CLASSIC.value, PosterStyle.VINTAGE.value, PosterStyle.MINIMALIST.value]
+
+# AI styles generated per end-to-end pipeline case
+PIPELINE_STYLES = 3
+
+# Background effects benchmarked on their own
+EFFECTS = {
+    'sepia': '_apply_sepia',
+    'noise': '_add_noise',
+    'subtle_texture': '_add_subtle_texture',
+}
+
+
+@dataclass
+class BenchmarkResult:
+    """Measurements for one benchmark case"""
+    name: str
+    seconds: float  # median wall time per iteration
+    throughput: float  # megapixels per second
+    peak_rss_mb: float
+    stages: Dict[str, float] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+
+
+def make_synthetic_dataset(path: Path, count: int, seed: int = 0) -> Path:
+    """Write a synthetic surf break dataset spread along the Florida coast"""
+    rng = random.Random(seed)
+    bounds = FloridaSurfBreakPosterService.DEFAULT_BOUNDS
+    break_types = list(FloridaSurfBreakPosterService.BREAK_TYPE_COLORS)
+    breaks = [
+        {
+            'name': f"Synthetic Break {i}",
+            'latitude': rng.uniform(bounds.min_lat, bounds.max_lat),
+            'longitude': rng.uniform(bounds.min_lon, bounds.max_lon),
+            'break_type': rng.choice(break_types),
+        }
+        for i in range(count)
+    ]
+    path.write_text(json.dumps(breaks))
+    return path
+
+
+def make_synthetic_template(path: Path, size: int, seed: int = 0) -> Path:
+    """Write a synthetic square map template: textured ocean and a land mass"""
+    rng = random.Random(seed)
+    image = Image.new('RGB', (size, size), (168, 204, 232))
+    draw = ImageDraw.Draw(image)
+
+    # Irregular peninsula-like polygon
+    center_x, center_y = size * 0.6, size * 0.5
+    points = []
+    for i in range(64):
+        angle = 2 * math.pi * i / 64
+        radius = size * (0.22 + 0.08 * rng.random()) * (1.6 if math.sin(angle) > 0 else 1.0)
+        points.append((center_x + radius * math.cos(angle) * 0.6, center_y + radius * math.sin(angle)))
+    draw.polygon(points, fill=(236, 228, 200), outline=(120, 110, 90))
+
+    noise = Image.frombytes('L', (size, size), rng.randbytes(size * size))
+    image = Image.blend(image, Image.merge('RGB', (noise, noise, noise)), 0.05)
+    image.filter(ImageFilter.SMOOTH).save(path)
+    return path
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in megabytes (Linux reports KiB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_poster_case(work_dir: str, breaks: int, size: int, style: str, repeat: int) -> BenchmarkResult:
+    """Benchmark generate_poster for one dataset size, template size and style"""
+    work = Path(work_dir)
+    data_path = make_synthetic_dataset(work / f"breaks_{breaks}.json", breaks)
+    template = make_synthetic_template(work / f"template_{size}.png", size)
+    output = work / f"poster_{breaks}_{size}_{style}.png"
+
+    reports = []
+    service = FloridaSurfBreakPosterService(data_path=str(data_path), stats_hook=reports.append)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if not service.generate_poster(str(template), str(output), PosterStyle(style), title="Benchmark"):
+            raise RuntimeError(f"Render failed for {style} at {size}px with {breaks} breaks")
+        timings.append(time.perf_counter() - start)
+
+    seconds = statistics.median(timings)
+    return BenchmarkResult(
+        name=f"poster/{style}/{size}px/{breaks}breaks",
+        seconds=seconds,
+        throughput=size * size / 1e6 / seconds,
+        peak_rss_mb=_peak_rss_mb(),
+        stages={
+            stage: statistics.median(report.stages.get(stage, 0.0) for report in reports)
+            for stage in reports[0].stages
+        },
+        counters=reports[-1].counters,
+    )
+
+
+def run_effect_case(work_dir: str, effect: str, size: int, repeat: int) -> BenchmarkResult:
+    """Benchmark one background effect on a template"""
+    work = Path(work_dir)
+    data_path = make_synthetic_dataset(work / "breaks_effects.json", 10)
+    template = make_synthetic_template(work / f"template_{size}.png", size)
+    service = FloridaSurfBreakPosterService(data_path=str(data_path))
+    image = Image.open(template).convert('RGBA')
+    apply_effect = getattr(service, EFFECTS[effect])
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        apply_effect(image)
+        timings.append(time.perf_counter() - start)
+
+    seconds = statistics.median(timings)
+    return BenchmarkResult(
+        name=f"effect/{effect}/{size}px",
+        seconds=seconds,
+        throughput=size * size / 1e6 / seconds,
+        peak_rss_mb=_peak_rss_mb(),
+    )
+
+
+class _SpanCollector:
+    """Span exporter that keeps finished spans in memory"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span) -> None:
+        self.spans.append(span.to_dict())
+
+
+def run_pipeline_case(work_dir: str, styles: int, size: int, repeat: int,
+                      latency: float = 0.0) -> BenchmarkResult:
+    """Benchmark a poster collection end to end, with templates from the offline backend"""
+    from ai_poster_pipeline import AIPosterPipeline
+    from services.backends import LocalBackend
+    from services.replicate import MapStyle
+
+    work = Path(work_dir)
+    data_path = make_synthetic_dataset(work / "breaks_pipeline.json", 100)
+    ai_styles = list(MapStyle)[:styles]
+    collector = _SpanCollector()
+    previous_tracer = set_tracer(Tracer([collector]))
+
+    timings = []
+    try:
+        for iteration in range(repeat):
+            # A fresh pipeline directory per iteration, so no template or poster is cached
+            backend = LocalBackend(output_dir=str(work / f"generated_{size}_{iteration}"), latency=latency)
+            pipeline = AIPosterPipeline(backend=backend, base_dir=str(work / f"pipeline_{size}_{iteration}"),
+                                        data_path=str(data_path))
+            start = time.perf_counter()
+            posters = pipeline.generate_poster_collection("Benchmark", ai_styles, width=size, height=size)
+            timings.append(time.perf_counter() - start)
+            pipeline.close()
+            backend.close()
+            if len(posters) != len(ai_styles):
+                raise RuntimeError(f"Pipeline generated {len(posters)} of {len(ai_styles)} posters")
+    finally:
+        set_tracer(previous_tracer)
+
+    seconds = statistics.median(timings)
+    return BenchmarkResult(
+        name=f"pipeline/{styles}styles/{size}px",
+        seconds=seconds,
+        throughput=styles * size * size / 1e6 / seconds,
+        peak_rss_mb=_peak_rss_mb(),
+        stages={name: stats['total'] / repeat for name, stats in summarize(collector.spans).items()},
+    )
+
+
+def run_suite(profile: Dict, styles: List[str], work_dir: str) -> List[BenchmarkResult]:
+    """Run every case of a profile, each in a fresh process"""
+    cases = [
+        (run_poster_case, (work_dir, breaks, size, style, profile['repeat']))
+        for size in profile['sizes']
+        for breaks in profile['breaks']
+        for style in styles
+    ] + [
+        (run_effect_case, (work_dir, effect, size, profile['repeat']))
+        for size in profile['sizes']
+        for effect in EFFECTS
+    ] + [
+        (run_pipeline_case, (work_dir, PIPELINE_STYLES, size, profile['repeat'], profile.get('latency', 0.0)))
+        for size in profile['sizes']
+    ]
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for function, args in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(function, *args).result()
+        print(f"  {result.name:<45} {result.seconds * 1000:10.1f} ms "
+              f"{result.throughput:8.2f} MP/s {result.peak_rss_mb:8.1f} MB")
+        results.append(result)
+    return results
+
+
+def compare_to_baseline(results: List[BenchmarkResult], baseline: Dict[str, Dict],
+                        threshold: float) -> List[str]:
+    """
+    Compare results against a baseline.
+
+    Returns:
+        List of descriptions of cases slower than baseline * (1 + threshold)
+    """
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous is None:
+            continue
+        limit = previous['seconds'] * (1 + threshold)
+        if result.seconds > limit:
+            regressions.append(
+                f"{result.name}: {result.seconds * 1000:.1f} ms vs baseline "
+                f"{previous['seconds'] * 1000:.1f} ms (+{(result.seconds / previous['seconds'] - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark suite"""
+    parser = argparse.ArgumentParser(description="Benchmark poster rendering on synthetic data")
+    parser.add_argument('--full', action='store_true', help="Run the full size matrix (slow)")
+    parser.add_argument('--breaks', type=int, nargs='+', help="Dataset sizes to benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', help="Template sizes in pixels")
+    parser.add_argument('--styles', nargs='+', help="Poster styles to benchmark")
+    parser.add_argument('--repeat', type=int, help="Iterations per case")
+    parser.add_argument('--latency', type=float,
+                        help="Simulated AI prediction latency in seconds for pipeline cases")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare against this baseline JSON file")
+    parser.add_argument('--save-baseline', help="Save results as a baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    profile = dict(FULL_PROFILE if args.full else QUICK_PROFILE)
+    for key in ('breaks', 'sizes', 'repeat', 'latency'):
+        if getattr(args, key):
+            profile[key] = getattr(args, key)
+    styles = args.styles or DEFAULT_STYLES
+
+    print("🏁 Poster rendering benchmark")
+    print(f"📊 Breaks: {profile['breaks']}  Sizes: {profile['sizes']}  Styles: {styles}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_suite(profile, styles, work_dir)
+
+    report = {result.name: asdict(result) for result in results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            Path(path).write_text(json.dumps(report, indent=2))
+            print(f"💾 Results written to {path}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  • {regression}")
+            return 1
+        print(f"✅ No regressions beyond {args.threshold:.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
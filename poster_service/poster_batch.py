@@ -0,0 +1,629 @@
+#!/usr/bin/env python3
+"""
+Batch Poster Builds from a Job File
+
+Reads a JSON or YAML job file listing many posters and expands it into a job
+graph: one template node per distinct map template (style or custom prompt,
+model, size and seed) and one render node per poster and output profile.
+Each template is generated once and every poster using it is rendered from
+it, with separate limits for concurrent generations and renders. Renders run
+in threads, or in processes for CPU-bound catalog builds. Progress is
+streamed one line per poster, followed by a throughput report, and runs are
+checkpointed in a manifest so an interrupted build resumes where it stopped.
+
+Job file:
+
+    collection: Nightly Catalog
+    output_dir: catalog                 # base directory, "." by default
+    data: scrapers/data/florida_surf_breaks_full.json
+    limits: {generation_concurrency: 4, render_workers: 4, processes: false, queue_size: 8}
+    profiles:
+      web: {width: 1024, height: 1024, format: png}
+      print: {width: 2048, height: 2048, format: jpg}
+    defaults: {model: flux-schnell, profiles: [web]}
+    posters:
+      - name: classic_statewide
+        style: classic                  # AI map style, or a custom `prompt`
+        title: Florida Surf Breaks
+      - name: neon_space_coast
+        prompt: Neon Florida map, synthwave colors
+        poster_style: vintage           # defaults to the AI style's mapping, or classic
+        bounds: {min_lat: 27.5, max_lat: 29.0, min_lon: -81.2, max_lon: -80.2}
+        seed: 7
+        profiles: [web, print]
+
+Usage:
+    python poster_batch.py jobs.yaml --render-workers 8 --processes --report report.json
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from ai_poster_pipeline import AIPosterPipeline, file_slug
+from services.backends import create_backend
+from services.catalog import POSTER, TEMPLATE
+from services.manifest import CollectionManifest
+from services.metrics import serve_from_environment, write_from_environment
+from services.poster import DecodedTemplate, FloridaSurfBreakPosterService, MapBounds, PosterStyle, output_format
+from services.replicate import GeneratedTemplate, MapStyle, load_environment
+from services.tracing import configure_from_environment, span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILES = {'default': {'width': 1024, 'height': 1024, 'format': 'png'}}
+
+
+class JobFileError(ValueError):
+    """Job file is unreadable or describes an invalid job"""
+
+
+@dataclass
+class OutputProfile:
+    """Size and file format posters are produced in"""
+    name: str
+    width: int
+    height: int
+    format: str = 'png'
+
+
+@dataclass
+class RenderNode:
+    """One poster in one output profile"""
+    job_id: str
+    template_key: str
+    poster_style: PosterStyle
+    title: Optional[str]
+    bounds: Optional[MapBounds]
+    output_path: Path
+    inputs_hash: str = ''
+
+
+@dataclass
+class TemplateNode:
+    """One distinct map template and the posters rendered from it"""
+    key: str
+    name: str
+    model: str
+    width: int
+    height: int
+    seed: Optional[int] = None
+    style: Optional[MapStyle] = None
+    prompt: Optional[str] = None
+    renders: List[RenderNode] = field(default_factory=list)
+
+
+@dataclass
+class JobGraph:
+    """Templates to generate, each with the renders that depend on it"""
+    collection: str
+    templates: Dict[str, TemplateNode]
+
+    @property
+    def renders(self) -> List[RenderNode]:
+        return [render for node in self.templates.values() for render in node.renders]
+
+
+@dataclass
+class BatchReport:
+    """Outcome and throughput of a batch run"""
+    posters: int = 0
+    rendered: int = 0
+    resumed: int = 0
+    failed: int = 0
+    templates: int = 0
+    templates_generated: int = 0
+    templates_reused: int = 0
+    templates_shared: int = 0  # renders served by a template another render also used
+    megapixels: float = 0.0
+    generation_seconds: float = 0.0
+    render_seconds: float = 0.0
+    seconds: float = 0.0
+    failures: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def posters_per_minute(self) -> float:
+        return self.rendered / self.seconds * 60 if self.seconds > 0 else 0.0
+
+    @property
+    def megapixels_per_second(self) -> float:
+        return self.megapixels / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), 'posters_per_minute': round(self.posters_per_minute, 2),
+                'megapixels_per_second': round(self.megapixels_per_second, 3)}
+
+    def lines(self) -> List[str]:
+        """Human-readable report lines"""
+        lines = [
+            f"🖼️  Posters: {self.rendered} rendered, {self.resumed} already done, "
+            f"{self.failed} failed of {self.posters}",
+            f"🗺️  Templates: {self.templates_generated} generated, {self.templates_reused} reused, "
+            f"{self.templates_shared} renders shared a template ({self.templates} distinct)",
+            f"⏱️  {self.seconds:.1f}s wall, {self.generation_seconds:.1f}s generating, "
+            f"{self.render_seconds:.1f}s rendering",
+            f"🚀 {self.posters_per_minute:.1f} posters/min, {self.megapixels_per_second:.2f} MP/s",
+        ]
+        lines.extend(f"❌ {job_id}: {error}" for job_id, error in self.failures.items())
+        return lines
+
+
+def load_job_file(path: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Read a job file, as YAML if its extension says so and JSON otherwise.
+
+    Raises:
+        JobFileError: If the file cannot be read or parsed
+    """
+    path = Path(path)
+    try:
+        text = path.read_text(encoding='utf-8')
+    except OSError as e:
+        raise JobFileError(f"Cannot read job file {path}: {e}") from e
+
+    if path.suffix.lower() in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as e:
+            raise JobFileError("Reading YAML job files needs PyYAML: pip install pyyaml") from e
+        try:
+            spec = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise JobFileError(f"Invalid YAML in {path}: {e}") from e
+    else:
+        try:
+            spec = json.loads(text)
+        except ValueError as e:
+            raise JobFileError(f"Invalid JSON in {path}: {e}") from e
+
+    if not isinstance(spec, dict) or not isinstance(spec.get('posters'), list):
+        raise JobFileError(f"{path} must contain a mapping with a list of posters")
+    return spec
+
+
+def _profiles(spec: Dict[str, Any]) -> Dict[str, OutputProfile]:
+    """Parse the output profiles of a job file"""
+    profiles = {}
+    for name, options in (spec.get('profiles') or DEFAULT_PROFILES).items():
+        try:
+            profile = OutputProfile(name=name, width=int(options['width']), height=int(options['height']),
+                                    format=str(options.get('format', 'png')).lower().lstrip('.'))
+        except (KeyError, TypeError, ValueError) as e:
+            raise JobFileError(f"Profile {name} needs a width and height: {e}") from e
+        if profile.format not in ('png', 'jpg', 'jpeg', 'webp'):
+            raise JobFileError(f"Profile {name} has unsupported format {profile.format}")
+        profiles[name] = profile
+    return profiles
+
+
+def _enum(enum_type, value: str, what: str):
+    """Look up an enum member by value, naming the choices if there is none"""
+    try:
+        return enum_type(str(value).lower())
+    except ValueError:
+        choices = ', '.join(member.value for member in enum_type)
+        raise JobFileError(f"Unknown {what} {value!r}, expected one of: {choices}") from None
+
+
+def build_job_graph(spec: Dict[str, Any], pipeline: AIPosterPipeline) -> JobGraph:
+    """
+    Expand a job file into templates and the renders depending on them.
+
+    Posters whose templates have identical generation inputs share one
+    template node, so each distinct template is generated once.
+
+    Args:
+        spec: Parsed job file
+        pipeline: Pipeline whose generator keys templates and whose directories hold the output
+
+    Returns:
+        JobGraph: Distinct templates, each with its renders
+
+    Raises:
+        JobFileError: If a poster is invalid
+    """
+    generator = pipeline.map_generator
+    profiles = _profiles(spec)
+    defaults = spec.get('defaults') or {}
+    templates: Dict[str, TemplateNode] = {}
+    job_ids = set()
+    output_paths: Dict[Path, str] = {}
+
+    for index, poster in enumerate(spec['posters']):
+        options = {**defaults, **poster}
+        name = str(options.get('name') or options.get('style') or f"poster_{index}")
+        model = options.get('model', 'flux-schnell')
+        if model not in generator.MODELS:
+            raise JobFileError(f"Poster {name}: unknown model {model!r}")
+        if ('style' in poster) == ('prompt' in poster):
+            raise JobFileError(f"Poster {name} needs exactly one of style or prompt")
+        style = _enum(MapStyle, options['style'], 'map style') if 'style' in poster else None
+        if 'poster_style' in options:
+            poster_style = _enum(PosterStyle, options['poster_style'], 'poster style')
+        else:
+            poster_style = pipeline.STYLE_MAPPINGS[style] if style else PosterStyle.CLASSIC
+        if poster_style not in pipeline.poster_service.style_configs:
+            available = ', '.join(style.value for style in pipeline.poster_service.style_configs)
+            raise JobFileError(f"Poster {name}: poster style {poster_style.value} is not available "
+                               f"(available: {available})")
+        bounds = None
+        if options.get('bounds'):
+            try:
+                bounds = MapBounds(**{key: float(value) for key, value in options['bounds'].items()})
+            except (TypeError, ValueError) as e:
+                raise JobFileError(f"Poster {name}: invalid bounds: {e}") from e
+        seed = options.get('seed')
+        # Names come from the job file, so only their slugs reach file names
+        file_name = file_slug(name, f"poster_{index}")
+
+        for profile_name in options.get('profiles') or list(profiles):
+            if profile_name not in profiles:
+                raise JobFileError(f"Poster {name}: unknown profile {profile_name!r}")
+            profile = profiles[profile_name]
+            job_id = f"{name}/{profile.name}"
+            if job_id in job_ids:
+                raise JobFileError(f"Duplicate poster {job_id}")
+            job_ids.add(job_id)
+
+            if style is not None:
+                key = generator.style_template_key(style, profile.width, profile.height, model, seed)
+            else:
+                key = generator.custom_template_key(options['prompt'], profile.width, profile.height,
+                                                    model, seed)
+            node = templates.get(key)
+            if node is None:
+                node = templates[key] = TemplateNode(
+                    key=key, name=style.value if style else file_name, model=model,
+                    width=profile.width, height=profile.height, seed=seed,
+                    style=style, prompt=options.get('prompt'),
+                )
+            output_path = pipeline.output_dir / f"{file_name}_{file_slug(profile.name, 'profile')}.{profile.format}"
+            if output_path in output_paths:
+                raise JobFileError(f"Posters {output_paths[output_path]} and {job_id} "
+                                   f"would both be written to {output_path.name}")
+            output_paths[output_path] = job_id
+            render = RenderNode(
+                job_id=job_id, template_key=key, poster_style=poster_style,
+                title=options.get('title'), bounds=bounds, output_path=output_path,
+            )
+            render.inputs_hash = pipeline.job_inputs_hash(key, poster_style, render.title or '', bounds,
+                                                          output_format(str(render.output_path)))
+            node.renders.append(render)
+
+    return JobGraph(collection=str(spec.get('collection', 'batch')), templates=templates)
+
+
+_render_service: Optional[FloridaSurfBreakPosterService] = None
+
+
+def _init_render_process(data_path: str) -> None:
+    """Load the poster service once per render process"""
+    global _render_service
+    logging.basicConfig(level=logging.WARNING)
+    _render_service = FloridaSurfBreakPosterService(data_path=data_path)
+
+
+def _render_in_process(data: bytes, source: str, output_path: str, poster_style: PosterStyle,
+                       bounds: Optional[MapBounds], title: Optional[str]) -> float:
+    """Render a poster with this process's poster service"""
+    return render_template(_render_service, data, source, output_path, poster_style, bounds, title)
+
+
+def render_template(service: FloridaSurfBreakPosterService, template: Union[bytes, DecodedTemplate],
+                    source: str, output_path: str, poster_style: PosterStyle,
+                    bounds: Optional[MapBounds], title: Optional[str]) -> float:
+    """
+    Render a poster from a template, decoding it first if it is still encoded.
+
+    Returns:
+        float: Seconds the render took
+
+    Raises:
+        RuntimeError: If the poster could not be rendered
+    """
+    start = time.perf_counter()
+    decoded = template if isinstance(template, DecodedTemplate) else DecodedTemplate.from_bytes(template, source)
+    if not service.generate_poster(decoded, output_path, poster_style, bounds, title):
+        raise RuntimeError(f"Failed to render {output_path}")
+    return time.perf_counter() - start
+
+
+class BatchRunner:
+    """Runs a job graph with separate limits for generation and rendering"""
+
+    def __init__(self, pipeline: AIPosterPipeline, generation_concurrency: Optional[int] = None,
+                 render_workers: Optional[int] = None, processes: bool = False,
+                 queue_size: Optional[int] = None, progress: Callable[[str], None] = print):
+        """
+        Initialize the runner.
+
+        Args:
+            pipeline: Pipeline providing the map generator, poster service and directories
+            generation_concurrency: Templates generated at once (the generator's DEFAULT_CONCURRENCY)
+            render_workers: Posters rendered at once (the CPU count)
+            processes: Render in worker processes instead of threads
+            queue_size: Renders waiting for a worker before generation pauses (2 per render worker)
+            progress: Called with one line per finished poster
+        """
+        self.pipeline = pipeline
+        self.generation_concurrency = generation_concurrency or pipeline.map_generator.DEFAULT_CONCURRENCY
+        self.render_workers = render_workers or os.cpu_count() or 2
+        self.processes = processes
+        self.queue_size = queue_size or 2 * self.render_workers
+        self.progress = progress
+
+    def _render_executor(self) -> Executor:
+        if self.processes:
+            # Spawned rather than forked, since the generator threads may hold locks
+            return ProcessPoolExecutor(max_workers=self.render_workers,
+                                       mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_render_process,
+                                       initargs=(str(self.pipeline.poster_service.data_path),))
+        return ThreadPoolExecutor(max_workers=self.render_workers, thread_name_prefix="batch-render")
+
+    def _render_call(self, template: Union[bytes, DecodedTemplate], source: str,
+                     render: RenderNode) -> Tuple[Callable, tuple]:
+        args = (template, source, str(render.output_path), render.poster_style, render.bounds, render.title)
+        if self.processes:
+            return _render_in_process, args
+        return contextvars.copy_context().run, (render_template, self.pipeline.poster_service, *args)
+
+    def run(self, graph: JobGraph, force_regenerate: bool = False, resume: bool = True) -> BatchReport:
+        """
+        Generate every template and render every poster of a job graph.
+
+        Args:
+            graph: Job graph from build_job_graph
+            force_regenerate: Generate new templates even if they are cached or saved
+            resume: Skip posters an earlier run of this collection finished
+
+        Returns:
+            BatchReport: Counts, failures and throughput of the run
+        """
+        pipeline = self.pipeline
+        manifest = CollectionManifest(pipeline.manifest_path(graph.collection))
+        report = BatchReport(posters=len(graph.renders), templates=len(graph.templates))
+        lock = threading.Lock()
+        # Bounds renders queued or running, so generation pauses while rendering catches up
+        slots = threading.BoundedSemaphore(self.queue_size)
+        futures: List[Future] = []
+        submitted: Set[str] = set()
+        start = time.perf_counter()
+
+        def emit(line: str) -> None:
+            finished = report.rendered + report.resumed + report.failed
+            elapsed = time.perf_counter() - start
+            self.progress(f"[{finished}/{report.posters} {elapsed:6.1f}s] {line}")
+
+        def fail(render: RenderNode, error: BaseException) -> None:
+            manifest.record_error(render.job_id, error)
+            with lock:
+                report.failed += 1
+                report.failures[render.job_id] = str(error)
+                emit(f"❌ {render.job_id}: {error}")
+
+        def rendered(render: RenderNode, node: TemplateNode, future: Future) -> None:
+            slots.release()
+            try:
+                seconds = future.result()
+                manifest.record(render.job_id, CollectionManifest.OVERLAY)
+                manifest.record(render.job_id, CollectionManifest.EXPORTED, poster=render.output_path)
+                pipeline.catalog.record(render.output_path, POSTER, inputs_hash=render.inputs_hash,
+                                        style=render.poster_style.value, model=node.model,
+                                        width=node.width, height=node.height, seconds=seconds)
+            except Exception as e:
+                fail(render, e)
+                return
+            with lock:
+                report.rendered += 1
+                report.render_seconds += seconds
+                report.megapixels += node.width * node.height / 1e6
+                emit(f"✅ {render.job_id} ({seconds:.2f}s) → {render.output_path}")
+
+        def produce(node: TemplateNode, pending: List[RenderNode], render_pool: Executor) -> None:
+            template_path = self._template_path(node)
+            generation_start = time.perf_counter()
+            try:
+                saved = None
+                if not force_regenerate:
+                    saved = next(filter(None, (manifest.artifact(render.job_id, 'template')
+                                               for render in pending)), None)
+                if saved is not None:
+                    data, template_path = saved.read_bytes(), saved
+                    pipeline.catalog.touch(saved)
+                    reused = True
+                else:
+                    with span('batch.template', template=node.name, width=node.width, height=node.height):
+                        generated = self._generate(node, force_regenerate)
+                    pipeline.map_generator.persist_template(generated, str(template_path))
+                    pipeline.catalog.record(template_path, TEMPLATE, inputs_hash=node.key, style=node.name,
+                                            model=node.model, width=node.width, height=node.height,
+                                            seconds=generated.seconds, size=len(generated.data))
+                    data, reused = generated.data, generated.cached
+                for render in pending:
+                    manifest.record(render.job_id, CollectionManifest.TEMPLATE, template=template_path)
+                # Threads share one decoded template; processes each decode their own copy
+                template = data if self.processes else DecodedTemplate.from_bytes(data, str(template_path))
+            except Exception as e:
+                logger.error(f"Failed to generate template {node.name}: {e}")
+                for render in pending:
+                    fail(render, e)
+                return
+            with lock:
+                report.generation_seconds += time.perf_counter() - generation_start
+                if reused:
+                    report.templates_reused += 1
+                else:
+                    report.templates_generated += 1
+                report.templates_shared += len(node.renders) - 1
+
+            for index, render in enumerate(pending):
+                slots.acquire()
+                try:
+                    function, args = self._render_call(template, str(template_path), render)
+                    future = render_pool.submit(function, *args)
+                except Exception as e:
+                    # Such as a broken process pool; nothing more can be submitted to it
+                    slots.release()
+                    logger.error(f"Failed to submit renders of template {node.name}: {e}")
+                    for unsubmitted in pending[index:]:
+                        fail(unsubmitted, e)
+                    return
+                with lock:
+                    submitted.add(render.job_id)
+                    futures.append(future)
+                future.add_done_callback(lambda done, render=render: rendered(render, node, done))
+
+        with span('batch.run', collection=graph.collection, posters=report.posters,
+                  templates=report.templates, processes=self.processes) as run_span:
+            work = []
+            for node in graph.templates.values():
+                pending = []
+                for render in node.renders:
+                    stage = manifest.start_job(render.job_id, render.inputs_hash,
+                                               reset=force_regenerate or not resume)
+                    poster = None
+                    if stage == CollectionManifest.EXPORTED:
+                        poster = manifest.artifact(render.job_id, 'poster')
+                    if poster is not None:
+                        pipeline.catalog.touch(poster)
+                        report.resumed += 1
+                    else:
+                        pending.append(render)
+                if pending:
+                    work.append((node, pending))
+            if report.resumed:
+                self.progress(f"♻️  {report.resumed} of {report.posters} posters already done")
+
+            # Nothing this run reads or writes is evicted before the run ends
+            paths = [self._template_path(node) for node in graph.templates.values()]
+            paths += [render.output_path for render in graph.renders]
+            with pipeline.storage.pinned(paths), self._render_executor() as render_pool:
+                with ThreadPoolExecutor(max_workers=self.generation_concurrency,
+                                        thread_name_prefix="batch-generate") as generators:
+                    producers = [generators.submit(contextvars.copy_context().run, produce, node, pending,
+                                                   render_pool)
+                                 for node, pending in work]
+                # Renders a producer neither submitted nor failed before it crashed still count as failed
+                for (node, pending), producer in zip(work, producers):
+                    error = producer.exception()
+                    if error is None:
+                        continue
+                    logger.error(f"Producing template {node.name} failed: {error}")
+                    for render in pending:
+                        with lock:
+                            settled = render.job_id in submitted or render.job_id in report.failures
+                        if not settled:
+                            fail(render, error)
+                # Every render is submitted once the generators are done
+                wait(futures)
+
+            report.seconds = time.perf_counter() - start
+            run_span.set_attributes(rendered=report.rendered, failed=report.failed,
+                                    templates_generated=report.templates_generated)
+        return report
+
+    def _template_path(self, node: TemplateNode) -> Path:
+        """Get where a template node's template is saved"""
+        return self.pipeline.templates_dir / f"{node.name}_{node.width}x{node.height}_{node.key[:8]}.png"
+
+    def _generate(self, node: TemplateNode, force_regenerate: bool) -> GeneratedTemplate:
+        generator = self.pipeline.map_generator
+        if node.style is not None:
+            return generator.generate_map_bytes(node.style, node.width, node.height, node.model,
+                                                seed=node.seed, force_regenerate=force_regenerate)
+        return generator.generate_custom_map_bytes(node.prompt, node.name, node.width, node.height, node.model,
+                                                   seed=node.seed, force_regenerate=force_regenerate)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Build the posters of a job file"""
+    parser = argparse.ArgumentParser(description="Build Florida surf break posters from a JSON or YAML job file")
+    parser.add_argument('job_file', help="Job file listing the posters to build")
+    parser.add_argument('--output-dir', help="Base directory for templates and posters (overrides the job file)")
+    parser.add_argument('--generation-concurrency', type=int, help="Templates generated at once")
+    parser.add_argument('--render-workers', type=int, help="Posters rendered at once")
+    parser.add_argument('--processes', action='store_true', default=None,
+                        help="Render in worker processes instead of threads")
+    parser.add_argument('--queue-size', type=int, help="Renders waiting for a worker before generation pauses")
+    parser.add_argument('--force-regenerate', action='store_true', help="Generate every template anew")
+    parser.add_argument('--no-resume', action='store_true', help="Ignore posters finished by an earlier run")
+    parser.add_argument('--dry-run', action='store_true', help="Show the job graph without running it")
+    parser.add_argument('--report', help="Write the throughput report as JSON to this file")
+    parser.add_argument('--verbose', action='store_true', help="Log every pipeline step")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    load_environment()
+    configure_from_environment()
+    serve_from_environment()
+
+    try:
+        spec = load_job_file(args.job_file)
+    except JobFileError as e:
+        print(f"❌ {e}")
+        return 2
+    limits = dict(spec.get('limits') or {})
+    for key in ('generation_concurrency', 'render_workers', 'processes', 'queue_size'):
+        if getattr(args, key) is not None:
+            limits[key] = getattr(args, key)
+
+    backend = create_backend()
+    if backend.requires_token and not os.getenv('REPLICATE_API_TOKEN') and not args.dry_run:
+        print("❌ REPLICATE_API_TOKEN environment variable is required!")
+        print("Or run offline with: export POSTER_GENERATOR_BACKEND=local")
+        return 2
+
+    pipeline = AIPosterPipeline(backend=backend, base_dir=args.output_dir or spec.get('output_dir', '.'),
+                                data_path=spec.get('data'))
+    try:
+        graph = build_job_graph(spec, pipeline)
+        print(f"📋 {graph.collection}: {len(graph.renders)} posters from {len(graph.templates)} templates")
+        if args.dry_run:
+            for node in graph.templates.values():
+                print(f"  • {node.name} {node.width}x{node.height}: "
+                      f"{', '.join(render.job_id for render in node.renders)}")
+            return 0
+
+        runner = BatchRunner(
+            pipeline,
+            generation_concurrency=limits.get('generation_concurrency'),
+            render_workers=limits.get('render_workers'),
+            processes=bool(limits.get('processes')),
+            queue_size=limits.get('queue_size'),
+        )
+        report = runner.run(graph, force_regenerate=args.force_regenerate, resume=not args.no_resume)
+    except JobFileError as e:
+        print(f"❌ {e}")
+        return 2
+    finally:
+        pipeline.close()
+        backend.close()
+        metrics_path = write_from_environment()
+        if metrics_path:
+            print(f"📈 Metrics written to {metrics_path}")
+
+    print("\n📊 Batch report")
+    for line in report.lines():
+        print(f"  {line}")
+    if args.report:
+        Path(args.report).write_text(json.dumps(report.to_dict(), indent=2))
+        print(f"💾 Report written to {args.report}")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
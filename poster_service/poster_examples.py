@@ -7,6 +7,11 @@ with different styles and configurations.
 """
 
 from services.poster import FloridaSurfBreakPosterService, PosterStyle, MapBounds
+from services.content_cache import ContentCache
+
+
+# Finished posters are cached, so re-running unchanged examples is nearly free
+POSTER_CACHE = ContentCache('.poster_cache/posters', suffix='.png')
 
 
 def generate_all_styles():
@@ -18,7 +23,7 @@ def generate_all_styles():
     
     try:
         # Initialize the service
-        poster_service = FloridaSurfBreakPosterService(data_path=DATA_PATH)
+        poster_service = FloridaSurfBreakPosterService(data_path=DATA_PATH, output_cache=POSTER_CACHE)
         
         # Generate posters in different styles
         styles = [
@@ -65,7 +70,7 @@ def generate_custom_bounds_poster():
     )
     
     try:
-        poster_service = FloridaSurfBreakPosterService(data_path=DATA_PATH)
+        poster_service = FloridaSurfBreakPosterService(data_path=DATA_PATH, output_cache=POSTER_CACHE)
         
         success = poster_service.generate_poster(
             map_image_path=MAP_IMAGE_PATH,
@@ -109,7 +114,7 @@ def batch_generate_posters():
     ]
     
     try:
-        poster_service = FloridaSurfBreakPosterService()
+        poster_service = FloridaSurfBreakPosterService(output_cache=POSTER_CACHE)
         
         for config in configurations:
             print(f"🎨 Generating {config['style'].value} poster...")
@@ -5,17 +5,32 @@ Extracts surf break data from surf-forecast.com for AI poster generation
 
 import requests
 from bs4 import BeautifulSoup
+import sys
 import json
 import time
 import re
+from pathlib import Path
 from urllib.parse import urljoin
 import logging
 from typing import List, Dict, Optional
 
+# Add the poster service directory to path for the shared services
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from services.metrics import BYTE_BUCKETS, counter, histogram, write_from_environment
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Metrics
+REQUESTS = counter('scraper_requests_total', "Break page requests by outcome", ['outcome'])
+REQUEST_SECONDS = histogram('scraper_request_seconds', "Break page request latency")
+PAGE_BYTES = histogram('scraper_page_bytes', "Size of downloaded break pages", buckets=BYTE_BUCKETS)
+BYTES_DOWNLOADED = counter('scraper_bytes_downloaded_total', "Bytes of break pages downloaded")
+PARSE_FAILURES = counter('scraper_parse_failures_total', "Break pages that could not be parsed")
+BREAKS_EXTRACTED = counter('scraper_breaks_extracted_total', "Surf breaks extracted")
+
 class FloridaSurfScraper:
     def __init__(self):
         self.base_url = "https://www.surf-forecast.com"
@@ -73,8 +88,12 @@ class FloridaSurfScraper:
         """
         try:
             logger.info(f"Scraping: {break_name}")
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+            with REQUEST_SECONDS.time():
+                response = self.session.get(url, timeout=10)
+                response.raise_for_status()
+            REQUESTS.inc(outcome='ok')
+            BYTES_DOWNLOADED.inc(len(response.content))
+            PAGE_BYTES.observe(len(response.content))
             
             soup = BeautifulSoup(response.content, 'html.parser')
             
@@ -219,14 +238,17 @@ class FloridaSurfScraper:
                 break_info['name'] = break_info['name'].replace('-', ' ').replace('_', ' ').title()
             
             logger.info(f"Extracted: {break_info['name']} ({break_info['break_type']}) in {break_info['region']}")
+            BREAKS_EXTRACTED.inc()
             
             return break_info
             
         except requests.RequestException as e:
             logger.error(f"Error fetching {url}: {e}")
+            REQUESTS.inc(outcome='error')
             return None
         except Exception as e:
             logger.error(f"Error parsing {url}: {e}")
+            PARSE_FAILURES.inc()
             return None
     
     def scrape_all_breaks(self, html_file_path: str, max_breaks: Optional[int] = None) -> List[Dict]:
@@ -366,6 +388,10 @@ def main():
             logger.info("Scraping stopped by user.")
     else:
         logger.error("Test scraping failed. Please check the issues above.")
+    
+    metrics_path = write_from_environment()
+    if metrics_path:
+        logger.info(f"Metrics written to {metrics_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Map Generator Backends
+
+FloridaMapGenerator hands predictions to a backend:
+
+- ReplicateBackend runs them on Replicate (needs REPLICATE_API_TOKEN).
+- LocalBackend needs no network or token. It synthesizes deterministic,
+  stylized Florida templates from the prompt and seed, after a configurable
+  simulated latency and with a configurable failure rate. It can also run a
+  local HTTP stand-in for the Replicate API, so the non-blocking prediction
+  client and the download path are exercised end to end.
+
+Select the backend with POSTER_GENERATOR_BACKEND=local|replicate, or pass one
+to FloridaMapGenerator / AIPosterPipeline. This makes the whole pipeline
+benchmarkable offline:
+
+    POSTER_GENERATOR_BACKEND=local POSTER_LOCAL_LATENCY=2 python ai_poster_pipeline.py
+"""
+
+import os
+import json
+import time
+import random
+import shutil
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from services.content_cache import hash_inputs
+from services.predictions import PredictionClient, sign_webhook
+
+
+logger = logging.getLogger(__name__)
+
+# Bounds the synthetic templates are drawn in, matching the poster service's defaults
+SYNTHETIC_BOUNDS = (24.5, 31.0, -87.6, -79.9)  # min_lat, max_lat, min_lon, max_lon
+
+# Rough Florida outline as (lon, lat), clockwise from the western Panhandle
+FLORIDA_OUTLINE = [
+    (-87.63, 31.00), (-85.00, 31.00), (-84.86, 30.71), (-82.20, 30.57), (-81.95, 30.82),
+    (-81.45, 30.71), (-81.26, 29.90), (-80.97, 29.20), (-80.55, 28.40), (-80.60, 28.10),
+    (-80.03, 26.90), (-80.10, 26.00), (-80.20, 25.60), (-80.40, 25.20), (-80.90, 25.15),
+    (-81.10, 25.35), (-81.75, 25.90), (-81.80, 26.40), (-82.10, 26.90), (-82.65, 27.50),
+    (-82.85, 27.90), (-82.70, 28.60), (-83.00, 29.10), (-83.60, 29.90), (-84.30, 30.05),
+    (-84.90, 29.70), (-85.30, 29.70), (-85.40, 30.00), (-86.20, 30.40), (-87.20, 30.35),
+    (-87.50, 30.30),
+]
+
+FLORIDA_KEYS = [(-80.60, 24.95), (-80.85, 24.80), (-81.10, 24.70), (-81.45, 24.62), (-81.78, 24.56)]
+
+# (keywords, ocean, land, coastline) per look, first match wins
+SYNTHETIC_PALETTES = [
+    (('vintage', 'sepia', 'aged'), (214, 196, 160), (236, 222, 188), (110, 84, 52)),
+    (('watercolor',), (170, 208, 226), (214, 232, 196), (96, 136, 150)),
+    (('minimalist', 'line art'), (250, 250, 250), (255, 255, 255), (40, 40, 40)),
+    (('retro', 'sunset', '1970'), (252, 196, 120), (250, 226, 170), (200, 80, 60)),
+    (('art deco', 'deco'), (24, 60, 72), (222, 200, 150), (200, 160, 60)),
+    (('botanical',), (220, 232, 214), (240, 238, 220), (70, 100, 60)),
+]
+DEFAULT_PALETTE = ((168, 204, 232), (236, 228, 200), (80, 100, 120))
+
+
+class SimulatedFailure(RuntimeError):
+    """Failure injected by the local backend"""
+
+
+def synthesize_template(prompt: str, width: int, height: int, seed: int) -> Any:
+    """
+    Draw a stylized Florida map template.
+
+    The palette follows style keywords in the prompt, and the texture and
+    coastline wobble follow the seed, so equal inputs give equal images.
+
+    Returns:
+        PIL.Image.Image: RGB template
+    """
+    # Imported here so importing the generator stays cheap
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(seed)
+    lowered = prompt.lower()
+    ocean, land, coast = next(
+        ((ocean, land, coast) for keywords, ocean, land, coast in SYNTHETIC_PALETTES
+         if any(keyword in lowered for keyword in keywords)),
+        DEFAULT_PALETTE,
+    )
+    min_lat, max_lat, min_lon, max_lon = SYNTHETIC_BOUNDS
+
+    def project(lon: float, lat: float) -> Tuple[float, float]:
+        return ((lon - min_lon) / (max_lon - min_lon) * width,
+                (max_lat - lat) / (max_lat - min_lat) * height)
+
+    image = Image.new('RGB', (width, height), ocean)
+    draw = ImageDraw.Draw(image)
+
+    # Swell lines offshore
+    for _ in range(24):
+        y = rng.uniform(0, height)
+        x = rng.uniform(0, width * 0.8)
+        draw.line([(x, y), (x + rng.uniform(0.05, 0.2) * width, y)],
+                  fill=tuple(min(255, c + 18) for c in ocean), width=max(1, width // 512))
+
+    jitter = 0.04
+    outline = [project(lon + rng.uniform(-jitter, jitter), lat + rng.uniform(-jitter, jitter))
+               for lon, lat in FLORIDA_OUTLINE]
+    draw.polygon(outline, fill=land, outline=coast, width=max(1, width // 256))
+    radius = max(1, width // 300)
+    for lon, lat in FLORIDA_KEYS:
+        x, y = project(lon, lat)
+        draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=land, outline=coast)
+
+    noise = Image.frombytes('L', (width, height), rng.randbytes(width * height))
+    image = Image.blend(image, Image.merge('RGB', (noise, noise, noise)), 0.04)
+    return image.filter(ImageFilter.SMOOTH)
+
+
+class GeneratorBackend:
+    """Runs map predictions for FloridaMapGenerator"""
+
+    name = ''
+    # Whether the backend needs a Replicate API token
+    requires_token = True
+    # Whether the backend's outputs may be file:// URLs to copy
+    allow_file_urls = False
+
+    def run(self, model: str, model_input: Dict[str, Any]) -> Any:
+        """
+        Run a prediction to completion.
+
+        Args:
+            model: Replicate model reference
+            model_input: Model input, with at least prompt, width and height
+
+        Returns:
+            Output like replicate.run's: a list of image URLs
+        """
+        raise NotImplementedError
+
+    def prediction_client(self, api_token: Optional[str]) -> PredictionClient:
+        """Get a client for non-blocking predictions on this backend"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release resources held by the backend"""
+
+
+class ReplicateBackend(GeneratorBackend):
+    """Runs predictions on Replicate through the replicate package"""
+
+    name = 'replicate'
+
+    def run(self, model: str, model_input: Dict[str, Any]) -> Any:
+        from services.replicate import _import_replicate
+
+        replicate = _import_replicate()
+
+        # Test that replicate.run exists
+        if not hasattr(replicate, 'run'):
+            raise AttributeError(
+                "replicate.run not found. You may have an old version of replicate. "
+                "Try: pip install --upgrade replicate"
+            )
+        return replicate.run(model, input=model_input)
+
+    def prediction_client(self, api_token: Optional[str]) -> PredictionClient:
+        return PredictionClient(api_token)
+
+
+class LocalBackend(GeneratorBackend):
+    """
+    Offline backend with synthesized templates, simulated latency and failures.
+
+    Latency and failures are drawn from a generator seeded by the backend
+    seed, the model input and how often that input has been tried, so a run
+    is reproducible regardless of thread scheduling.
+    """
+
+    name = 'local'
+    requires_token = False
+    allow_file_urls = True
+
+    def __init__(self, output_dir: Optional[str] = None, latency: float = 0.0,
+                 latency_jitter: float = 0.0, failure_rate: float = 0.0,
+                 seed: int = 0, serve: bool = False):
+        """
+        Initialize the local backend.
+
+        Args:
+            output_dir: Where synthesized templates are written, a temporary directory removed
+                by close() by default
+            latency: Simulated prediction time in seconds
+            latency_jitter: Latency varies uniformly by up to this many seconds either way
+            failure_rate: Fraction of predictions that fail
+            seed: Seed for latency, failures and templates without an input seed
+            serve: Serve templates from the HTTP stand-in instead of file:// URLs
+        """
+        if not 0 <= failure_rate <= 1:
+            raise ValueError("Failure rate must be between 0 and 1")
+        self._owns_output_dir = output_dir is None
+        self.output_dir = Path(output_dir or tempfile.mkdtemp(prefix='local-generator-'))
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.server: Optional[LocalStandInServer] = LocalStandInServer(self).start() if serve else None
+
+    @classmethod
+    def from_environment(cls) -> 'LocalBackend':
+        """Configure from POSTER_LOCAL_LATENCY, _JITTER, _FAILURE_RATE, _SEED and _SERVE"""
+        return cls(
+            output_dir=os.getenv('POSTER_LOCAL_OUTPUT_DIR'),
+            latency=float(os.getenv('POSTER_LOCAL_LATENCY', 0)),
+            latency_jitter=float(os.getenv('POSTER_LOCAL_LATENCY_JITTER', 0)),
+            failure_rate=float(os.getenv('POSTER_LOCAL_FAILURE_RATE', 0)),
+            seed=int(os.getenv('POSTER_LOCAL_SEED', 0)),
+            serve=os.getenv('POSTER_LOCAL_SERVE', '').lower() in ('1', 'true', 'yes'),
+        )
+
+    def plan(self, model: str, model_input: Dict[str, Any]) -> Tuple[str, float, bool]:
+        """
+        Decide how a prediction attempt goes.
+
+        Returns:
+            Tuple of the input key, the simulated latency and whether it fails
+        """
+        key = hash_inputs({'model': model, 'input': model_input})
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        rng = random.Random(f"{self.seed}:{key}:{attempt}")
+        latency = max(0.0, self.latency + rng.uniform(-self.latency_jitter, self.latency_jitter))
+        return key, latency, rng.random() < self.failure_rate
+
+    def render(self, key: str, model_input: Dict[str, Any]) -> Path:
+        """Synthesize the template for an input, once"""
+        path = self.output_dir / f"{key[:32]}.png"
+        if not path.exists():
+            seed = model_input.get('seed')
+            if seed is None:
+                seed = int(key[:8], 16) ^ self.seed
+            image = synthesize_template(model_input['prompt'], int(model_input['width']),
+                                        int(model_input['height']), seed)
+            tmp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+            image.save(tmp_path, 'PNG')
+            os.replace(tmp_path, path)
+        return path
+
+    def url_for(self, path: Path) -> str:
+        if self.server is not None:
+            return f"{self.server.url}/files/{path.name}"
+        return path.resolve().as_uri()
+
+    def run(self, model: str, model_input: Dict[str, Any]) -> Any:
+        key, latency, fails = self.plan(model, model_input)
+        time.sleep(latency)
+        if fails:
+            raise SimulatedFailure(f"Simulated prediction failure for {model}")
+        return [self.url_for(self.render(key, model_input))]
+
+    def prediction_client(self, api_token: Optional[str]) -> PredictionClient:
+        if self.server is None:
+            self.server = LocalStandInServer(self).start()
+        return PredictionClient(api_token or 'local', base_url=self.server.url)
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+        if self._owns_output_dir:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+
+
+class LocalStandInServer:
+    """
+    Local HTTP stand-in for the parts of the Replicate API the pipeline uses.
+
+    Serves prediction create/get/cancel (with completion webhooks) and the
+    synthesized images. Predictions finish once their simulated latency has
+    passed, without holding a thread while they run. Webhooks are signed
+    like Replicate's, with REPLICATE_WEBHOOK_SECRET by default, so they pass
+    the same checks as real deliveries.
+    """
+
+    def __init__(self, backend: LocalBackend, host: str = '127.0.0.1', port: int = 0,
+                 webhook_secret: Optional[str] = None):
+        self.backend = backend
+        self.host = host
+        self.port = port
+        self.webhook_secret = webhook_secret or os.getenv('REPLICATE_WEBHOOK_SECRET')
+        self._predictions: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("Stand-in server is not running")
+        return f"http://{self.host}:{self._server.server_address[1]}"
+
+    def create(self, model: str, model_input: Dict[str, Any], webhook: Optional[str] = None) -> Dict[str, Any]:
+        """Start a prediction"""
+        key, latency, fails = self.backend.plan(model, model_input)
+        with self._lock:
+            prediction_id = f"local-{len(self._predictions):06d}"
+            self._predictions[prediction_id] = {
+                'id': prediction_id, 'model': model, 'input': model_input, 'key': key,
+                'status': 'starting', 'output': None, 'error': None,
+                'due': time.monotonic() + latency, 'fails': fails,
+            }
+        if webhook:
+            timer = threading.Timer(latency, self._deliver, (prediction_id, webhook))
+            timer.daemon = True
+            timer.start()
+        return self.get(prediction_id)
+
+    def get(self, prediction_id: str) -> Dict[str, Any]:
+        """Get a prediction, finishing it if its latency has passed"""
+        with self._lock:
+            prediction = self._predictions[prediction_id]
+            due = prediction['status'] == 'starting' and time.monotonic() >= prediction['due']
+        if due:
+            if prediction['fails']:
+                update = {'status': 'failed', 'error': "Simulated prediction failure"}
+            else:
+                path = self.backend.render(prediction['key'], prediction['input'])
+                update = {'status': 'succeeded', 'output': [self.backend.url_for(path)]}
+            with self._lock:
+                if prediction['status'] == 'starting':
+                    prediction.update(update)
+        return self._public(prediction)
+
+    def cancel(self, prediction_id: str) -> Dict[str, Any]:
+        """Cancel a prediction that has not finished"""
+        with self._lock:
+            prediction = self._predictions[prediction_id]
+            if prediction['status'] == 'starting':
+                prediction['status'] = 'canceled'
+        return self._public(prediction)
+
+    @staticmethod
+    def _public(prediction: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: prediction[key] for key in ('id', 'model', 'input', 'status', 'output', 'error')}
+
+    def _deliver(self, prediction_id: str, webhook: str) -> None:
+        import urllib.request
+
+        body = json.dumps(self.get(prediction_id)).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.webhook_secret:
+            headers.update(sign_webhook(self.webhook_secret, f"msg_{prediction_id}", body))
+        request = urllib.request.Request(webhook, data=body, method='POST', headers=headers)
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+        except Exception as e:
+            logger.warning(f"Webhook delivery for {prediction_id} failed: {e}")
+
+    def start(self) -> 'LocalStandInServer':
+        """Start serving from a background thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        stand_in = self
+
+        class StandInRequestHandler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self) -> None:
+                parts = self.path.strip('/').split('/')
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                try:
+                    if parts[:2] == ['v1', 'models'] and parts[-1] == 'predictions':
+                        model = '/'.join(parts[2:-1])
+                    elif parts == ['v1', 'predictions']:
+                        model = body['version']
+                    elif parts[:2] == ['v1', 'predictions'] and parts[-1] == 'cancel':
+                        self._reply(200, stand_in.cancel(parts[2]))
+                        return
+                    else:
+                        self.send_error(404)
+                        return
+                    self._reply(201, stand_in.create(model, body['input'], body.get('webhook')))
+                except KeyError:
+                    self.send_error(404)
+
+            def do_GET(self) -> None:
+                parts = self.path.strip('/').split('/')
+                if parts[:2] == ['v1', 'predictions'] and len(parts) == 3:
+                    try:
+                        self._reply(200, stand_in.get(parts[2]))
+                    except KeyError:
+                        self.send_error(404)
+                elif parts[0] == 'files' and len(parts) == 2:
+                    self._send_file(stand_in.backend.output_dir / Path(parts[1]).name)
+                else:
+                    self.send_error(404)
+
+            def _send_file(self, path: Path) -> None:
+                if not path.is_file():
+                    self.send_error(404)
+                    return
+                data = path.read_bytes()
+                start = 0
+                requested = self.headers.get('Range', '')
+                if requested.startswith('bytes=') and requested.endswith('-'):
+                    start = min(int(requested[6:-1]), len(data))
+                self.send_response(206 if start else 200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(data) - start))
+                if start:
+                    self.send_header('Content-Range', f"bytes {start}-{len(data) - 1}/{len(data)}")
+                self.end_headers()
+                self.wfile.write(data[start:])
+
+            def log_message(self, format: str, *args) -> None:
+                logger.debug(f"{self.address_string()} - {format % args}")
+
+        self._server = ThreadingHTTPServer((self.host, self.port), StandInRequestHandler)
+        thread = threading.Thread(target=self._server.serve_forever, name="generator-stand-in", daemon=True)
+        thread.start()
+        logger.info(f"Local Replicate stand-in listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        """Stop serving"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+BACKENDS = {
+    ReplicateBackend.name: ReplicateBackend,
+    LocalBackend.name: LocalBackend.from_environment,
+}
+
+
+def create_backend(name: Optional[str] = None) -> GeneratorBackend:
+    """
+    Create a backend by name, or from POSTER_GENERATOR_BACKEND (Replicate by default).
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    name = (name or os.getenv('POSTER_GENERATOR_BACKEND') or ReplicateBackend.name).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown generator backend: {name}. Available: {list(BACKENDS)}")
+    return BACKENDS[name]()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+SQLite Catalog of Generated Assets
+
+Records every template and poster the pipeline writes: its path, inputs hash,
+style, model, dimensions, byte size, production time and creation time. Each
+write is a single transaction, so the catalog never disagrees with itself.
+Lookups by inputs hash go through an index, and per-kind totals are kept up
+to date by triggers, so status queries cost the same with a handful of assets
+or hundreds of thousands.
+
+Assets also carry a last access time, for least-recently-used eviction, and
+a for-sale flag that protects them from eviction.
+
+Connections are per thread, and the database runs in WAL mode so readers
+never wait for writers.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from services.metrics import counter
+
+
+logger = logging.getLogger(__name__)
+
+CATALOG_WRITES = counter('catalog_writes_total', "Assets recorded in the catalog", ['kind'])
+
+TEMPLATE = 'template'
+POSTER = 'poster'
+KINDS = (TEMPLATE, POSTER)
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    inputs_hash TEXT,
+    style TEXT,
+    model TEXT,
+    width INTEGER,
+    height INTEGER,
+    bytes INTEGER NOT NULL,
+    seconds REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_by_inputs ON assets (kind, inputs_hash, created_at);
+
+CREATE TABLE IF NOT EXISTS asset_totals (
+    kind TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO asset_totals (kind) VALUES ('template'), ('poster');
+
+CREATE TRIGGER IF NOT EXISTS assets_inserted AFTER INSERT ON assets BEGIN
+    UPDATE asset_totals SET count = count + 1, bytes = bytes + NEW.bytes WHERE kind = NEW.kind;
+END;
+CREATE TRIGGER IF NOT EXISTS assets_deleted AFTER DELETE ON assets BEGIN
+    UPDATE asset_totals SET count = count - 1, bytes = bytes - OLD.bytes WHERE kind = OLD.kind;
+END;
+CREATE TRIGGER IF NOT EXISTS assets_updated AFTER UPDATE OF kind, bytes ON assets BEGIN
+    UPDATE asset_totals SET count = count - 1, bytes = bytes - OLD.bytes WHERE kind = OLD.kind;
+    UPDATE asset_totals SET count = count + 1, bytes = bytes + NEW.bytes WHERE kind = NEW.kind;
+END;
+"""
+
+# Statements bringing a database from each schema version to the next
+MIGRATIONS = {
+    1: """
+ALTER TABLE assets ADD COLUMN accessed_at REAL;
+ALTER TABLE assets ADD COLUMN for_sale INTEGER NOT NULL DEFAULT 0;
+UPDATE assets SET accessed_at = created_at;
+CREATE INDEX IF NOT EXISTS assets_for_sale ON assets (path) WHERE for_sale = 1;
+""",
+}
+
+# Columns written when a file is recorded; for_sale survives re-recording
+RECORD_COLUMNS = ('path', 'kind', 'inputs_hash', 'style', 'model', 'width', 'height', 'bytes', 'seconds',
+                  'created_at', 'accessed_at')
+COLUMNS = RECORD_COLUMNS + ('for_sale',)
+
+
+def split_statements(script: str) -> List[str]:
+    """Split a SQL script into complete statements, keeping trigger bodies whole"""
+    statements, pending = [], ''
+    for part in script.split(';'):
+        if not pending and not part.strip():
+            continue
+        pending += part + ';'
+        if sqlite3.complete_statement(pending):
+            statements.append(pending.strip())
+            pending = ''
+    return statements
+
+
+@dataclass
+class Asset:
+    """A cataloged template or poster"""
+    path: str
+    kind: str
+    inputs_hash: Optional[str]
+    style: Optional[str]
+    model: Optional[str]
+    width: Optional[int]
+    height: Optional[int]
+    bytes: int
+    seconds: Optional[float]
+    created_at: float
+    accessed_at: Optional[float] = None
+    for_sale: bool = False
+
+
+class AssetCatalog:
+    """Transactional, indexed record of generated templates and posters"""
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open the catalog, creating the database on first use.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+        self._migrate(self._connection())
+
+    def _migrate(self, connection: sqlite3.Connection) -> None:
+        """
+        Bring the database up to SCHEMA_VERSION, one transaction per version.
+
+        Each step runs its statements and sets user_version in a single
+        transaction, so a failed migration leaves the previous version intact.
+        """
+        while True:
+            # Immediate, so concurrent openers migrate one at a time and re-read the version
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                version = connection.execute("PRAGMA user_version").fetchone()[0]
+                if version >= SCHEMA_VERSION:
+                    connection.rollback()
+                    return
+                if version:
+                    logger.info(f"Migrating catalog {self.path} to schema version {version + 1}")
+                for statement in split_statements(MIGRATIONS[version] if version else SCHEMA):
+                    connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {version + 1}")
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def record(self, path: Union[str, Path], kind: str, inputs_hash: Optional[str] = None,
+               style: Optional[str] = None, model: Optional[str] = None,
+               width: Optional[int] = None, height: Optional[int] = None,
+               seconds: Optional[float] = None, size: Optional[int] = None) -> Asset:
+        """
+        Record a file just written, replacing any earlier record of its path.
+
+        Args:
+            path: File written
+            kind: TEMPLATE or POSTER
+            inputs_hash: Hash of the inputs that produced it
+            style: Map or poster style
+            model: AI model of the template
+            width: Image width in pixels
+            height: Image height in pixels
+            seconds: Time taken to produce it
+            size: Size in bytes, read from the file if None
+
+        Returns:
+            Asset: The recorded asset
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown asset kind: {kind}")
+        now = time.time()
+        asset = Asset(
+            path=str(Path(path).resolve()), kind=kind, inputs_hash=inputs_hash, style=style, model=model,
+            width=width, height=height, bytes=size if size is not None else Path(path).stat().st_size,
+            seconds=seconds, created_at=now, accessed_at=now,
+        )
+        placeholders = ', '.join('?' * len(RECORD_COLUMNS))
+        updates = ', '.join(f"{column} = excluded.{column}" for column in RECORD_COLUMNS[1:])
+        with self._connection() as connection:
+            connection.execute(
+                f"INSERT INTO assets ({', '.join(RECORD_COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT (path) DO UPDATE SET {updates}",
+                tuple(getattr(asset, column) for column in RECORD_COLUMNS),
+            )
+        CATALOG_WRITES.inc(kind=kind)
+        return asset
+
+    def touch(self, path: Union[str, Path]) -> None:
+        """Mark an asset as just used"""
+        with self._connection() as connection:
+            connection.execute("UPDATE assets SET accessed_at = ? WHERE path = ?",
+                               (time.time(), str(Path(path).resolve())))
+
+    def mark_for_sale(self, path: Union[str, Path], for_sale: bool = True) -> bool:
+        """
+        Flag an asset as listed for sale, which protects it from eviction.
+
+        Returns:
+            bool: Whether the asset is cataloged
+        """
+        with self._connection() as connection:
+            cursor = connection.execute("UPDATE assets SET for_sale = ? WHERE path = ?",
+                                        (int(for_sale), str(Path(path).resolve())))
+        return cursor.rowcount > 0
+
+    def usage_under(self, directory: Union[str, Path]) -> Dict[str, Tuple[Optional[float], bool]]:
+        """
+        Get the last access time and for-sale flag of every asset under a directory.
+
+        Returns:
+            Dict mapping resolved paths to (accessed_at, for_sale)
+        """
+        prefix = os.path.join(str(Path(directory).resolve()), '')
+        # A range over the unique path index: every path starting with the prefix
+        rows = self._connection().execute(
+            "SELECT path, accessed_at, for_sale FROM assets WHERE path >= ? AND path < ?",
+            (prefix, prefix[:-1] + chr(ord(os.sep) + 1)),
+        ).fetchall()
+        return {row['path']: (row['accessed_at'], bool(row['for_sale'])) for row in rows}
+
+    def remove(self, path: Union[str, Path]) -> bool:
+        """Forget a deleted file, returning whether it was cataloged"""
+        with self._connection() as connection:
+            cursor = connection.execute("DELETE FROM assets WHERE path = ?", (str(Path(path).resolve()),))
+        return cursor.rowcount > 0
+
+    def find(self, kind: str, inputs_hash: str) -> Optional[Asset]:
+        """Get the newest asset of a kind produced from the given inputs"""
+        row = self._connection().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM assets WHERE kind = ? AND inputs_hash = ? "
+            f"ORDER BY created_at DESC LIMIT 1",
+            (kind, inputs_hash),
+        ).fetchone()
+        return self._asset(row)
+
+    def get(self, path: Union[str, Path]) -> Optional[Asset]:
+        """Get the record of a file"""
+        row = self._connection().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM assets WHERE path = ?", (str(Path(path).resolve()),)
+        ).fetchone()
+        return self._asset(row)
+
+    @staticmethod
+    def _asset(row: Optional[sqlite3.Row]) -> Optional[Asset]:
+        """Build an asset from a row of COLUMNS"""
+        if row is None:
+            return None
+        return Asset(**{**dict(row), 'for_sale': bool(row['for_sale'])})
+
+    def totals(self) -> Dict[str, Tuple[int, int]]:
+        """Get the number and total bytes of cataloged assets of each kind"""
+        rows = self._connection().execute("SELECT kind, count, bytes FROM asset_totals").fetchall()
+        return {row['kind']: (row['count'], row['bytes']) for row in rows}
+
+    def close(self) -> None:
+        """Close every thread's connection"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
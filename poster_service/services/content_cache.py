@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed File Cache
+
+Stores files under the hash of everything that produced them, with an
+optional JSON metadata sidecar per entry. Entries are written to a temporary
+file and renamed into place, so concurrent readers never see a partial file,
+and the cache is kept under a byte budget by evicting the least recently used
+entries. Hits refresh an entry's modification time, which is what eviction
+orders by (access times are unreliable on relatime/noatime mounts).
+"""
+
+import os
+import json
+import time
+import heapq
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+logger = logging.getLogger(__name__)
+
+
+def hash_inputs(inputs: Dict[str, Any]) -> str:
+    """Hash a JSON-serializable description of all inputs into a cache key"""
+    canonical = json.dumps(inputs, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ContentCache:
+    """
+    Size-bounded, content-addressed file cache on local disk.
+
+    Entries live at <root>/<key[:2]>/<key><suffix>, with metadata in
+    <key>.json next to them.
+    """
+
+    METADATA_SUFFIX = '.json'
+
+    def __init__(self, root: Union[str, Path], max_bytes: int = 1 << 30, suffix: str = ''):
+        """
+        Initialize the cache.
+
+        Args:
+            root: Cache directory, created on first write
+            max_bytes: Total size of cached entries kept before evicting
+            suffix: File suffix for cached entries, e.g. '.png'
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    def path_for(self, key: str) -> Path:
+        """Get where the entry for a key is stored"""
+        return self.root / key[:2] / f"{key}{self.suffix}"
+
+    def _metadata_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{self.METADATA_SUFFIX}"
+
+    def get(self, key: str) -> Optional[Path]:
+        """
+        Look up an entry, marking it as recently used.
+
+        Returns:
+            Path to the cached file, or None on a miss
+        """
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def read_bytes(self, key: str) -> Optional[bytes]:
+        """Read an entry's contents, or None on a miss"""
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            # Evicted between lookup and read
+            return None
+
+    def get_metadata(self, key: str) -> Optional[Dict[str, Any]]:
+        """Read an entry's metadata sidecar, or None if it has none"""
+        try:
+            return json.loads(self._metadata_path(key).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put_bytes(self, key: str, data: bytes,
+                  metadata: Optional[Dict[str, Any]] = None) -> Path:
+        """Store bytes under a key, atomically replacing any existing entry"""
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        replaced = self._file_size(path)
+        if metadata is not None:
+            self._write_atomic(self._metadata_path(key), json.dumps(metadata, indent=2).encode('utf-8'))
+        self._write_atomic(path, data)
+        self._account(len(data) - replaced)
+        return path
+
+    def put_file(self, key: str, source: Union[str, Path],
+                 metadata: Optional[Dict[str, Any]] = None) -> Path:
+        """Store a copy of a file under a key"""
+        return self.put_bytes(key, Path(source).read_bytes(), metadata)
+
+    def discard(self, key: str) -> None:
+        """Remove an entry and its metadata"""
+        path = self.path_for(key)
+        size = self._file_size(path)
+        self._unlink(path)
+        self._unlink(self._metadata_path(key))
+        self._account(-size, evict=False)
+
+    def size(self) -> int:
+        """Get the total size in bytes of cached entries"""
+        with self._lock:
+            if self._size is not None:
+                return self._size
+        scanned = sum(size for _, _, size in self._entries())
+        with self._lock:
+            if self._size is None:
+                self._size = scanned
+            return self._size
+
+    def evict(self, max_entries: Optional[int] = None) -> int:
+        """
+        Evict least recently used entries until the cache is within budget.
+
+        Args:
+            max_entries: Most entries evicted, all that are needed if None
+
+        Returns:
+            int: Number of bytes freed
+        """
+        # Walked and ordered without the lock, so lookups and writes carry on meanwhile
+        entries = self._entries()
+        scanned = sum(size for _, _, size in entries)
+        # A bounded eviction only needs its oldest few entries in order
+        entries = sorted(entries) if max_entries is None else heapq.nsmallest(max_entries, entries)
+        with self._lock:
+            if self._size is None:
+                self._size = scanned
+
+        freed = 0
+        for mtime, path, _ in entries:
+            key = path.name[:len(path.name) - len(self.suffix)]
+            with self._lock:
+                if self._size <= self.max_bytes:
+                    break
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime > mtime:
+                    # Hit or rewritten since the walk
+                    continue
+                self._unlink(path)
+                self._unlink(self._metadata_path(key))
+                self._size -= stat.st_size
+            freed += stat.st_size
+
+        if freed:
+            logger.info(f"Evicted {freed} bytes from cache {self.root}")
+        return freed
+
+    def stats(self) -> Dict[str, int]:
+        """Get cache counters"""
+        return {'hits': self.hits, 'misses': self.misses, 'bytes': self.size()}
+
+    def _entries(self) -> List[Tuple[float, Path, int]]:
+        """List (mtime, path, size) for every cached entry"""
+        entries = []
+        if not self.root.exists():
+            return entries
+        for directory in self.root.iterdir():
+            if not directory.is_dir():
+                continue
+            for path in directory.iterdir():
+                if path.name.startswith('.') or path.name.endswith(self.METADATA_SUFFIX):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _account(self, delta: int, evict: bool = True) -> None:
+        """Track the cache size, evicting once it exceeds the budget"""
+        with self._lock:
+            if self._size is not None:
+                self._size += delta
+            over_budget = self._size is None or self._size > self.max_bytes
+        if evict and over_budget and self.size() > self.max_bytes:
+            self.evict()
+
+    @staticmethod
+    def _file_size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _unlink(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        """Write to a temporary file in the same directory, then rename into place"""
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.{time.monotonic_ns()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
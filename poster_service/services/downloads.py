@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Streaming, Resumable HTTP Downloads
+
+Downloads go through one pooled session shared by all threads and are
+streamed in chunks to a `.part` file next to the destination, which is
+renamed into place only once its length (and checksum, if known) checks out.
+Memory use is one chunk regardless of the file size. download_bytes()
+keeps the content in memory instead, for handing straight to a decoder.
+When a connection drops the download is retried with exponential backoff
+and resumed with a Range request from where the partial content ends;
+servers that ignore Range simply send the whole file again. file:// URLs
+(from the offline generator backend) are copied the same way, but only by
+downloaders created with allow_file_urls, since a URL from a prediction
+output or webhook could otherwise name any local file.
+"""
+
+import io
+import os
+import time
+import random
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterator, Optional, Tuple, Union
+
+from services.metrics import counter, histogram
+
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying; other errors fail the download immediately
+RETRY_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# URL schemes fetched over the network
+HTTP_SCHEMES = ('http', 'https')
+
+# Connections kept open per host, enough for concurrent template generation
+POOL_MAXSIZE = 16
+
+RETRIES = counter('download_retries_total', "Download attempts retried after a failure")
+RESUMES = counter('download_resumes_total', "Downloads resumed from a partial file")
+THROUGHPUT = histogram('download_throughput_bytes_per_second', "Download throughput",
+                       buckets=(65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    """Download failed, or its content did not match the expected length or checksum"""
+
+
+class _RetryableError(Exception):
+    """Failure that another attempt may not hit"""
+
+
+@dataclass
+class DownloadResult:
+    """Outcome of a completed download"""
+    path: Optional[Path]  # None for downloads into memory
+    bytes: int
+    sha256: str
+    status_code: int
+    retries: int
+    resumed: bool
+    seconds: float
+    data: Optional[bytes] = None  # content of downloads into memory
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second over the whole download, retries included"""
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+
+def get_session() -> Any:
+    """Get the process-wide pooled requests session"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # Imported here so importing the generator stays cheap
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def file_sha256(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """Hash a file without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _total_size(response: Any, offset: int) -> Optional[int]:
+    """Get the full file size a response promises, if it says"""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    content_length = response.headers.get('Content-Length')
+    if content_length is not None:
+        return offset + int(content_length)
+    return None
+
+
+class _FileSink:
+    """Partial download in a file"""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def size(self) -> int:
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    def open(self, append: bool) -> BinaryIO:
+        return open(self.path, 'ab' if append else 'wb')
+
+    def discard(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+    def digest(self) -> str:
+        return file_sha256(self.path)
+
+
+class _MemorySink:
+    """Partial download in memory"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def size(self) -> int:
+        return self.buffer.getbuffer().nbytes
+
+    @contextmanager
+    def open(self, append: bool) -> Iterator[BinaryIO]:
+        if not append:
+            self.discard()
+        self.buffer.seek(0, io.SEEK_END)
+        yield self.buffer
+
+    def discard(self) -> None:
+        self.buffer = io.BytesIO()
+
+    def digest(self) -> str:
+        return hashlib.sha256(self.buffer.getbuffer()).hexdigest()
+
+
+_Sink = Union[_FileSink, _MemorySink]
+
+
+class Downloader:
+    """Downloads files over a shared session with retries and resume"""
+
+    def __init__(self, session: Optional[Any] = None, retries: int = 4,
+                 backoff: float = 0.5, max_backoff: float = 8.0,
+                 chunk_size: int = 1 << 16, timeout: Tuple[float, float] = (10, 30),
+                 sleep: Callable[[float], None] = time.sleep, allow_file_urls: bool = False):
+        """
+        Initialize the downloader.
+
+        Args:
+            session: requests session to use, the shared pooled session by default
+            retries: Attempts after the first before giving up
+            backoff: Delay before the first retry in seconds, doubled for each further retry
+            max_backoff: Longest delay between attempts in seconds
+            chunk_size: Bytes read from the connection at a time
+            timeout: Connect and read timeouts in seconds
+            sleep: Sleeps for a number of seconds
+            allow_file_urls: Copy file:// URLs, for backends that hand out local files
+        """
+        self._session = session
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._sleep = sleep
+        self.allow_file_urls = allow_file_urls
+
+    @property
+    def session(self) -> Any:
+        if self._session is None:
+            self._session = get_session()
+        return self._session
+
+    def download(self, url: str, dest: Union[str, Path],
+                 expected_size: Optional[int] = None,
+                 sha256: Optional[str] = None) -> DownloadResult:
+        """
+        Download a URL to a file atomically.
+
+        Args:
+            url: URL to download
+            dest: Path to write the file to
+            expected_size: Size in bytes the file must have, if known
+            sha256: Hex SHA-256 digest the file must have, if known
+
+        Returns:
+            DownloadResult: Where the file went and how the download went
+
+        Raises:
+            DownloadError: If every attempt failed or the content did not validate
+        """
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        sink = _FileSink(dest.with_name(dest.name + '.part'))
+        # A partial file left by an earlier process may belong to a different URL
+        sink.discard()
+
+        try:
+            result = self._transfer(url, sink, expected_size, sha256)
+            os.replace(sink.path, dest)
+        except BaseException:
+            sink.discard()
+            raise
+        result.path = dest
+        return result
+
+    def download_bytes(self, url: str, expected_size: Optional[int] = None,
+                       sha256: Optional[str] = None) -> DownloadResult:
+        """
+        Download a URL into memory, with the same retries and validation.
+
+        Returns:
+            DownloadResult: The content in `data`, and how the download went
+
+        Raises:
+            DownloadError: If every attempt failed or the content did not validate
+        """
+        sink = _MemorySink()
+        result = self._transfer(url, sink, expected_size, sha256)
+        result.data = sink.buffer.getvalue()
+        return result
+
+    def _transfer(self, url: str, sink: '_Sink', expected_size: Optional[int],
+                  sha256: Optional[str]) -> DownloadResult:
+        """Fetch a URL into a sink, retrying and resuming, then validate it"""
+        start = time.perf_counter()
+        retries = 0
+        resumed = False
+        while True:
+            try:
+                status_code, total, resumed_now = self._fetch(url, sink)
+                resumed = resumed or resumed_now
+                break
+            except _RetryableError as e:
+                if retries >= self.retries:
+                    raise DownloadError(f"Giving up on {url} after {retries + 1} attempts: {e}") from e
+                delay = min(self.max_backoff, self.backoff * 2 ** retries)
+                delay *= random.uniform(0.5, 1.0)
+                retries += 1
+                RETRIES.inc()
+                logger.warning(f"Download of {url} failed ({e}), retrying in {delay:.1f}s")
+                self._sleep(delay)
+
+        size = sink.size()
+        if total is not None and size != total:
+            raise DownloadError(f"Expected {total} bytes from {url}, got {size}")
+        if expected_size is not None and size != expected_size:
+            raise DownloadError(f"Expected {expected_size} bytes from {url}, got {size}")
+        digest = sink.digest()
+        if sha256 is not None and digest != sha256.lower():
+            raise DownloadError(f"Checksum mismatch for {url}: expected {sha256}, got {digest}")
+
+        seconds = time.perf_counter() - start
+        result = DownloadResult(None, size, digest, status_code, retries, resumed, seconds)
+        if resumed:
+            RESUMES.inc()
+        THROUGHPUT.observe(result.throughput)
+        return result
+
+    def _fetch(self, url: str, sink: '_Sink') -> Tuple[int, Optional[int], bool]:
+        """
+        Make one attempt, appending to the partial content if the server allows.
+
+        Returns:
+            Tuple of the status code, the full size promised by the server and
+            whether the attempt resumed partial content
+        """
+        from urllib.parse import urlparse
+
+        scheme = urlparse(url).scheme.lower()
+        if scheme == 'file' and self.allow_file_urls:
+            return self._copy_local(url, sink)
+        if scheme not in HTTP_SCHEMES:
+            raise DownloadError(f"Refusing to download {url}: {scheme or 'no'} URL scheme is not allowed")
+
+        import requests
+
+        offset = sink.size()
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 416 and offset:
+                    # The partial content is no prefix of what the server has now
+                    sink.discard()
+                    raise _RetryableError("range not satisfiable")
+                if response.status_code in RETRY_STATUS:
+                    raise _RetryableError(f"HTTP {response.status_code}")
+                try:
+                    response.raise_for_status()
+                except requests.HTTPError as e:
+                    raise DownloadError(str(e)) from e
+
+                resumed = offset > 0 and response.status_code == 206
+                if not resumed:
+                    offset = 0
+                total = _total_size(response, offset)
+
+                with sink.open(append=resumed) as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                    size = f.tell()
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            raise _RetryableError(str(e)) from e
+
+        if total is not None and size < total:
+            raise _RetryableError(f"connection closed after {size} of {total} bytes")
+        return response.status_code, total, resumed
+
+    def _copy_local(self, url: str, sink: '_Sink') -> Tuple[int, Optional[int], bool]:
+        """Copy a file:// URL into the sink"""
+        from urllib.parse import urlparse
+        from urllib.request import url2pathname
+
+        source = Path(url2pathname(urlparse(url).path))
+        try:
+            with open(source, 'rb') as src, sink.open(append=False) as dst:
+                shutil.copyfileobj(src, dst, self.chunk_size)
+        except OSError as e:
+            raise DownloadError(f"Could not copy {url}: {e}") from e
+        return 200, sink.size(), False
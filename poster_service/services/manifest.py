@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Checkpointed Job Manifests for Collection Runs
+
+A manifest is a JSON file recording, for each job of a collection run, the
+hash of its inputs, the last stage it completed and the artifacts each stage
+produced (with their SHA-256). It is rewritten atomically after every stage,
+so an interrupted run leaves a consistent checkpoint. A rerun resumes each
+job after its last completed stage, as long as the job's inputs are unchanged
+and the artifacts on disk still match their recorded checksums.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from services.downloads import file_sha256
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+class CollectionManifest:
+    """
+    Stage status and artifacts of each job in a collection run.
+
+    Stages run in order: pending, template (map template saved), overlay
+    (poster rendered) and exported (poster verified on disk and its checksum
+    recorded).
+    """
+
+    PENDING = 'pending'
+    TEMPLATE = 'template'
+    OVERLAY = 'overlay'
+    EXPORTED = 'exported'
+    STAGES = (PENDING, TEMPLATE, OVERLAY, EXPORTED)
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open a manifest, loading the jobs of an earlier run if it exists.
+
+        Args:
+            path: JSON file the manifest is kept in
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+            return
+        if data.get('version') != MANIFEST_VERSION:
+            logger.warning(f"Ignoring manifest {self.path} with version {data.get('version')}")
+            return
+        self.jobs = data.get('jobs', {})
+
+    def start_job(self, job_id: str, inputs_hash: str, reset: bool = False) -> str:
+        """
+        Register a job, keeping its progress if its inputs are unchanged.
+
+        Args:
+            job_id: Name of the job within the collection
+            inputs_hash: Hash of everything the job's artifacts depend on
+            reset: Discard progress recorded by earlier runs
+
+        Returns:
+            str: The last stage the job completed
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if reset or job is None or job.get('inputs_hash') != inputs_hash:
+                job = self.jobs[job_id] = {
+                    'inputs_hash': inputs_hash,
+                    'status': self.PENDING,
+                    'artifacts': {},
+                    'error': None,
+                    'updated_at': time.time(),
+                }
+                self._save()
+            return job['status']
+
+    def stage(self, job_id: str) -> str:
+        """Get the last stage a job completed"""
+        with self._lock:
+            return self.jobs[job_id]['status']
+
+    def record(self, job_id: str, stage: str, **artifacts: Union[str, Path]) -> None:
+        """
+        Checkpoint a completed stage and the artifacts it produced.
+
+        Args:
+            job_id: Job that completed the stage
+            stage: Stage completed, one of STAGES
+            **artifacts: Files produced, by name; their checksums are recorded
+        """
+        entries = {name: {'path': str(path), 'sha256': file_sha256(path)}
+                   for name, path in artifacts.items()}
+        with self._lock:
+            job = self.jobs[job_id]
+            # Stages finishing out of order (such as a background template write
+            # landing after the overlay) never move a job backwards
+            if self.STAGES.index(stage) > self.STAGES.index(job['status']):
+                job['status'] = stage
+            job['artifacts'].update(entries)
+            job['error'] = None
+            job['updated_at'] = time.time()
+            self._save()
+
+    def record_error(self, job_id: str, error: BaseException) -> None:
+        """Note why a job failed, keeping the stages it completed"""
+        with self._lock:
+            job = self.jobs[job_id]
+            job['error'] = f"{type(error).__name__}: {error}"
+            job['updated_at'] = time.time()
+            self._save()
+
+    def artifact(self, job_id: str, name: str) -> Optional[Path]:
+        """
+        Get an artifact recorded for a job if it is still intact on disk.
+
+        Returns:
+            Path to the artifact, or None if it is missing, changed or was never recorded
+        """
+        with self._lock:
+            entry = self.jobs.get(job_id, {}).get('artifacts', {}).get(name)
+        if entry is None:
+            return None
+        path = Path(entry['path'])
+        try:
+            if file_sha256(path) == entry['sha256']:
+                return path
+        except OSError:
+            pass
+        logger.info(f"Artifact {name} of {job_id} is missing or changed: {path}")
+        return None
+
+    def _save(self) -> None:
+        """Write the manifest atomically; the caller holds the lock"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({'version': MANIFEST_VERSION, 'jobs': self.jobs}, indent=2, sort_keys=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_text(data, encoding='utf-8')
+            os.replace(tmp_path, self.path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
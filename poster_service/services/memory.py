@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Memory Accounting for Poster Renders
+
+Estimates how much memory a render needs before it starts, measures what it
+actually used, and plans renders to fit a per-job memory budget.
+
+Pillow allocates pixel buffers outside the Python allocator, so tracemalloc
+does not see them. Actual usage is measured instead by sampling the process
+resident set size on a background thread while the render runs. RSS is
+process-wide, so with several renders in flight the measured growth is an
+upper bound for any one of them.
+"""
+
+import os
+import math
+import threading
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Optional, Sequence, Tuple
+
+
+# Bytes per pixel of an RGBA image
+RGBA_BYTES_PER_PIXEL = 4
+
+# Temporary bytes per pixel held while one strip of an effect is processed
+EFFECT_STRIP_BYTES_PER_PIXEL = {
+    'sepia': 15,  # crop, grayscale, RGB, sepia RGB, RGBA
+    'noise': 24,  # crop, random bytes, mask, amount, offsets, split bands, merge
+    'subtle_texture': 14,  # crop, flat image, alpha, blend
+}
+
+# Whole-image temporaries of an effect, in bytes per pixel
+EFFECT_IMAGE_BYTES_PER_PIXEL = {
+    'subtle_texture': 1,  # grayscale copy for the mean brightness
+}
+
+# Encoder output and working memory, with the output counted twice for the
+# copy out of the encode buffer
+ENCODE_BYTES_PER_PIXEL = {
+    'PNG': 4,   # up to half the raw size for photographic templates
+    'JPEG': 4,  # RGB conversion plus compressed output
+}
+DEFAULT_ENCODE_BYTES_PER_PIXEL = 8  # uncompressed output
+
+# Smallest downscale factor tried before a render is refused
+MIN_DOWNSCALE = 0.1
+
+
+class BudgetPolicy(Enum):
+    """What to do with a render whose estimate exceeds its memory budget"""
+    REFUSE = "refuse"        # Fail the render
+    TILED = "tiled"          # Process effect strips one at a time, else refuse
+    DOWNSCALE = "downscale"  # Process strips one at a time, else shrink the template
+
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when a render cannot be made to fit its memory budget"""
+
+
+@dataclass
+class MemoryBudget:
+    """Per-render memory limit and the policy applied when it is exceeded"""
+    limit_bytes: int
+    policy: BudgetPolicy = BudgetPolicy.TILED
+
+
+@dataclass
+class MemoryEstimate:
+    """Estimated memory of a render, overall and per render phase"""
+    peak_bytes: int
+    phases: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class RenderPlan:
+    """How a render is run to stay within its memory budget"""
+    size: Tuple[int, int]
+    effect_workers: int
+    estimate: MemoryEstimate
+    scale: float = 1.0
+
+    @property
+    def tiled(self) -> bool:
+        """Whether effect strips are processed one at a time"""
+        return self.effect_workers == 1
+
+    @property
+    def downscaled(self) -> bool:
+        """Whether the template is shrunk before rendering"""
+        return self.scale < 1.0
+
+
+def estimate_render_memory(size: Tuple[int, int], effects: Sequence[str],
+                           image_format: str = 'PNG',
+                           effect_workers: int = 1,
+                           strip_height: int = 256,
+                           template_size: Optional[Tuple[int, int]] = None) -> MemoryEstimate:
+    """
+    Estimate the peak memory a render needs on top of the process baseline.
+
+    Args:
+        size: Size of the rendered poster in pixels
+        effects: Background effects of the poster style, in order
+        image_format: Pillow format the poster is encoded in
+        effect_workers: Effect strips processed at the same time
+        strip_height: Height in pixels of an effect strip
+        template_size: Size of the decoded template when it differs from size
+
+    Returns:
+        MemoryEstimate: Peak bytes and the bytes of each render phase
+    """
+    width, height = size
+    pixels = width * height
+    image = pixels * RGBA_BYTES_PER_PIXEL
+
+    # Decoded template, plus the downscaled copy rendered from it
+    template = image
+    if template_size is not None and tuple(template_size) != tuple(size):
+        template += template_size[0] * template_size[1] * RGBA_BYTES_PER_PIXEL
+
+    strips_in_flight = max(1, min(effect_workers, math.ceil(height / strip_height)))
+    strip_pixels = width * min(strip_height, height)
+
+    # Effects keep their input and build a new image from processed strips
+    effects_peak = template + image
+    for index, effect in enumerate(effects):
+        previous = image if index > 0 else 0
+        effects_peak = max(effects_peak, (
+            template + previous + image
+            + pixels * EFFECT_IMAGE_BYTES_PER_PIXEL.get(effect, 0)
+            + strips_in_flight * strip_pixels * EFFECT_STRIP_BYTES_PER_PIXEL.get(effect, RGBA_BYTES_PER_PIXEL)
+        ))
+
+    encode_per_pixel = ENCODE_BYTES_PER_PIXEL.get(image_format.upper(), DEFAULT_ENCODE_BYTES_PER_PIXEL)
+    phases = {
+        'background_effects': effects_peak,
+        'drawing': template + image,
+        'encode': template + image + pixels * encode_per_pixel,
+    }
+    return MemoryEstimate(peak_bytes=max(phases.values()), phases=phases)
+
+
+def plan_render(budget: Optional[MemoryBudget], size: Tuple[int, int],
+                effects: Sequence[str], image_format: str = 'PNG',
+                effect_workers: int = 1, strip_height: int = 256) -> RenderPlan:
+    """
+    Decide how to run a render so its estimate fits the memory budget.
+
+    Returns:
+        RenderPlan: Size, effect workers and estimate to render with
+
+    Raises:
+        MemoryBudgetExceeded: If the policy cannot make the render fit
+    """
+    def plan(workers: int, scale: float = 1.0) -> RenderPlan:
+        scaled = size if scale == 1.0 else (max(1, int(size[0] * scale)), max(1, int(size[1] * scale)))
+        estimate = estimate_render_memory(scaled, effects, image_format, workers,
+                                          strip_height, template_size=size)
+        return RenderPlan(size=scaled, effect_workers=workers, estimate=estimate, scale=scale)
+
+    full = plan(effect_workers)
+    if budget is None or full.estimate.peak_bytes <= budget.limit_bytes:
+        return full
+
+    if budget.policy != BudgetPolicy.REFUSE:
+        tiled = plan(1)
+        if tiled.estimate.peak_bytes <= budget.limit_bytes:
+            return tiled
+
+        if budget.policy == BudgetPolicy.DOWNSCALE:
+            # Memory grows with the pixel count, so start from the square root of the ratio
+            scale = math.sqrt(budget.limit_bytes / tiled.estimate.peak_bytes)
+            while scale >= MIN_DOWNSCALE:
+                downscaled = plan(1, scale)
+                if downscaled.estimate.peak_bytes <= budget.limit_bytes:
+                    return downscaled
+                scale *= 0.9
+
+    raise MemoryBudgetExceeded(
+        f"Render of {size[0]}x{size[1]} needs about {full.estimate.peak_bytes / 2**20:.0f} MiB, "
+        f"over the {budget.limit_bytes / 2**20:.0f} MiB budget ({budget.policy.value} policy)"
+    )
+
+
+def current_rss() -> Optional[int]:
+    """Get the resident set size of this process in bytes, None where unavailable"""
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RssSampler:
+    """
+    Context manager tracking the peak RSS of the process during a block.
+
+    Where RSS cannot be read (no /proc), the peak and growth stay None.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Initialize the sampler.
+
+        Args:
+            interval: Seconds between RSS samples
+        """
+        self.interval = interval
+        self.baseline_bytes: Optional[int] = None
+        self.peak_bytes: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def growth_bytes(self) -> Optional[int]:
+        """Peak RSS above the RSS when the block started"""
+        if self.peak_bytes is None:
+            return None
+        return self.peak_bytes - self.baseline_bytes
+
+    def __enter__(self) -> 'RssSampler':
+        self.baseline_bytes = self.peak_bytes = current_rss()
+        if self.baseline_bytes is not None:
+            self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._record()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._record()
+
+    def _record(self) -> None:
+        rss = current_rss()
+        if rss is not None and rss > self.peak_bytes:
+            self.peak_bytes = rss
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Non-Blocking Replicate Predictions
+
+`replicate.run` holds a thread for the whole model runtime. This module talks
+to the Replicate HTTP API directly instead: `submit()` creates a prediction
+and returns a handle at once, and handles finish either through bulk polling
+from a single thread or through a local webhook receiver that Replicate
+calls when a prediction completes. One process can keep dozens of
+generations in flight this way without a thread per generation.
+
+    client = PredictionClient(api_token)
+    handles = [client.submit(model, {"prompt": p}, timeout=300) for p in prompts]
+    for handle in client.poll(handles):
+        print(handle.id, handle.status, handle.output)
+
+The base URL is configurable, so the client can be pointed at a local
+stand-in server in tests.
+"""
+
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional
+
+from services.downloads import get_session
+from services.metrics import counter, histogram
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = 'https://api.replicate.com'
+
+TERMINAL_STATUSES = frozenset({'succeeded', 'failed', 'canceled'})
+
+# Webhooks signed further than this from now are rejected as replays
+WEBHOOK_TOLERANCE_SECONDS = 300
+
+SUBMITTED = counter('predictions_submitted_total', "Predictions submitted", ['model'])
+COMPLETED = counter('predictions_completed_total', "Predictions finished by status", ['model', 'status'])
+TIMEOUTS = counter('predictions_timed_out_total', "Predictions canceled for running past their timeout")
+POLLS = counter('predictions_polls_total', "Prediction status requests")
+WEBHOOKS = counter('predictions_webhooks_total', "Webhook deliveries by result", ['result'])
+PREDICTION_RUNTIME = histogram('predictions_runtime_seconds', "Time from submission to completion", ['model'])
+
+
+class PredictionError(Exception):
+    """Prediction failed or was canceled"""
+
+
+class PredictionTimeout(PredictionError):
+    """Prediction ran past its timeout and was canceled"""
+
+
+class PredictionHandle:
+    """
+    A submitted prediction, updated by polling or by webhook deliveries.
+
+    `context` carries whatever the submitter needs to finish the job, such
+    as where to save the output.
+    """
+
+    def __init__(self, payload: Mapping[str, Any], model: str,
+                 timeout: Optional[float] = None, context: Optional[Dict[str, Any]] = None):
+        self.id = payload['id']
+        self.model = model
+        self.context = context or {}
+        self.submitted_at = time.monotonic()
+        self.deadline = self.submitted_at + timeout if timeout is not None else None
+        self.completed_at: Optional[float] = None
+        self.timed_out = False
+        self.status = 'starting'
+        self.output: Any = None
+        self.error: Optional[str] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self.update(payload)
+
+    def update(self, payload: Mapping[str, Any]) -> bool:
+        """
+        Apply a prediction object from the API.
+
+        Returns:
+            bool: True if this update finished the prediction
+        """
+        with self._lock:
+            if self._done.is_set():
+                return False
+            self.status = payload.get('status', self.status)
+            self.output = payload.get('output', self.output)
+            self.error = payload.get('error') or self.error
+            if self.status not in TERMINAL_STATUSES:
+                return False
+            self.completed_at = time.monotonic()
+            self._done.set()
+
+        COMPLETED.inc(model=self.model, status=self.status)
+        PREDICTION_RUNTIME.observe(self.elapsed, model=self.model)
+        return True
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since submission, or until completion once done"""
+        return (self.completed_at or time.monotonic()) - self.submitted_at
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the prediction finishes, returning whether it did"""
+        return self._done.wait(timeout)
+
+    def result(self) -> Any:
+        """
+        Get the output of a finished prediction.
+
+        Raises:
+            PredictionTimeout: If the prediction was canceled for taking too long
+            PredictionError: If it failed, was canceled or is still running
+        """
+        if not self.done:
+            raise PredictionError(f"Prediction {self.id} is still {self.status}")
+        if self.timed_out:
+            raise PredictionTimeout(f"Prediction {self.id} timed out after {self.elapsed:.0f}s")
+        if self.status != 'succeeded':
+            raise PredictionError(f"Prediction {self.id} {self.status}: {self.error or 'no error given'}")
+        return self.output
+
+    def __repr__(self) -> str:
+        return f"PredictionHandle({self.id!r}, {self.model!r}, status={self.status!r})"
+
+
+def _webhook_signature(secret: str, webhook_id: str, timestamp: str, body: bytes) -> str:
+    """HMAC-SHA256 of "<webhook-id>.<webhook-timestamp>.<body>" under a "whsec_..." secret, base64 encoded"""
+    key = base64.b64decode(secret.split('_', 1)[-1])
+    signed = f"{webhook_id}.{timestamp}.".encode('utf-8') + body
+    return base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode('ascii')
+
+
+def sign_webhook(secret: str, webhook_id: str, body: bytes, timestamp: Optional[float] = None) -> Dict[str, str]:
+    """
+    Get the headers Replicate signs a webhook delivery with.
+
+    Args:
+        secret: Webhook signing secret, "whsec_..."
+        webhook_id: Unique id of the delivery
+        body: Exact bytes delivered
+        timestamp: Unix time of the delivery, now if None
+    """
+    timestamp = str(int(time.time() if timestamp is None else timestamp))
+    return {'webhook-id': webhook_id, 'webhook-timestamp': timestamp,
+            'webhook-signature': f"v1,{_webhook_signature(secret, webhook_id, timestamp, body)}"}
+
+
+def verify_webhook_signature(secret: str, headers: Mapping[str, str], body: bytes,
+                             tolerance: float = WEBHOOK_TOLERANCE_SECONDS,
+                             now: Optional[float] = None) -> bool:
+    """
+    Check a webhook's signature, as Replicate signs them.
+
+    The signed content is "<webhook-id>.<webhook-timestamp>.<body>", signed
+    with HMAC-SHA256 using the base64 part of the "whsec_..." secret. The
+    timestamp must be within tolerance seconds of now, so a captured
+    delivery cannot be replayed later.
+    """
+    webhook_id = headers.get('webhook-id')
+    timestamp = headers.get('webhook-timestamp')
+    signatures = headers.get('webhook-signature')
+    if not (webhook_id and timestamp and signatures):
+        return False
+    try:
+        if abs((time.time() if now is None else now) - int(timestamp)) > tolerance:
+            return False
+    except ValueError:
+        return False
+
+    expected = _webhook_signature(secret, webhook_id, timestamp, body)
+    return any(hmac.compare_digest(expected, signature.split(',', 1)[-1])
+               for signature in signatures.split())
+
+
+class WebhookReceiver:
+    """
+    Local HTTP endpoint that completes handles from Replicate's webhooks.
+
+    Replicate must be able to reach `url`; behind NAT or a tunnel pass the
+    public URL that forwards to this receiver. Deliveries must be signed with
+    the webhook secret, since they decide which URLs templates are downloaded
+    from.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 public_url: Optional[str] = None, secret: Optional[str] = None,
+                 path: str = '/webhook', allow_unsigned: bool = False):
+        """
+        Initialize the receiver.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on, any free port if 0
+            public_url: URL Replicate should call, if not the local address
+            secret: Webhook signing secret, REPLICATE_WEBHOOK_SECRET by default
+            path: Path deliveries are accepted on
+            allow_unsigned: Accept unsigned deliveries when there is no secret (for local testing only)
+
+        Raises:
+            ValueError: If there is no secret and unsigned deliveries are not allowed
+        """
+        secret = secret or os.getenv('REPLICATE_WEBHOOK_SECRET')
+        if not secret and not allow_unsigned:
+            raise ValueError("A webhook secret is required (set REPLICATE_WEBHOOK_SECRET), "
+                             "or pass allow_unsigned=True to accept unsigned deliveries")
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self.secret = secret
+        self.path = path
+        self._handles: Dict[str, PredictionHandle] = {}
+        self._listeners: List[threading.Event] = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        if self.public_url:
+            return self.public_url
+        if self._server is None:
+            raise RuntimeError("Webhook receiver is not running")
+        return f"http://{self.host}:{self._server.server_address[1]}{self.path}"
+
+    def register(self, handle: PredictionHandle, wakeup: Optional[threading.Event] = None) -> None:
+        """Route deliveries for a prediction to its handle, setting wakeup on each"""
+        with self._lock:
+            self._handles[handle.id] = handle
+            if wakeup is not None and wakeup not in self._listeners:
+                self._listeners.append(wakeup)
+
+    def deliver(self, payload: Mapping[str, Any]) -> bool:
+        """Apply a delivered prediction object, returning whether it matched a handle"""
+        with self._lock:
+            handle = self._handles.get(payload.get('id'))
+            listeners = list(self._listeners)
+        if handle is None:
+            WEBHOOKS.inc(result='unknown')
+            return False
+
+        if handle.update(payload):
+            with self._lock:
+                self._handles.pop(handle.id, None)
+        WEBHOOKS.inc(result='ok')
+        for wakeup in listeners:
+            wakeup.set()
+        return True
+
+    def start(self) -> 'WebhookReceiver':
+        """Start serving from a background thread"""
+        # Imported here so importing the generator stays cheap
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        receiver = self
+
+        class WebhookRequestHandler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                if self.path.split('?')[0] != receiver.path:
+                    self.send_error(404)
+                    return
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if receiver.secret and not verify_webhook_signature(receiver.secret, self.headers, body):
+                    WEBHOOKS.inc(result='bad_signature')
+                    self.send_error(401)
+                    return
+                try:
+                    payload = json.loads(body)
+                except ValueError:
+                    WEBHOOKS.inc(result='invalid')
+                    self.send_error(400)
+                    return
+                # Acknowledge unknown predictions too, so Replicate does not retry them
+                receiver.deliver(payload)
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format: str, *args) -> None:
+                logger.debug(f"{self.address_string()} - {format % args}")
+
+        self._server = ThreadingHTTPServer((self.host, self.port), WebhookRequestHandler)
+        thread = threading.Thread(target=self._server.serve_forever, name="prediction-webhooks", daemon=True)
+        thread.start()
+        logger.info(f"Receiving prediction webhooks on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        """Stop serving"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> 'WebhookReceiver':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+class PredictionClient:
+    """Submits, polls and cancels predictions over the Replicate HTTP API"""
+
+    def __init__(self, api_token: str, base_url: Optional[str] = None,
+                 session: Optional[Any] = None, webhook: Optional[WebhookReceiver] = None,
+                 request_timeout: float = 30):
+        """
+        Initialize the prediction client.
+
+        Args:
+            api_token: Replicate API token
+            base_url: API root, REPLICATE_API_BASE_URL or the public API by default
+            session: requests session to use, the shared pooled session by default
+            webhook: Receiver to have Replicate report completions to
+            request_timeout: Timeout for each API request in seconds
+        """
+        self.api_token = api_token
+        self.base_url = (base_url or os.getenv('REPLICATE_API_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+        self._session = session
+        self.webhook = webhook
+        self.request_timeout = request_timeout
+        # Set whenever a webhook finishes a handle, so poll() wakes up early
+        self._wakeup = threading.Event()
+
+    @property
+    def session(self) -> Any:
+        if self._session is None:
+            self._session = get_session()
+        return self._session
+
+    def _request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        response = self.session.request(
+            method, f"{self.base_url}{path}", json=body, timeout=self.request_timeout,
+            headers={'Authorization': f"Bearer {self.api_token}"},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def submit(self, model: str, model_input: Dict[str, Any], timeout: Optional[float] = None,
+               context: Optional[Dict[str, Any]] = None) -> PredictionHandle:
+        """
+        Create a prediction without waiting for it.
+
+        Args:
+            model: "owner/name" for official models or "owner/name:version"
+            model_input: Model input
+            timeout: Seconds after which poll() cancels the prediction
+            context: Data to keep on the handle for whoever finishes the job
+
+        Returns:
+            PredictionHandle: Handle to poll, wait on or cancel
+        """
+        if ':' in model:
+            path, body = '/v1/predictions', {'version': model.split(':', 1)[1], 'input': model_input}
+        else:
+            path, body = f'/v1/models/{model}/predictions', {'input': model_input}
+        if self.webhook is not None:
+            body['webhook'] = self.webhook.url
+            body['webhook_events_filter'] = ['completed']
+
+        handle = PredictionHandle(self._request('POST', path, body), model, timeout, context)
+        SUBMITTED.inc(model=model)
+        if self.webhook is not None and not handle.done:
+            self.webhook.register(handle, self._wakeup)
+        logger.debug(f"Submitted prediction {handle.id} for {model}")
+        return handle
+
+    def refresh(self, handle: PredictionHandle) -> PredictionHandle:
+        """Fetch a prediction's current state"""
+        POLLS.inc()
+        handle.update(self._request('GET', f'/v1/predictions/{handle.id}'))
+        return handle
+
+    def cancel(self, handle: PredictionHandle) -> PredictionHandle:
+        """Cancel a prediction that has not finished"""
+        if not handle.done:
+            handle.update(self._request('POST', f'/v1/predictions/{handle.id}/cancel'))
+        return handle
+
+    def _expire(self, handle: PredictionHandle) -> None:
+        handle.timed_out = True
+        TIMEOUTS.inc()
+        try:
+            self.cancel(handle)
+        except Exception as e:
+            logger.warning(f"Could not cancel timed out prediction {handle.id}: {e}")
+        handle.update({'status': 'canceled', 'error': 'timed out'})
+
+    def poll(self, handles: Iterable[PredictionHandle], min_interval: float = 0.5,
+             max_interval: float = 10.0, backoff: float = 1.5) -> Iterator[PredictionHandle]:
+        """
+        Wait for predictions from one thread, yielding each as it finishes.
+
+        Each handle is polled on its own schedule, starting at min_interval
+        and backing off towards max_interval while it keeps running. With a
+        webhook receiver, polling only backs up lost deliveries and starts at
+        max_interval. Handles past their timeout are canceled.
+
+        Args:
+            handles: Handles to wait for
+            min_interval: First delay between status requests in seconds
+            max_interval: Longest delay between status requests in seconds
+            backoff: Factor the delay grows by after each request
+
+        Yields:
+            PredictionHandle: Finished handles, in completion order
+        """
+        first_interval = max_interval if self.webhook is not None else min_interval
+        now = time.monotonic()
+        pending = {handle.id: handle for handle in handles}
+        # Next poll time and current interval per handle
+        schedule = {handle_id: (now + first_interval, first_interval) for handle_id in pending}
+
+        while pending:
+            now = time.monotonic()
+            for handle_id, handle in list(pending.items()):
+                if not handle.done and handle.deadline is not None and now >= handle.deadline:
+                    self._expire(handle)
+                if not handle.done:
+                    next_poll, interval = schedule[handle_id]
+                    if now < next_poll:
+                        continue
+                    try:
+                        self.refresh(handle)
+                    except Exception as e:
+                        logger.warning(f"Could not poll prediction {handle_id}: {e}")
+                    interval = min(max_interval, interval * backoff)
+                    schedule[handle_id] = (now + interval, interval)
+                if handle.done:
+                    del pending[handle_id]
+                    yield handle
+
+            if pending:
+                wake_at = min(
+                    min(schedule[handle_id][0] for handle_id in pending),
+                    min((handle.deadline for handle in pending.values() if handle.deadline is not None),
+                        default=float('inf')),
+                )
+                self._wakeup.wait(max(0.0, wake_at - time.monotonic()))
+                self._wakeup.clear()
+
+    def wait_all(self, handles: Iterable[PredictionHandle], **poll_options) -> List[PredictionHandle]:
+        """Wait for all predictions, returning them in completion order"""
+        return list(self.poll(handles, **poll_options))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Rate Limiting for External API Calls
+
+Token bucket shared by the threads that call an external API, so concurrent
+work stays within the provider's request limits.
+"""
+
+import time
+import threading
+from typing import Callable
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill at `rate` per second up to `burst`. A caller that finds the
+    bucket empty reserves the next token and sleeps until it is due, so
+    waiting callers are served in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: int = 1,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            rate: Operations allowed per second
+            burst: Operations allowed back to back after an idle period
+            clock: Monotonic clock in seconds
+            sleep: Sleeps for a number of seconds
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("Rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Wait until an operation may start.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            self._sleep(wait)
+        return wait
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Local Render Server for Florida Surf Break Posters
+
+Long-lived render daemon that keeps the surf break dataset, fonts and decoded
+map templates resident, and renders posters from a bounded priority queue on
+a pool of worker threads. Jobs are submitted over HTTP on a local TCP port or
+a Unix socket, so callers such as the web API routes pay only for rendering.
+
+    POST /render        Submit a job, optionally waiting for it to finish
+    GET  /jobs/<id>     Get the status of a job
+    GET  /health        Get queue and worker status
+    GET  /metrics       Get metrics in the Prometheus text format
+
+When the queue is full, submissions are rejected with 503 and a Retry-After
+header instead of piling up. Requests must be sent as application/json, and
+their template and output paths must lie inside the server's template and
+output roots, so a client cannot read or overwrite other files.
+"""
+
+import os
+import json
+import queue
+import logging
+import argparse
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import IntEnum
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+from services.memory import BudgetPolicy, MemoryBudget
+from services.metrics import CONTENT_TYPE, REGISTRY, counter, gauge, histogram
+from services.poster import FloridaSurfBreakPosterService, MapBounds, PosterStyle, output_format
+from services.render_stats import RenderStats
+from services.singleflight import SingleFlight, render_job_key
+from services.tracing import configure_from_environment, span
+
+
+logger = logging.getLogger(__name__)
+
+# Metrics
+QUEUE_DEPTH = gauge('render_queue_depth', "Jobs waiting in the render queue")
+JOBS = counter('render_jobs_total', "Render jobs by priority and outcome", ['priority', 'outcome'])
+JOBS_COALESCED = counter('render_jobs_coalesced_total', "Render jobs that shared another job's render")
+JOBS_REJECTED = counter('render_jobs_rejected_total', "Render jobs rejected because the queue was full")
+QUEUE_SECONDS = histogram('render_job_queue_seconds', "Time render jobs wait in the queue", ['priority'])
+
+
+class JobPriority(IntEnum):
+    """Job priorities, lower values are rendered first"""
+    PREVIEW = 0
+    PRINT = 1
+
+
+class QueueFullError(Exception):
+    """Raised when the render queue cannot accept more jobs"""
+
+
+@dataclass
+class RenderJob:
+    """A poster render request and its progress"""
+    template_path: str
+    output_path: str
+    style: PosterStyle = PosterStyle.CLASSIC
+    bounds: Optional[MapBounds] = None
+    title: Optional[str] = None
+    priority: JobPriority = JobPriority.PRINT
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = 'queued'
+    error: Optional[str] = None
+    coalesced: bool = False
+    stats: RenderStats = field(default_factory=RenderStats, repr=False)
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get a JSON-serializable view of the job"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'template': self.template_path,
+            'output': self.output_path,
+            'style': self.style.value,
+            'priority': self.priority.name.lower(),
+            'coalesced': self.coalesced,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'stats': self.stats.to_dict(),
+        }
+
+
+class RenderServer:
+    """
+    Render daemon with resident state and a bounded priority job queue.
+
+    Decoded templates are kept in an LRU keyed by path and modification time,
+    so a template re-generated on disk is picked up on its next use. Workers
+    running identical jobs at the same time share a single render.
+    """
+
+    # Number of finished jobs kept for status lookups
+    FINISHED_JOB_HISTORY = 1024
+
+    def __init__(self, poster_service: FloridaSurfBreakPosterService,
+                 workers: int = 2, max_queue: int = 64, template_cache_size: int = 16,
+                 template_root: str = ".", output_root: str = "."):
+        """
+        Initialize the render server.
+
+        Args:
+            poster_service: Poster service holding the resident dataset and fonts
+            workers: Number of render worker threads
+            max_queue: Maximum number of queued jobs before submissions are rejected
+            template_cache_size: Number of decoded templates kept in memory
+            template_root: Directory HTTP jobs may read templates from
+            output_root: Directory HTTP jobs may write posters to
+        """
+        self.poster_service = poster_service
+        self.template_root = Path(template_root).resolve()
+        self.output_root = Path(output_root).resolve()
+        self.output_root.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.max_queue = max_queue
+        self.template_cache_size = template_cache_size
+
+        self._queue: queue.PriorityQueue = queue.PriorityQueue(maxsize=max_queue)
+        self._sequence = itertools.count()
+        self._jobs: OrderedDict = OrderedDict()
+        self._templates: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self.flight = SingleFlight()
+        self.completed = 0
+        self.failed = 0
+        QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    def start(self) -> None:
+        """Start the render worker threads"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"render-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Render server started with {self.workers} workers")
+
+    def stop(self) -> None:
+        """Stop the workers once the jobs already queued are rendered"""
+        for _ in self._threads:
+            self._queue.put((len(JobPriority), next(self._sequence), None))
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, job: RenderJob) -> RenderJob:
+        """
+        Queue a render job.
+
+        Raises:
+            QueueFullError: If the queue is saturated
+        """
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait((job.priority, next(self._sequence), job))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            JOBS_REJECTED.inc()
+            raise QueueFullError(f"Render queue is full ({self.max_queue} jobs)")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[RenderJob]:
+        """Look up a queued, running or recently finished job"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self) -> Dict[str, Any]:
+        """Get queue and worker status information"""
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue': self.max_queue,
+            'workers': self.workers,
+            'templates_cached': len(self._templates),
+            'surf_breaks': len(self.poster_service.surf_breaks),
+            'completed': self.completed,
+            'failed': self.failed,
+            **self.flight.stats(),
+        }
+
+    def _load_template(self, path: str) -> Image.Image:
+        """Get a decoded RGBA template, from memory when it is unchanged on disk"""
+        key = (str(Path(path).resolve()), os.stat(path).st_mtime_ns)
+        with self._lock:
+            image = self._templates.get(key)
+            if image is not None:
+                self._templates.move_to_end(key)
+                return image
+
+        image = Image.open(path).convert("RGBA")
+        with self._lock:
+            self._templates[key] = image
+            while len(self._templates) > self.template_cache_size:
+                self._templates.popitem(last=False)
+        return image
+
+    def _work(self) -> None:
+        """Render jobs from the queue until stopped"""
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+
+            job.status = 'running'
+            job.started_at = time.time()
+            priority = job.priority.name.lower()
+            QUEUE_SECONDS.observe(job.started_at - job.submitted_at, priority=priority)
+            job_span = span('render_server.job', job_id=job.id, style=job.style.value,
+                            priority=priority,
+                            queue_seconds=job.started_at - job.submitted_at)
+            try:
+                with job_span as traced:
+                    key = render_job_key(job.template_path, job.output_path,
+                                         job.style, job.bounds, job.title)
+                    data, job.coalesced = self.flight.do(key, lambda: self._render(job))
+                    with job.stats.stage('save'):
+                        Path(job.output_path).write_bytes(data)
+                    job.stats.count('bytes_written', len(data))
+                    traced.set_attributes(coalesced=job.coalesced, bytes=len(data))
+                job.status = 'done'
+                JOBS.inc(priority=priority, outcome='done')
+                if job.coalesced:
+                    JOBS_COALESCED.inc()
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                logger.error(f"Error rendering job {job.id}: {e}")
+                job.status = 'failed'
+                job.error = str(e)
+                JOBS.inc(priority=priority, outcome='failed')
+                with self._lock:
+                    self.failed += 1
+            finally:
+                job.finished_at = time.time()
+                if self.poster_service.stats_hook is not None:
+                    self.poster_service._emit_stats(job.stats)
+                job.done.set()
+                self._forget_finished_jobs()
+
+    def _render(self, job: RenderJob) -> bytes:
+        """Render and encode the poster for a job"""
+        data, _ = self.poster_service.render_poster_bytes(
+            job.template_path, job.style, job.bounds, job.title,
+            output_format(job.output_path),
+            template_loader=lambda: self._load_template(job.template_path),
+            stats=job.stats
+        )
+        return data
+
+    def _forget_finished_jobs(self) -> None:
+        """Trim the finished job history to its maximum size"""
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()]
+            for job_id in finished[:max(0, len(finished) - self.FINISHED_JOB_HISTORY)]:
+                del self._jobs[job_id]
+
+    def serve_http(self, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+        """Create an HTTP server for this render server on a local TCP port"""
+        return ThreadingHTTPServer((host, port), self._handler_class())
+
+    def serve_unix(self, socket_path: str) -> 'UnixHTTPServer':
+        """Create an HTTP server for this render server on a Unix socket"""
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return UnixHTTPServer(socket_path, self._handler_class())
+
+    def _handler_class(self):
+        """Build a request handler class bound to this render server"""
+        server = self
+
+        class Handler(RenderRequestHandler):
+            render_server = server
+
+        return Handler
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """Threaded HTTP server listening on a Unix domain socket"""
+    daemon_threads = True
+
+
+def confine_path(path: str, root: Path) -> str:
+    """
+    Resolve a requested path, relative to root unless absolute.
+
+    Raises:
+        ValueError: If the path resolves outside root
+    """
+    resolved = (root / path).resolve()
+    if not resolved.is_relative_to(root):
+        raise ValueError(f"Path {path} is outside {root}")
+    return str(resolved)
+
+
+def parse_job(payload: Dict[str, Any], template_root: Path, output_root: Path) -> Tuple[RenderJob, bool]:
+    """
+    Build a render job from a JSON request body.
+
+    Args:
+        payload: Decoded request body
+        template_root: Resolved directory the template must be inside
+        output_root: Resolved directory the output must be inside
+
+    Returns:
+        Tuple of the job and whether the caller waits for it to finish
+
+    Raises:
+        ValueError: If the request is invalid
+    """
+    try:
+        bounds = payload.get('bounds')
+        job = RenderJob(
+            template_path=confine_path(payload['template'], template_root),
+            output_path=confine_path(payload['output'], output_root),
+            style=PosterStyle(payload.get('style', PosterStyle.CLASSIC.value)),
+            bounds=MapBounds(**bounds) if bounds else None,
+            title=payload.get('title'),
+            priority=JobPriority[payload.get('priority', 'print').upper()],
+        )
+    except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid render request: {e}")
+    return job, bool(payload.get('wait', False))
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """JSON API for the render server"""
+
+    render_server: RenderServer
+
+    # Maximum time a waiting request blocks for its job
+    WAIT_TIMEOUT = 300.0
+
+    def do_GET(self) -> None:
+        if self.path == '/health':
+            self._send_json(200, self.render_server.status())
+        elif self.path == '/metrics':
+            data = REGISTRY.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif self.path.startswith('/jobs/'):
+            job = self.render_server.get_job(self.path[len('/jobs/'):])
+            if job is None:
+                self._send_json(404, {'error': 'Unknown job'})
+            else:
+                self._send_json(200, job.to_dict())
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self) -> None:
+        if self.path != '/render':
+            self._send_json(404, {'error': 'Not found'})
+            return
+
+        # Browsers send cross-origin text/plain posts without a preflight; JSON ones need one
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._send_json(415, {'error': 'Content-Type must be application/json'})
+            return
+
+        server = self.render_server
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            job, wait = parse_job(json.loads(self.rfile.read(length) or b'{}'),
+                                  server.template_root, server.output_root)
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+
+        try:
+            server.submit(job)
+        except QueueFullError as e:
+            self._send_json(503, {'error': str(e)}, {'Retry-After': '1'})
+            return
+
+        if wait and job.done.wait(self.WAIT_TIMEOUT):
+            self._send_json(200 if job.status == 'done' else 500, job.to_dict())
+        else:
+            self._send_json(202, job.to_dict())
+
+    def _send_json(self, status: int, body: Dict[str, Any],
+                   headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+def main():
+    """Run the render server"""
+    parser = argparse.ArgumentParser(description="Local Florida surf break poster render server")
+    parser.add_argument('--data', default='scrapers/data/florida_surf_breaks_full.json',
+                        help="Surf break JSON data file")
+    parser.add_argument('--host', default='127.0.0.1', help="Host to listen on")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on")
+    parser.add_argument('--unix-socket', help="Listen on this Unix socket instead of a TCP port")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Render worker threads")
+    parser.add_argument('--max-queue', type=int, default=64, help="Maximum queued jobs")
+    parser.add_argument('--template-root', default='ai_generated_templates',
+                        help="Directory jobs may read templates from")
+    parser.add_argument('--output-root', default='ai_generated_posters',
+                        help="Directory jobs may write posters to")
+    parser.add_argument('--watch', action='store_true', help="Reload the data file when it changes")
+    parser.add_argument('--memory-budget', type=int, help="Memory budget per render in MiB")
+    parser.add_argument('--memory-policy', default=BudgetPolicy.TILED.value,
+                        choices=[policy.value for policy in BudgetPolicy],
+                        help="What to do with renders over the memory budget")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    configure_from_environment()
+
+    memory_budget = None
+    if args.memory_budget:
+        memory_budget = MemoryBudget(args.memory_budget * 2**20, BudgetPolicy(args.memory_policy))
+
+    poster_service = FloridaSurfBreakPosterService(data_path=args.data, memory_budget=memory_budget)
+    if args.watch:
+        poster_service.start_watching()
+
+    render_server = RenderServer(poster_service, workers=args.workers, max_queue=args.max_queue,
+                                 template_root=args.template_root, output_root=args.output_root)
+    render_server.start()
+
+    if args.unix_socket:
+        http_server = render_server.serve_unix(args.unix_socket)
+        print(f"🖨️  Render server listening on {args.unix_socket}")
+    else:
+        http_server = render_server.serve_http(args.host, args.port)
+        print(f"🖨️  Render server listening on http://{args.host}:{args.port}")
+
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+        render_server.stop()
+        poster_service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Per-Stage Render Instrumentation
+
+Collects a timing breakdown and counters for each poster render. Stats are
+only collected when a caller asks for them; otherwise renders use the shared
+no-op NULL_STATS, so disabled instrumentation costs a few attribute lookups.
+Timed stages are also recorded as 'render.<stage>' tracing spans.
+"""
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator
+
+from services.tracing import span
+
+
+# Stage names in render order
+STAGES = (
+    'cache_lookup',
+    'template_load',
+    'background_effects',
+    'markers',
+    'labels',
+    'legend',
+    'title',
+    'save',
+)
+
+
+@dataclass
+class RenderStats:
+    """Timing breakdown (seconds per stage) and counters for one render"""
+    stages: Dict[str, float] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+
+    enabled = True
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block of work, adding to the stage's total"""
+        start = time.perf_counter()
+        try:
+            with span(f"render.{name}"):
+                yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Add time spent in a stage"""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Increment a counter"""
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @property
+    def total_seconds(self) -> float:
+        """Total time across all stages"""
+        return sum(self.stages.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get a JSON-serializable view of the stats"""
+        return {
+            'stages': dict(self.stages),
+            'counters': dict(self.counters),
+            'total_seconds': self.total_seconds,
+        }
+
+
+class _NullStats(RenderStats):
+    """Stats sink that records nothing"""
+
+    enabled = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+    def add_time(self, name: str, seconds: float) -> None:
+        pass
+
+    def count(self, name: str, amount: int = 1) -> None:
+        pass
+
+
+NULL_STATS: RenderStats = _NullStats()
+
+# Called with the stats of each finished render
+StatsHook = Callable[[RenderStats], None]
@@ -7,34 +7,78 @@ optimized for surf break poster creation with proper coastal spacing for text la
 """
 
 import os
-import requests
+import time
+import shutil
 import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 from enum import Enum
 
-# Try to load dotenv if available
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-    print("✅ Loaded .env file")
-except ImportError:
-    print("⚠️  python-dotenv not installed. Install with: pip install python-dotenv")
-except Exception as e:
-    print(f"⚠️  Could not load .env file: {e}")
+from services.content_cache import ContentCache, hash_inputs
+from services.metrics import BYTE_BUCKETS, counter, histogram
+from services.rate_limit import RateLimiter
+from services.resilience import (CircuitBreaker, RetryBudget, RetryPolicy, call_with_retries,
+                                 classify_error)
+from services.tracing import span
+
+if TYPE_CHECKING:
+    # Imported when a generator is created, so importing this module stays cheap
+    from services.backends import GeneratorBackend
+    from services.downloads import Downloader, DownloadResult
+    from services.predictions import PredictionClient, PredictionHandle
 
-# Try to import replicate with better error handling
-try:
-    import replicate
-    print("✅ Replicate module imported successfully")
-except ImportError:
-    print("❌ Replicate package not found. Install with: pip install replicate")
-    raise ImportError("Please install replicate: pip install replicate")
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Metrics
+PREDICTIONS = counter('generator_predictions_total', "Replicate predictions by model and outcome",
+                      ['model', 'outcome'])
+PREDICTION_SECONDS = histogram('generator_prediction_seconds', "Replicate prediction latency", ['model'])
+DOWNLOADS = counter('generator_downloads_total', "Template downloads by outcome", ['outcome'])
+DOWNLOAD_SECONDS = histogram('generator_download_seconds', "Template download latency")
+DOWNLOAD_BYTES = histogram('generator_download_bytes', "Size of downloaded templates", buckets=BYTE_BUCKETS)
+BYTES_DOWNLOADED = counter('generator_bytes_downloaded_total', "Bytes of templates downloaded")
+TEMPLATE_CACHE_LOOKUPS = counter('generator_template_cache_lookups_total',
+                                 "Template cache lookups by result", ['result'])
+RATE_LIMIT_WAIT_SECONDS = counter('generator_rate_limit_wait_seconds_total',
+                                  "Time predictions waited for the rate limiter")
+
+
+def _import_replicate():
+    """Import the replicate client on first use so importing this module stays cheap"""
+    try:
+        import replicate
+    except ImportError:
+        raise ImportError("Please install replicate: pip install replicate")
+    return replicate
+
+
+_dotenv_loaded = False
+
+
+def load_environment() -> None:
+    """Load a .env file into the environment once, if python-dotenv is installed"""
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    _dotenv_loaded = True
+    
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        logger.debug("python-dotenv not installed, skipping .env file")
+        return
+    
+    try:
+        load_dotenv()
+    except Exception as e:
+        logger.warning(f"Could not load .env file: {e}")
+
 
 class MapStyle(Enum):
     """Available map styles for AI generation"""
@@ -47,6 +91,30 @@ class MapStyle(Enum):
     BOTANICAL = "botanical"
 
 
+@dataclass
+class StyleResult:
+    """Outcome of generating the template for one style"""
+    style: MapStyle
+    path: Optional[str] = None
+    error: Optional[Exception] = None
+    
+    @property
+    def ok(self) -> bool:
+        """Whether the template was generated"""
+        return self.error is None
+
+
+@dataclass
+class GeneratedTemplate:
+    """Encoded template generated in memory, or read from the template cache"""
+    data: bytes
+    name: str  # style value or custom style name
+    cache_key: str
+    metadata: Dict  # generation inputs, stored with the template cache entry
+    cached: bool = False
+    seconds: float = 0.0  # time spent generating and downloading it
+
+
 class FloridaMapGenerator:
     """
     Service for generating AI-powered Florida map templates using Replicate API.
@@ -62,6 +130,28 @@ class FloridaMapGenerator:
         'sdxl': 'stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b'
     }
     
+    # Model inputs besides the prompt and size, shared by every prediction
+    GENERATION_PARAMS = {
+        "num_outputs": 1,
+        "quality": 95,
+        "guidance": 7.5,  # Good balance for following prompt
+    }
+    
+    # Predictions started per second across all threads, and the burst allowed
+    PREDICTION_RATE = 5.0
+    PREDICTION_BURST = 10
+    
+    # Templates generated at the same time by generate_all_styles
+    DEFAULT_CONCURRENCY = 4
+    
+    # Consecutive transient failures that open a model's circuit breaker, and
+    # how long it stays open before a trial prediction
+    BREAKER_FAILURE_THRESHOLD = 5
+    BREAKER_RESET_SECONDS = 30.0
+    
+    # Retries a batch of styles may spend per style, shared by the batch
+    RETRIES_PER_STYLE = 2
+    
     # Style-specific prompts optimized for surf break labeling
     STYLE_PROMPTS = {
         MapStyle.CLASSIC: {
@@ -129,13 +219,40 @@ class FloridaMapGenerator:
         }
     }
     
-    def __init__(self, api_token: Optional[str] = None):
+    def __init__(self, api_token: Optional[str] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 template_cache: Optional[ContentCache] = None,
+                 downloader: Optional['Downloader'] = None,
+                 prediction_client: Optional['PredictionClient'] = None,
+                 backend: Optional['GeneratorBackend'] = None,
+                 retry_policy: Optional[RetryPolicy] = None):
         """
         Initialize the Florida Map Generator.
         
         Args:
             api_token: Replicate API token. If None, reads from REPLICATE_API_TOKEN environment variable
+            rate_limiter: Limits how often predictions start, shared by all threads
+            template_cache: Cache of generated templates keyed by all generation inputs
+            downloader: Downloads generated images, over the shared pooled session by default,
+                copying file:// URLs only if the backend produces them
+            prediction_client: Client for non-blocking predictions, created on first use by default
+            backend: Runs predictions, chosen by POSTER_GENERATOR_BACKEND (Replicate) by default
+            retry_policy: Attempts and backoff for transient prediction errors
         """
+        from services.backends import create_backend
+        from services.downloads import Downloader
+        
+        load_environment()
+        self._owns_backend = backend is None
+        self.backend = backend or create_backend()
+        self.rate_limiter = rate_limiter or RateLimiter(self.PREDICTION_RATE, self.PREDICTION_BURST)
+        self.template_cache = template_cache
+        self.downloader = downloader or Downloader(allow_file_urls=self.backend.allow_file_urls)
+        self._prediction_client = prediction_client
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        
         # Try multiple ways to get the API token
         self.api_token = (
             api_token or 
@@ -143,6 +260,10 @@ class FloridaMapGenerator:
             os.environ.get('REPLICATE_API_TOKEN')
         )
         
+        if not self.backend.requires_token:
+            logger.info(f"Using the {self.backend.name} generator backend")
+            return
+        
         if not self.api_token:
             print("❌ No Replicate API token found!")
             print("📋 To fix this:")
@@ -166,17 +287,26 @@ class FloridaMapGenerator:
         width: int = 1024, 
         height: int = 1024,
         model: str = 'flux-schnell',
-        save_path: Optional[str] = None
+        save_path: Optional[str] = None,
+        seed: Optional[int] = None,
+        force_regenerate: bool = False,
+        retry_budget: Optional[RetryBudget] = None
     ) -> str:
         """
         Generate a Florida map template in the specified style.
         
+        Transient errors (rate limits, 5xx, timeouts) are retried with
+        backoff, spending from retry_budget if one is given.
+        
         Args:
             style: Map style to generate
             width: Image width in pixels
             height: Image height in pixels
             model: AI model to use for generation
             save_path: Optional path to save the generated image
+            seed: Model seed, for reproducible generations
+            force_regenerate: Run a new prediction even if the template is cached
+            retry_budget: Retries shared with other generations, such as the rest of a collection
             
         Returns:
             str: Path to the generated image file
@@ -184,49 +314,36 @@ class FloridaMapGenerator:
         if model not in self.MODELS:
             raise ValueError(f"Unsupported model: {model}. Available: {list(self.MODELS.keys())}")
         
-        style_config = self.STYLE_PROMPTS[style]
+        enhanced_prompt = self._style_prompt(style)
         
-        # Enhanced prompt with specific requirements for surf break labeling
-        enhanced_prompt = (
-            f"{style_config['prompt']} "
-            f"IMPORTANT: Ensure wide margins around the entire coastline (at least 15% of image width) "
-            f"for text label placement. The state outline should be centered with generous white space "
-            f"or background space around all edges. Optimize for text readability and label placement. "
-            f"Style: {style_config['style_keywords']}"
-        )
+        save_path = save_path or self._default_save_path(style)
+        cache_key = self.template_cache_key(model, enhanced_prompt, width, height, seed)
+        if self._restore_cached_template(cache_key, save_path, force_regenerate):
+            logger.info(f"Reusing cached {style.value} map: {save_path}")
+            return save_path
         
         logger.info(f"Generating {style.value} style Florida map using {model}")
         logger.info(f"Dimensions: {width}x{height}")
         
         try:
-            # Test that replicate.run exists
-            if not hasattr(replicate, 'run'):
-                raise AttributeError(
-                    "replicate.run not found. You may have an old version of replicate. "
-                    "Try: pip install --upgrade replicate"
-                )
-            
-            # Generate the image using Replicate
-            output = replicate.run(
-                self.MODELS[model],
-                input={
-                    "prompt": enhanced_prompt,
-                    "width": width,
-                    "height": height,
-                    "num_outputs": 1,
-                    "quality": 95,
-                    "guidance": 7.5,  # Good balance for following prompt
-                }
+            # Generate the image using the backend
+            output = self._run_prediction(
+                model, self._model_input(enhanced_prompt, width, height, seed), retry_budget
             )
             
-            # Handle the output
-            if isinstance(output, list) and len(output) > 0:
-                image_url = str(output[0])
-            else:
-                image_url = str(output)
+            image_url = self._output_url(output)
             
             # Download and save the image
             image_path = self._download_image(image_url, style, save_path)
+            self._cache_template(cache_key, image_path, {
+                'style': style.value,
+                'model': model,
+                'prompt': enhanced_prompt,
+                'width': width,
+                'height': height,
+                'seed': seed,
+                'source_url': image_url,
+            })
             
             logger.info(f"Successfully generated {style.value} map: {image_path}")
             return image_path
@@ -240,7 +357,11 @@ class FloridaMapGenerator:
         output_dir: str = "generated_maps",
         width: int = 1024,
         height: int = 1024,
-        model: str = 'flux-schnell'
+        model: str = 'flux-schnell',
+        max_concurrency: Optional[int] = None,
+        on_complete: Optional[Callable[[StyleResult], None]] = None,
+        force_regenerate: bool = False,
+        retry_budget: Optional[RetryBudget] = None
     ) -> Dict[MapStyle, str]:
         """
         Generate Florida map templates in all available styles.
@@ -250,37 +371,84 @@ class FloridaMapGenerator:
             width: Image width in pixels
             height: Image height in pixels
             model: AI model to use for generation
+            max_concurrency: Maximum templates generated at the same time
+            on_complete: Called with each style's result as soon as it finishes
+            force_regenerate: Run new predictions even for cached templates
+            retry_budget: Retries the whole set may spend, RETRIES_PER_STYLE per style by default
             
         Returns:
             Dict mapping styles to their generated file paths
         """
-        # Create output directory
-        Path(output_dir).mkdir(exist_ok=True)
-        
         generated_maps = {}
         
-        for style in MapStyle:
-            try:
-                save_path = os.path.join(output_dir, f"florida_map_{style.value}.png")
-                
-                map_path = self.generate_map_template(
-                    style=style,
-                    width=width,
-                    height=height,
-                    model=model,
-                    save_path=save_path
-                )
-                
-                generated_maps[style] = map_path
-                logger.info(f"✅ Generated {style.value} style map")
-                
-            except Exception as e:
-                logger.error(f"❌ Failed to generate {style.value} style: {e}")
-                continue
+        for result in self.iter_generate_styles(
+            list(MapStyle), output_dir, width, height, model, max_concurrency, force_regenerate,
+            retry_budget
+        ):
+            if result.ok:
+                generated_maps[result.style] = result.path
+                logger.info(f"✅ Generated {result.style.value} style map")
+            else:
+                logger.error(f"❌ Failed to generate {result.style.value} style: {result.error}")
+            
+            if on_complete is not None:
+                on_complete(result)
         
         logger.info(f"Generated {len(generated_maps)} map templates in {output_dir}")
         return generated_maps
     
+    def iter_generate_styles(
+        self,
+        styles: Sequence[MapStyle],
+        output_dir: str = "generated_maps",
+        width: int = 1024,
+        height: int = 1024,
+        model: str = 'flux-schnell',
+        max_concurrency: Optional[int] = None,
+        force_regenerate: bool = False,
+        retry_budget: Optional[RetryBudget] = None
+    ) -> Iterator[StyleResult]:
+        """
+        Generate templates for several styles concurrently.
+        
+        Predictions start no faster than the rate limiter allows, and at most
+        max_concurrency run at once, so a full style set takes about one
+        prediction's latency when the cap covers every style. Retries of
+        transient errors come from one budget for the whole set
+        (RETRIES_PER_STYLE per style unless retry_budget is given).
+        
+        Yields:
+            StyleResult for each style, in completion order
+        """
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        workers = max(1, min(max_concurrency or self.DEFAULT_CONCURRENCY, len(styles) or 1))
+        if retry_budget is None:
+            retry_budget = RetryBudget(self.RETRIES_PER_STYLE * len(styles))
+        
+        def generate(style: MapStyle) -> str:
+            return self.generate_map_template(
+                style=style,
+                width=width,
+                height=height,
+                model=model,
+                save_path=os.path.join(output_dir, f"florida_map_{style.value}.png"),
+                force_regenerate=force_regenerate,
+                retry_budget=retry_budget
+            )
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="map-generator") as pool:
+            # Run each job in a copy of this context so its spans nest under the caller's
+            futures = {
+                pool.submit(contextvars.copy_context().run, generate, style): style
+                for style in styles
+            }
+            for future in as_completed(futures):
+                style = futures[future]
+                try:
+                    yield StyleResult(style=style, path=future.result())
+                except Exception as e:
+                    yield StyleResult(style=style, error=e)
+    
     def generate_custom_map(
         self,
         custom_prompt: str,
@@ -288,7 +456,10 @@ class FloridaMapGenerator:
         width: int = 1024,
         height: int = 1024,
         model: str = 'flux-schnell',
-        save_path: Optional[str] = None
+        save_path: Optional[str] = None,
+        seed: Optional[int] = None,
+        force_regenerate: bool = False,
+        retry_budget: Optional[RetryBudget] = None
     ) -> str:
         """
         Generate a Florida map with a fully custom prompt.
@@ -300,6 +471,9 @@ class FloridaMapGenerator:
             height: Image height in pixels
             model: AI model to use
             save_path: Optional path to save the generated image
+            seed: Model seed, for reproducible generations
+            force_regenerate: Run a new prediction even if the template is cached
+            retry_budget: Retries shared with other generations
             
         Returns:
             str: Path to the generated image file
@@ -307,40 +481,37 @@ class FloridaMapGenerator:
         if model not in self.MODELS:
             raise ValueError(f"Unsupported model: {model}. Available: {list(self.MODELS.keys())}")
         
-        # Add coastal spacing requirements to any custom prompt
-        enhanced_prompt = (
-            f"{custom_prompt} "
-            f"CRITICAL: Include wide margins around the entire Florida coastline "
-            f"(minimum 15% of image dimensions) for text label placement. "
-            f"Center the state with generous background space on all sides."
-        )
+        enhanced_prompt = self._custom_prompt(custom_prompt)
+        
+        save_path = save_path or self._default_save_path(style_name)
+        cache_key = self.template_cache_key(model, enhanced_prompt, width, height, seed)
+        if self._restore_cached_template(cache_key, save_path, force_regenerate):
+            logger.info(f"Reusing cached custom map: {save_path}")
+            return save_path
         
         logger.info(f"Generating custom Florida map: {style_name}")
         
         try:
-            output = replicate.run(
-                self.MODELS[model],
-                input={
-                    "prompt": enhanced_prompt,
-                    "width": width,
-                    "height": height,
-                    "num_outputs": 1,
-                    "quality": 95,
-                    "guidance": 7.5,
-                }
+            output = self._run_prediction(
+                model, self._model_input(enhanced_prompt, width, height, seed), retry_budget
             )
             
-            # Handle the output
-            if isinstance(output, list) and len(output) > 0:
-                image_url = str(output[0])
-            else:
-                image_url = str(output)
+            image_url = self._output_url(output)
             
             # Create a temporary MapStyle for the custom style
             class CustomStyle(Enum):
                 CUSTOM = style_name
             
             image_path = self._download_image(image_url, CustomStyle.CUSTOM, save_path)
+            self._cache_template(cache_key, image_path, {
+                'style': style_name,
+                'model': model,
+                'prompt': enhanced_prompt,
+                'width': width,
+                'height': height,
+                'seed': seed,
+                'source_url': image_url,
+            })
             
             logger.info(f"Successfully generated custom map: {image_path}")
             return image_path
@@ -349,28 +520,388 @@ class FloridaMapGenerator:
             logger.error(f"Error generating custom map: {e}")
             raise
     
+    def _style_prompt(self, style: MapStyle) -> str:
+        """Build the full prompt for a map style"""
+        style_config = self.STYLE_PROMPTS[style]
+        
+        with span('generator.build_prompt', style=style.value) as prompt_span:
+            # Enhanced prompt with specific requirements for surf break labeling
+            enhanced_prompt = (
+                f"{style_config['prompt']} "
+                f"IMPORTANT: Ensure wide margins around the entire coastline (at least 15% of image width) "
+                f"for text label placement. The state outline should be centered with generous white space "
+                f"or background space around all edges. Optimize for text readability and label placement. "
+                f"Style: {style_config['style_keywords']}"
+            )
+            prompt_span.set_attribute('prompt_chars', len(enhanced_prompt))
+        return enhanced_prompt
+    
+    @staticmethod
+    def _custom_prompt(custom_prompt: str) -> str:
+        """Add coastal spacing requirements to any custom prompt"""
+        return (
+            f"{custom_prompt} "
+            f"CRITICAL: Include wide margins around the entire Florida coastline "
+            f"(minimum 15% of image dimensions) for text label placement. "
+            f"Center the state with generous background space on all sides."
+        )
+    
+    def generate_map_bytes(
+        self,
+        style: MapStyle,
+        width: int = 1024,
+        height: int = 1024,
+        model: str = 'flux-schnell',
+        seed: Optional[int] = None,
+        force_regenerate: bool = False,
+        retry_budget: Optional[RetryBudget] = None
+    ) -> GeneratedTemplate:
+        """
+        Generate a map template in memory, without writing it to disk.
+        
+        Decode the result once and hand it straight to the renderer; keep it
+        with `persist_template`, which may run in the background.
+        
+        Args:
+            style: Map style to generate
+            width: Image width in pixels
+            height: Image height in pixels
+            model: AI model to use for generation
+            seed: Model seed, for reproducible generations
+            force_regenerate: Run a new prediction even if the template is cached
+            retry_budget: Retries shared with other generations
+            
+        Returns:
+            GeneratedTemplate: The encoded template and its generation inputs
+        """
+        if model not in self.MODELS:
+            raise ValueError(f"Unsupported model: {model}. Available: {list(self.MODELS.keys())}")
+        return self._generate_bytes(style.value, model, self._style_prompt(style), width, height, seed,
+                                    force_regenerate, retry_budget)
+    
+    def generate_custom_map_bytes(
+        self,
+        custom_prompt: str,
+        style_name: str = "custom",
+        width: int = 1024,
+        height: int = 1024,
+        model: str = 'flux-schnell',
+        seed: Optional[int] = None,
+        force_regenerate: bool = False,
+        retry_budget: Optional[RetryBudget] = None
+    ) -> GeneratedTemplate:
+        """Generate a map with a fully custom prompt in memory, like generate_map_bytes"""
+        if model not in self.MODELS:
+            raise ValueError(f"Unsupported model: {model}. Available: {list(self.MODELS.keys())}")
+        return self._generate_bytes(style_name, model, self._custom_prompt(custom_prompt), width, height, seed,
+                                    force_regenerate, retry_budget)
+    
+    def _generate_bytes(self, name: str, model: str, prompt: str, width: int, height: int,
+                        seed: Optional[int], force_regenerate: bool,
+                        retry_budget: Optional[RetryBudget]) -> GeneratedTemplate:
+        """Read a template from the cache or generate and download it into memory"""
+        cache_key = self.template_cache_key(model, prompt, width, height, seed)
+        metadata = {'style': name, 'model': model, 'prompt': prompt, 'width': width, 'height': height,
+                    'seed': seed}
+        
+        if self.template_cache is not None and not force_regenerate:
+            data = self.template_cache.read_bytes(cache_key)
+            TEMPLATE_CACHE_LOOKUPS.inc(result='hit' if data is not None else 'miss')
+            if data is not None:
+                logger.info(f"Reusing cached {name} map")
+                return GeneratedTemplate(data, name, cache_key, metadata, cached=True)
+        
+        logger.info(f"Generating {name} Florida map using {model} ({width}x{height})")
+        start = time.perf_counter()
+        try:
+            output = self._run_prediction(model, self._model_input(prompt, width, height, seed), retry_budget)
+            image_url = self._output_url(output)
+            data = self._download(image_url).data
+        except Exception as e:
+            logger.error(f"Error generating {name} map: {e}")
+            raise
+        return GeneratedTemplate(data, name, cache_key, {**metadata, 'source_url': image_url},
+                                 seconds=time.perf_counter() - start)
+    
+    def persist_template(self, template: GeneratedTemplate, save_path: Optional[str] = None) -> str:
+        """
+        Write a template generated in memory to disk and to the template cache.
+        
+        Args:
+            template: Template from generate_map_bytes or generate_custom_map_bytes
+            save_path: Where to write it, the style's default file name if None
+            
+        Returns:
+            str: Path the template was written to
+        """
+        save_path = save_path or self._default_save_path(template.name)
+        path = Path(save_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp_path.write_bytes(template.data)
+            os.replace(tmp_path, path)
+        finally:
+            # Left behind only if the write or rename failed
+            if tmp_path.exists():
+                tmp_path.unlink()
+        
+        if self.template_cache is not None and not template.cached:
+            try:
+                self.template_cache.put_bytes(template.cache_key, template.data,
+                                              {**template.metadata, 'created_at': time.time()})
+            except OSError as e:
+                logger.warning(f"Could not cache template {save_path}: {e}")
+        return save_path
+    
+    @property
+    def predictions(self) -> 'PredictionClient':
+        """Client for non-blocking predictions"""
+        if self._prediction_client is None:
+            self._prediction_client = self.backend.prediction_client(self.api_token)
+        return self._prediction_client
+    
+    def submit_map_template(
+        self,
+        style: MapStyle,
+        width: int = 1024,
+        height: int = 1024,
+        model: str = 'flux-schnell',
+        save_path: Optional[str] = None,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> 'PredictionHandle':
+        """
+        Start generating a map template without waiting for it.
+        
+        Wait for the returned handles with `self.predictions.poll(handles)`
+        and pass each finished one to `save_map_template`.
+        
+        Args:
+            style: Map style to generate
+            width: Image width in pixels
+            height: Image height in pixels
+            model: AI model to use for generation
+            save_path: Optional path to save the generated image
+            seed: Model seed, for reproducible generations
+            timeout: Seconds after which polling cancels the prediction
+            
+        Returns:
+            PredictionHandle: Handle for the running prediction
+        """
+        if model not in self.MODELS:
+            raise ValueError(f"Unsupported model: {model}. Available: {list(self.MODELS.keys())}")
+        
+        enhanced_prompt = self._style_prompt(style)
+        waited = self.rate_limiter.acquire()
+        if waited:
+            RATE_LIMIT_WAIT_SECONDS.inc(waited)
+        
+        model_input = self._model_input(enhanced_prompt, width, height, seed)
+        context = {
+            'style': style,
+            'model': model,
+            'prompt': enhanced_prompt,
+            'width': width,
+            'height': height,
+            'seed': seed,
+            'save_path': save_path or self._default_save_path(style),
+        }
+        
+        with span('replicate.submit', model=model, width=width, height=height) as submit_span:
+            handle = call_with_retries(
+                lambda: self.predictions.submit(self.MODELS[model], model_input, timeout=timeout, context=context),
+                f"submit:{model}", self.retry_policy, self.breaker(model),
+                # A resent submit whose first response was lost would start a second paid prediction
+                idempotent=False,
+            )
+            submit_span.set_attribute('prediction_id', handle.id)
+        
+        logger.info(f"Submitted {style.value} map prediction {handle.id}")
+        return handle
+    
+    def save_map_template(self, handle: 'PredictionHandle') -> str:
+        """
+        Download the output of a finished template prediction.
+        
+        Args:
+            handle: Finished handle from submit_map_template
+            
+        Returns:
+            str: Path to the generated image file
+            
+        Raises:
+            PredictionError: If the prediction failed, was canceled or timed out
+        """
+        context = handle.context
+        model = context['model']
+        breaker = self.breaker(model)
+        try:
+            image_url = self._output_url(handle.result())
+        except Exception as e:
+            PREDICTIONS.inc(model=model, outcome='error')
+            if classify_error(e).retryable:
+                breaker.record_failure()
+            raise
+        breaker.record_success()
+        PREDICTIONS.inc(model=model, outcome='ok')
+        PREDICTION_SECONDS.observe(handle.elapsed, model=model)
+        
+        image_path = self._download_image(image_url, context['style'], context['save_path'])
+        self._cache_template(
+            self.template_cache_key(model, context['prompt'], context['width'], context['height'], context['seed']),
+            image_path,
+            {
+                'style': context['style'].value,
+                'model': model,
+                'prompt': context['prompt'],
+                'width': context['width'],
+                'height': context['height'],
+                'seed': context['seed'],
+                'source_url': image_url,
+            },
+        )
+        logger.info(f"Saved {context['style'].value} map from prediction {handle.id}: {image_path}")
+        return image_path
+    
+    @staticmethod
+    def _output_url(output) -> str:
+        """Get the image URL from a prediction's output"""
+        if isinstance(output, list) and len(output) > 0:
+            return str(output[0])
+        return str(output)
+    
+    def _model_input(self, prompt: str, width: int, height: int,
+                     seed: Optional[int] = None) -> Dict:
+        """Build the Replicate input for a prediction"""
+        model_input = {"prompt": prompt, "width": width, "height": height, **self.GENERATION_PARAMS}
+        if seed is not None:
+            model_input["seed"] = seed
+        return model_input
+    
+    def template_cache_key(self, model: str, prompt: str, width: int, height: int,
+                           seed: Optional[int] = None) -> str:
+        """Hash every input of a prediction into a template cache key"""
+        return hash_inputs({
+            # Templates from one backend, such as the offline one, never stand in for another's
+            'backend': self.backend.name,
+            'model': self.MODELS[model],
+            'input': self._model_input(prompt, width, height, seed),
+        })
+    
+    def style_template_key(self, style: MapStyle, width: int = 1024, height: int = 1024,
+                           model: str = 'flux-schnell', seed: Optional[int] = None) -> str:
+        """Get the template cache key of a map style's template"""
+        return self.template_cache_key(model, self._style_prompt(style), width, height, seed)
+    
+    def custom_template_key(self, custom_prompt: str, width: int = 1024, height: int = 1024,
+                            model: str = 'flux-schnell', seed: Optional[int] = None) -> str:
+        """Get the template cache key of a custom prompt's template"""
+        return self.template_cache_key(model, self._custom_prompt(custom_prompt), width, height, seed)
+    
+    def _restore_cached_template(self, cache_key: str, save_path: str,
+                                 force_regenerate: bool = False) -> bool:
+        """Copy a cached template to save_path, returning whether there was one"""
+        if self.template_cache is None or force_regenerate:
+            return False
+        
+        cached_path = self.template_cache.get(cache_key)
+        TEMPLATE_CACHE_LOOKUPS.inc(result='hit' if cached_path else 'miss')
+        if cached_path is None:
+            return False
+        
+        Path(save_path).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            shutil.copyfile(cached_path, save_path)
+        except FileNotFoundError:
+            # Evicted between lookup and copy
+            return False
+        return True
+    
+    def _cache_template(self, cache_key: str, image_path: str, metadata: Dict) -> None:
+        """Store a generated template, without failing the generation if caching fails"""
+        if self.template_cache is None:
+            return
+        try:
+            self.template_cache.put_file(cache_key, image_path, {**metadata, 'created_at': time.time()})
+        except OSError as e:
+            logger.warning(f"Could not cache template {image_path}: {e}")
+    
+    def breaker(self, model: str) -> CircuitBreaker:
+        """Get the circuit breaker guarding a model"""
+        with self._breakers_lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(
+                    f"{self.backend.name}:{model}", self.BREAKER_FAILURE_THRESHOLD, self.BREAKER_RESET_SECONDS
+                )
+            return breaker
+    
+    def _run_prediction(self, model: str, model_input: Dict,
+                        retry_budget: Optional[RetryBudget] = None):
+        """Run a prediction on the backend, retrying transient errors"""
+        def attempt():
+            with span('replicate.run', model=model, width=model_input['width'], height=model_input['height'],
+                      backend=self.backend.name), self._prediction(model):
+                return self.backend.run(self.MODELS[model], model_input)
+        
+        return call_with_retries(attempt, f"predict:{model}", self.retry_policy, self.breaker(model), retry_budget)
+    
+    @contextmanager
+    def _prediction(self, model: str) -> Iterator[None]:
+        """Wait for the rate limiter, then count and time a Replicate prediction"""
+        waited = self.rate_limiter.acquire()
+        if waited:
+            RATE_LIMIT_WAIT_SECONDS.inc(waited)
+        try:
+            with PREDICTION_SECONDS.time(model=model):
+                yield
+        except Exception:
+            PREDICTIONS.inc(model=model, outcome='error')
+            raise
+        PREDICTIONS.inc(model=model, outcome='ok')
+    
+    @staticmethod
+    def _default_save_path(style) -> str:
+        """Get the default file name for a style's template"""
+        return f"florida_map_{style.value if hasattr(style, 'value') else str(style)}.png"
+    
     def _download_image(self, image_url: str, style, save_path: Optional[str] = None) -> str:
         """Download image from URL and save locally"""
         if save_path is None:
-            filename = f"florida_map_{style.value if hasattr(style, 'value') else str(style)}.png"
-            save_path = filename
+            save_path = self._default_save_path(style)
         
+        self._download(image_url, save_path)
+        return save_path
+    
+    def _download(self, image_url: str, save_path: Optional[str] = None) -> 'DownloadResult':
+        """Download an image to a file, or into memory if save_path is None"""
         try:
-            response = requests.get(image_url, timeout=30)
-            response.raise_for_status()
+            with span('generator.download', in_memory=save_path is None) as download_span, \
+                    DOWNLOAD_SECONDS.time():
+                if save_path is None:
+                    result = self.downloader.download_bytes(image_url)
+                else:
+                    result = self.downloader.download(image_url, save_path)
+                download_span.set_attributes(status_code=result.status_code, bytes=result.bytes,
+                                             retries=result.retries, resumed=result.resumed,
+                                             bytes_per_second=round(result.throughput))
             
-            # Ensure directory exists
-            Path(save_path).parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(save_path, 'wb') as f:
-                f.write(response.content)
-            
-            return save_path
+            DOWNLOADS.inc(outcome='ok')
+            BYTES_DOWNLOADED.inc(result.bytes)
+            DOWNLOAD_BYTES.observe(result.bytes)
+            return result
             
         except Exception as e:
             logger.error(f"Error downloading image: {e}")
+            DOWNLOADS.inc(outcome='error')
             raise
     
+    def close(self) -> None:
+        """Close the backend, if the generator created it"""
+        if self._owns_backend:
+            self.backend.close()
+    
     def get_available_models(self) -> List[str]:
         """Get list of available AI models"""
         return list(self.MODELS.keys())
@@ -382,6 +913,8 @@ class FloridaMapGenerator:
 
 def main():
     """Example usage of the Florida Map Generator"""
+    logging.basicConfig(level=logging.INFO)
+    
     try:
         # Initialize the generator
         generator = FloridaMapGenerator()
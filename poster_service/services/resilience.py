@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Retries, Backoff and Circuit Breaking for Remote Calls
+
+Errors from Replicate and the download path are classified as transient
+(rate limits, 5xx, timeouts, dropped connections) or permanent (bad input,
+auth, failed predictions). Transient errors are retried with exponential
+backoff and full jitter, honouring Retry-After. Each retry spends from a
+retry budget shared by a whole collection, so a degraded service cannot
+multiply the work of a run. A per-model circuit breaker opens after repeated
+transient failures and fails calls fast until a trial call succeeds.
+
+Calls that are not idempotent, such as creating a paid prediction, are only
+retried when the request certainly never took effect: a 429 refusal or a
+failure to connect. Anything else may have been acted on, so resending it
+could do the work twice.
+"""
+
+import time
+import random
+import logging
+import threading
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Optional, TypeVar
+
+from services.metrics import counter, gauge
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+RETRIES = counter('resilience_retries_total', "Calls retried after a transient error", ['operation', 'error_class'])
+GIVE_UPS = counter('resilience_give_ups_total', "Calls that failed after retrying", ['operation', 'reason'])
+BREAKER_STATE = gauge('resilience_circuit_state', "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+                      ['breaker'])
+BREAKER_TRANSITIONS = counter('resilience_circuit_transitions_total', "Circuit breaker state changes",
+                              ['breaker', 'state'])
+FAST_FAILS = counter('resilience_fast_fails_total', "Calls refused by an open circuit breaker", ['breaker'])
+
+# Status codes worth retrying
+TRANSIENT_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+# Exception class names (from requests, httpx, urllib3 and the replicate
+# client) that mean the call never got a usable answer
+TRANSIENT_ERROR_NAMES = frozenset({
+    'Timeout', 'TimeoutError', 'TimeoutException', 'ReadTimeout', 'ConnectTimeout',
+    'ConnectionError', 'ConnectError', 'TransportError', 'RemoteProtocolError',
+    'ChunkedEncodingError', 'ProtocolError', 'SimulatedFailure', 'PredictionTimeout',
+})
+
+# Exception class names meaning the connection was never made, so the request was never sent
+CONNECT_ERROR_NAMES = frozenset({
+    'ConnectTimeout', 'ConnectError', 'NewConnectionError', 'ConnectionRefusedError', 'NameResolutionError',
+})
+
+
+class ErrorClass(Enum):
+    """How a failed call should be handled"""
+    TRANSIENT = "transient"
+    RATE_LIMITED = "rate_limited"
+    PERMANENT = "permanent"
+
+
+@dataclass
+class Classification:
+    """Classified error, with the server's requested delay if it gave one"""
+    error_class: ErrorClass
+    retry_after: Optional[float] = None
+
+    @property
+    def retryable(self) -> bool:
+        return self.error_class is not ErrorClass.PERMANENT
+
+
+class CircuitOpenError(Exception):
+    """Call refused because the service is failing"""
+
+
+class RetryBudgetExhausted(Exception):
+    """Transient failure with no retries left in the budget"""
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """Find an HTTP status code on an exception from requests, httpx or replicate"""
+    for owner in (error, getattr(error, 'response', None)):
+        for attribute in ('status_code', 'status'):
+            value = getattr(owner, attribute, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Read a Retry-After header in seconds from an exception's response"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def classify_error(error: BaseException) -> Classification:
+    """
+    Decide whether an error is worth retrying.
+
+    Unknown exceptions are permanent, so programming errors fail fast.
+    """
+    status = _status_code(error)
+    if status == 429:
+        return Classification(ErrorClass.RATE_LIMITED, _retry_after(error))
+    if status is not None:
+        if status in TRANSIENT_STATUS:
+            return Classification(ErrorClass.TRANSIENT, _retry_after(error))
+        return Classification(ErrorClass.PERMANENT)
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return Classification(ErrorClass.TRANSIENT)
+    if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return Classification(ErrorClass.TRANSIENT)
+    return Classification(ErrorClass.PERMANENT)
+
+
+def safe_to_resend(error: BaseException) -> bool:
+    """
+    Decide whether a failed request certainly never took effect, so sending
+    it again cannot repeat its work.
+
+    Only 429 refusals and failures to connect qualify; read timeouts, dropped
+    connections and 5xx may all follow a request the service acted on.
+    """
+    if _status_code(error) == 429:
+        return True
+    # requests wraps urllib3's connection errors, which keep theirs in `reason`
+    pending, seen = [error], set()
+    while pending:
+        current = pending.pop()
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        if any(cls.__name__ in CONNECT_ERROR_NAMES for cls in type(current).__mro__):
+            return True
+        pending.extend(cause for cause in (current.__cause__, current.__context__, getattr(current, 'reason', None),
+                                           *current.args)
+                       if isinstance(cause, BaseException))
+    return False
+
+
+@dataclass
+class RetryPolicy:
+    """How often and how patiently to retry transient errors"""
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def delay(self, retry: int, retry_after: Optional[float] = None,
+              rng: Callable[[], float] = random.random) -> float:
+        """
+        Delay before a retry: exponential backoff with full jitter, but at
+        least the server's Retry-After.
+
+        Args:
+            retry: Number of the retry, starting at 0
+            retry_after: Delay the server asked for, if any
+            rng: Uniform random number in [0, 1)
+        """
+        delay = rng() * min(self.max_delay, self.base_delay * 2 ** retry)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class RetryBudget:
+    """Retries a group of calls (such as a collection) may spend in total"""
+
+    def __init__(self, max_retries: int):
+        self.max_retries = max_retries
+        self._spent = 0
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget, returning False if none is left"""
+        with self._lock:
+            if self._spent >= self.max_retries:
+                return False
+            self._spent += 1
+            return True
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return self.max_retries - self._spent
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast after repeated transient failures.
+
+    Closed: calls pass, consecutive failures are counted. Open: calls are
+    refused until reset_timeout has passed. Half-open: one trial call
+    passes; its success closes the breaker and its failure reopens it.
+    """
+
+    CLOSED = 'closed'
+    HALF_OPEN = 'half_open'
+    OPEN = 'open'
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name: Name in logs and metrics, such as the model
+            failure_threshold: Consecutive transient failures that open the breaker
+            reset_timeout: Seconds an open breaker waits before allowing a trial call
+            clock: Monotonic clock in seconds
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(0, breaker=name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        self._state = state
+        BREAKER_STATE.set(self.STATE_VALUES[state], breaker=self.name)
+        BREAKER_TRANSITIONS.inc(breaker=self.name, state=state)
+        logger.warning(f"Circuit breaker {self.name} is now {state}")
+
+    def allow(self) -> None:
+        """
+        Let a call through or refuse it.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with a trial running
+        """
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._transition(self.HALF_OPEN)
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+        FAST_FAILS.inc(breaker=self.name)
+        raise CircuitOpenError(f"Circuit breaker {self.name} is open; failing fast")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._transition(self.OPEN)
+
+
+def call_with_retries(function: Callable[[], T], operation: str,
+                      policy: Optional[RetryPolicy] = None,
+                      breaker: Optional[CircuitBreaker] = None,
+                      budget: Optional[RetryBudget] = None,
+                      sleep: Callable[[float], None] = time.sleep,
+                      idempotent: bool = True) -> T:
+    """
+    Call a function, retrying transient errors.
+
+    Args:
+        function: Call to make
+        operation: Name in logs and metrics
+        policy: Attempts and backoff, the defaults if None
+        breaker: Circuit breaker guarding the call
+        budget: Retry budget to spend retries from
+        sleep: Sleeps for a number of seconds
+        idempotent: Whether repeating the call is harmless; if not, only
+            errors safe_to_resend() accepts are retried
+
+    Returns:
+        The function's result
+
+    Raises:
+        CircuitOpenError: If the breaker refuses the call
+        RetryBudgetExhausted: If a transient error found the budget empty
+        The last error, if it was permanent or attempts ran out
+    """
+    policy = policy or RetryPolicy()
+    retry = 0
+    while True:
+        if breaker is not None:
+            breaker.allow()
+        try:
+            result = function()
+        except Exception as e:
+            classification = classify_error(e)
+            if breaker is not None:
+                # Permanent errors are answers from a working service
+                if classification.retryable:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if not classification.retryable:
+                raise
+            if not idempotent and not safe_to_resend(e):
+                GIVE_UPS.inc(operation=operation, reason='not_idempotent')
+                raise
+            if retry + 1 >= policy.max_attempts:
+                GIVE_UPS.inc(operation=operation, reason='attempts')
+                raise
+            if budget is not None and not budget.try_spend():
+                GIVE_UPS.inc(operation=operation, reason='budget')
+                raise RetryBudgetExhausted(f"{operation} failed and the retry budget is spent: {e}") from e
+
+            delay = policy.delay(retry, classification.retry_after)
+            RETRIES.inc(operation=operation, error_class=classification.error_class.value)
+            logger.warning(f"{operation} failed ({classification.error_class.value}: {e}), "
+                           f"retry {retry + 1} in {delay:.1f}s")
+            sleep(delay)
+            retry += 1
+            continue
+
+        if breaker is not None:
+            breaker.record_success()
+        return result
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Request Coalescing for Poster Renders
+
+Single-flight layer in front of the poster service: concurrent identical
+render requests, identified by a canonical job hash, wait on one in-flight
+render and all receive its result, so a burst of identical requests costs
+a single render.
+"""
+
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import astuple
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from services.poster import DecodedTemplate, FloridaSurfBreakPosterService, MapBounds, PosterStyle, output_format
+from services.render_stats import RenderStats
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """An in-flight call shared by every caller with the same key"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls with the same key.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait for it and receive the same result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with this key.
+
+        Returns:
+            Tuple of the result and whether it was shared from another caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.executed += 1
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        """Get coalescing counters"""
+        with self._lock:
+            return {
+                'renders_executed': self.executed,
+                'renders_coalesced': self.coalesced,
+                'renders_in_flight': len(self._calls),
+            }
+
+
+def render_job_key(map_image_path: Union[str, DecodedTemplate], output_path: str,
+                   style: PosterStyle = PosterStyle.CLASSIC,
+                   custom_bounds: Optional[MapBounds] = None,
+                   title: Optional[str] = None) -> str:
+    """
+    Build the canonical hash of a render job.
+
+    Jobs that differ only in where their output is written share a key; the
+    template is identified by its resolved path, size and modification time,
+    or by its digest when it is already decoded.
+    """
+    if isinstance(map_image_path, DecodedTemplate):
+        template = {'template_digest': map_image_path.digest}
+    else:
+        path = Path(map_image_path).resolve()
+        stat = path.stat()
+        template = {'template': str(path), 'template_mtime_ns': stat.st_mtime_ns, 'template_size': stat.st_size}
+    bounds = custom_bounds or FloridaSurfBreakPosterService.DEFAULT_BOUNDS
+    canonical = json.dumps({
+        **template,
+        'style': style.value,
+        'bounds': astuple(bounds),
+        'title': title,
+        'format': output_format(output_path),
+    }, sort_keys=True)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class CoalescingPosterService:
+    """
+    Single-flight front for FloridaSurfBreakPosterService.generate_poster.
+
+    Identical concurrent requests share one render; each caller then writes
+    the encoded poster to its own output path. Requests are traced and
+    counted like the poster service's own, with shared renders counted under
+    the 'coalesced' outcome of poster_requests_total.
+    """
+
+    def __init__(self, poster_service: FloridaSurfBreakPosterService,
+                 flight: Optional[SingleFlight] = None):
+        self.poster_service = poster_service
+        self.flight = flight or SingleFlight()
+
+    def generate_poster(self, map_image_path: Union[str, DecodedTemplate], output_path: str,
+                        style: PosterStyle = PosterStyle.CLASSIC,
+                        custom_bounds: Optional[MapBounds] = None,
+                        title: Optional[str] = None) -> bool:
+        """
+        Generate a poster, sharing the render with identical in-flight requests.
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        def render(stats: RenderStats) -> Tuple[bytes, str]:
+            key = render_job_key(map_image_path, output_path, style, custom_bounds, title)
+            (data, cached), shared = self.flight.do(key, lambda: self.poster_service.render_poster_bytes(
+                map_image_path, style, custom_bounds, title, output_format(output_path), stats=stats
+            ))
+            if shared:
+                return data, 'coalesced'
+            return data, 'cached' if cached else 'rendered'
+
+        return self.poster_service.write_poster(map_image_path, output_path, style, title, render)
+
+    def stats(self) -> Dict[str, int]:
+        """Get coalescing counters"""
+        return self.flight.stats()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Binary Surf Break Dataset Snapshots
+
+Compiles the surf break JSON data into a packed binary snapshot stored next
+to the source file. The snapshot holds latitude/longitude arrays, a break
+type table and a string blob of names, and is memory-mapped on load so
+service construction does not re-parse and re-validate the JSON.
+
+A snapshot is used only while it matches its source file (mtime and size,
+falling back to a content hash); otherwise it is rebuilt automatically.
+"""
+
+import os
+import mmap
+import struct
+import hashlib
+import logging
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOT_MAGIC = b'FLSB'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = '.snapshot'
+
+# magic, version, reserved, source mtime (ns), source size, source hash,
+# break count, break type count
+HEADER = struct.Struct('<4sHHqQ32sII')
+
+
+def snapshot_path_for(source_path: Path) -> Path:
+    """Get the snapshot path stored next to a source data file"""
+    return Path(source_path).with_suffix(SNAPSHOT_SUFFIX)
+
+
+def source_digest(raw: bytes) -> bytes:
+    """Hash the raw contents of a source data file"""
+    return hashlib.blake2b(raw, digest_size=32).digest()
+
+
+class BreakTable(Sequence):
+    """
+    Read-only sequence of surf breaks backed by a memory-mapped snapshot.
+
+    Items are built on access with the supplied factory, called as
+    factory(name, latitude, longitude, break_type).
+
+    Raises:
+        ValueError: If the sections do not add up to the size of the buffer
+    """
+
+    def __init__(self, buffer: mmap.mmap, factory: Callable[..., Any]):
+        _, _, _, _, _, self.source_hash, count, type_count = HEADER.unpack_from(buffer)
+        view = memoryview(buffer)
+        offset = HEADER.size
+
+        # The fixed-size sections, then the name and type blobs their offsets end at
+        arrays_size = count * 2 * 8 + (count + 1) * 4 + (type_count + 1) * 4 + count * 2
+        if HEADER.size + arrays_size > len(buffer):
+            raise ValueError(f"Snapshot truncated: {len(buffer)} bytes")
+
+        def take(length: int, fmt: str) -> memoryview:
+            nonlocal offset
+            section = view[offset:offset + length * struct.calcsize(fmt)].cast(fmt)
+            offset += len(section) * section.itemsize
+            return section
+
+        self.latitudes = take(count, 'd')
+        self.longitudes = take(count, 'd')
+        name_offsets = take(count + 1, 'I')
+        type_offsets = take(type_count + 1, 'I')
+        type_indexes = take(count, 'H')
+        expected_size = offset + name_offsets[-1] + type_offsets[-1]
+        if expected_size != len(buffer):
+            raise ValueError(f"Snapshot is {len(buffer)} bytes, its sections need {expected_size}")
+        names = view[offset:offset + name_offsets[-1]]
+        offset += name_offsets[-1]
+        types = bytes(view[offset:offset + type_offsets[-1]])
+
+        self.break_types: Tuple[str, ...] = tuple(
+            types[type_offsets[i]:type_offsets[i + 1]].decode('utf-8')
+            for i in range(type_count)
+        )
+        self._buffer = buffer
+        self._names = names
+        self._name_offsets = name_offsets
+        self._type_indexes = type_indexes
+        self._factory = factory
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('break index out of range')
+        return self._factory(
+            self.name(index),
+            self.latitudes[index],
+            self.longitudes[index],
+            self.break_types[self._type_indexes[index]],
+        )
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def name(self, index: int) -> str:
+        """Get the name of a break without building the item"""
+        start, end = self._name_offsets[index], self._name_offsets[index + 1]
+        return str(self._names[start:end], 'utf-8')
+
+
+def write_snapshot(snapshot_path: Path, breaks: Sequence[Any],
+                   source_stat: os.stat_result, digest: bytes) -> None:
+    """
+    Write a snapshot of validated surf breaks atomically.
+
+    Args:
+        snapshot_path: Destination snapshot file
+        breaks: Items with name, latitude, longitude and break_type attributes
+        source_stat: Stat of the source file taken before it was read
+        digest: Hash of the source file contents
+    """
+    break_types: List[str] = []
+    type_lookup = {}
+    latitudes, longitudes = array('d'), array('d')
+    name_offsets, type_offsets, type_indexes = array('I', [0]), array('I', [0]), array('H')
+    names, types = bytearray(), bytearray()
+
+    for surf_break in breaks:
+        if surf_break.break_type not in type_lookup:
+            type_lookup[surf_break.break_type] = len(break_types)
+            break_types.append(surf_break.break_type)
+            types += surf_break.break_type.encode('utf-8')
+            type_offsets.append(len(types))
+        latitudes.append(surf_break.latitude)
+        longitudes.append(surf_break.longitude)
+        type_indexes.append(type_lookup[surf_break.break_type])
+        names += surf_break.name.encode('utf-8')
+        name_offsets.append(len(names))
+
+    header = HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0,
+        source_stat.st_mtime_ns, source_stat.st_size, digest,
+        len(latitudes), len(break_types)
+    )
+
+    tmp_path = snapshot_path.with_name(f".{snapshot_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as file:
+            file.write(header)
+            for section in (latitudes, longitudes, name_offsets, type_offsets, type_indexes):
+                file.write(section.tobytes())
+            file.write(names)
+            file.write(types)
+        os.replace(tmp_path, snapshot_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def open_snapshot(snapshot_path: Path, source_path: Path, source_stat: os.stat_result,
+                  factory: Callable[..., Any]) -> Optional[BreakTable]:
+    """
+    Memory-map a snapshot if it is current for its source file.
+
+    Returns:
+        BreakTable if the snapshot matches the source, None otherwise
+    """
+    try:
+        with open(snapshot_path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, _, mtime_ns, size, digest, _, _ = HEADER.unpack_from(buffer)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+
+    if (mtime_ns, size) != (source_stat.st_mtime_ns, source_stat.st_size):
+        # Source was touched or replaced, reuse the snapshot only if unchanged
+        if size != source_stat.st_size or source_digest(source_path.read_bytes()) != digest:
+            return None
+        _refresh_header(snapshot_path, buffer, source_stat)
+
+    try:
+        return BreakTable(buffer, factory)
+    except (ValueError, TypeError, IndexError) as e:
+        # UnicodeDecodeError is a ValueError
+        logger.warning(f"Ignoring damaged snapshot {snapshot_path}: {e}")
+        return None
+
+
+def _refresh_header(snapshot_path: Path, buffer: mmap.mmap, source_stat: os.stat_result) -> None:
+    """Record a new source mtime in a snapshot whose contents are still current"""
+    fields = list(HEADER.unpack_from(buffer))
+    fields[3] = source_stat.st_mtime_ns
+    try:
+        with open(snapshot_path, 'r+b') as file:
+            file.write(HEADER.pack(*fields))
+    except OSError as e:
+        logger.warning(f"Could not refresh snapshot header: {e}")
+
+
+def load_breaks(source_path: Path, parse: Callable[[bytes], List[Any]],
+                factory: Callable[..., Any]) -> Sequence[Any]:
+    """
+    Load surf breaks from a snapshot, rebuilding it from the source if stale.
+
+    Args:
+        source_path: Path to the surf break JSON data file
+        parse: Parses and validates raw source bytes into surf breaks
+        factory: Builds a surf break from snapshot fields
+
+    Returns:
+        Sequence of surf breaks
+    """
+    source_path = Path(source_path)
+    snapshot_path = snapshot_path_for(source_path)
+    source_stat = source_path.stat()
+
+    table = open_snapshot(snapshot_path, source_path, source_stat, factory)
+    if table is not None:
+        logger.debug(f"Loaded surf break snapshot: {snapshot_path}")
+        return table
+
+    raw = source_path.read_bytes()
+    breaks = parse(raw)
+
+    try:
+        write_snapshot(snapshot_path, breaks, source_stat, source_digest(raw))
+        logger.info(f"Compiled surf break snapshot: {snapshot_path}")
+    except OSError as e:
+        logger.warning(f"Could not write surf break snapshot: {e}")
+
+    return breaks
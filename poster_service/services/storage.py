@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Disk Budgets for Generated Assets
+
+Keeps the template, poster and cache directories under per-directory byte
+budgets by deleting the least recently used files. A file's last use is the
+latest of its access time, its modification time and the access time the
+catalog recorded for it, since access times alone are unreliable on
+relatime/noatime mounts.
+
+Files pinned by running jobs and catalog entries marked for sale are never
+deleted, nor are files modified within the last minute (writes that have
+not been pinned or cataloged yet). Eviction runs in small batches on a
+background thread, so a large backlog never holds up renders.
+
+Each directory is walked only now and then, into a heap ordered by last
+use; passes in between pop at most a batch of candidates from it, so a pass
+costs the same however many files a directory holds.
+"""
+
+import os
+import time
+import heapq
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from services.catalog import AssetCatalog
+from services.content_cache import ContentCache
+from services.metrics import counter, gauge
+
+
+logger = logging.getLogger(__name__)
+
+EVICTED_FILES = counter('storage_evicted_files_total', "Files deleted to keep directories within budget",
+                        ['directory'])
+EVICTED_BYTES = counter('storage_evicted_bytes_total', "Bytes deleted to keep directories within budget",
+                        ['directory'])
+DIRECTORY_BYTES = gauge('storage_directory_bytes', "Bytes used by each managed directory", ['directory'])
+
+# Files evicted from managed directories; manifests, databases and temporary files are left alone
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+@dataclass
+class DirectoryScan:
+    """Eviction candidates of a directory, least recently used first, as of its last walk"""
+    heap: List[Tuple[float, str, int]] = field(default_factory=list)
+    total: int = 0
+    scanned_at: float = 0.0
+
+
+class StorageManager:
+    """Per-directory byte budgets enforced by incremental LRU eviction"""
+
+    def __init__(self, catalog: Optional[AssetCatalog] = None, interval: float = 60.0,
+                 batch_size: int = 100, min_age: float = 60.0, rescan_interval: float = 600.0):
+        """
+        Initialize the manager.
+
+        Args:
+            catalog: Catalog supplying access times and for-sale flags, and updated on eviction
+            interval: Seconds between background eviction passes
+            batch_size: Most files deleted per pass
+            min_age: Seconds a file must go unmodified before it can be evicted
+            rescan_interval: Seconds before a directory is walked again to pick up new files
+        """
+        self.catalog = catalog
+        self.interval = interval
+        self.batch_size = batch_size
+        self.min_age = min_age
+        self.rescan_interval = rescan_interval
+        self._budgets: Dict[Path, Tuple[int, Tuple[str, ...]]] = {}
+        self._caches: List[ContentCache] = []
+        self._scans: Dict[Path, DirectoryScan] = {}
+        self._pins: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_budget(self, directory: Union[str, Path], max_bytes: int,
+                   suffixes: Tuple[str, ...] = IMAGE_SUFFIXES) -> None:
+        """
+        Keep a directory's files under a byte budget.
+
+        Args:
+            directory: Directory managed, including its subdirectories
+            max_bytes: Total size of matching files kept before evicting
+            suffixes: File suffixes counted and evicted
+        """
+        directory = Path(directory).resolve()
+        self._budgets[directory] = (max_bytes, tuple(suffix.lower() for suffix in suffixes))
+        self._scans.pop(directory, None)
+
+    def add_cache(self, cache: ContentCache) -> None:
+        """Evict a content cache over its own budget in the background too"""
+        self._caches.append(cache)
+
+    def pin(self, paths: Iterable[Union[str, Path]]) -> None:
+        """Protect files from eviction until they are unpinned as often as pinned"""
+        with self._lock:
+            for path in paths:
+                key = str(Path(path).resolve())
+                self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, paths: Iterable[Union[str, Path]]) -> None:
+        """Release files pinned by pin()"""
+        with self._lock:
+            for path in paths:
+                key = str(Path(path).resolve())
+                count = self._pins.get(key, 0) - 1
+                if count > 0:
+                    self._pins[key] = count
+                else:
+                    self._pins.pop(key, None)
+
+    @contextmanager
+    def pinned(self, paths: Iterable[Union[str, Path]]) -> Iterator[None]:
+        """Protect files from eviction for the duration of a job"""
+        paths = list(paths)
+        self.pin(paths)
+        try:
+            yield
+        finally:
+            self.unpin(paths)
+
+    def is_pinned(self, path: Union[str, Path]) -> bool:
+        """Check whether a running job has pinned a file"""
+        with self._lock:
+            return str(Path(path).resolve()) in self._pins
+
+    def usage(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Get the bytes used and the budget of each managed directory and cache.
+
+        Directory usage is as of the last walk, less what eviction freed since;
+        only a directory never walked before is walked here.
+
+        Returns:
+            Dict mapping directories to (bytes used, budget)
+        """
+        usage = {}
+        for directory, (max_bytes, suffixes) in list(self._budgets.items()):
+            scan = self._scans.get(directory) or self._directory_scan(directory, suffixes)
+            usage[str(directory)] = (scan.total, max_bytes)
+        for cache in self._caches:
+            usage[str(cache.root)] = (cache.size(), cache.max_bytes)
+        return usage
+
+    def step(self) -> int:
+        """
+        Run one eviction pass, deleting at most batch_size files from the
+        directories and at most batch_size entries from each cache.
+
+        Returns:
+            int: Number of bytes freed
+        """
+        freed = 0
+        remaining = self.batch_size
+        for directory, (max_bytes, suffixes) in list(self._budgets.items()):
+            if remaining <= 0:
+                break
+            directory_freed, evicted = self._evict_directory(directory, max_bytes, suffixes, remaining)
+            freed += directory_freed
+            remaining -= evicted
+        for cache in self._caches:
+            if cache.size() > cache.max_bytes:
+                cache_freed = cache.evict(max_entries=self.batch_size)
+                if cache_freed:
+                    EVICTED_BYTES.inc(cache_freed, directory=str(cache.root))
+                freed += cache_freed
+        return freed
+
+    def enforce(self) -> int:
+        """
+        Evict until every directory is within budget or nothing more can go.
+
+        Returns:
+            int: Number of bytes freed
+        """
+        # Start from fresh walks, so files written since the last one count
+        self._scans.clear()
+        freed = 0
+        while True:
+            step_freed = self.step()
+            if not step_freed:
+                return freed
+            freed += step_freed
+
+    def start(self) -> None:
+        """Run eviction passes every interval on a background thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="storage-evictor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread, waiting for a pass in progress"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                logger.warning(f"Storage eviction pass failed: {e}")
+
+    def _scan(self, directory: Path, suffixes: Tuple[str, ...]) -> List[Tuple[float, str, int, bool]]:
+        """List (last used, path, size, for sale) for every matching file under a directory"""
+        accessed = self.catalog.usage_under(directory) if self.catalog is not None else {}
+        files = []
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if name.startswith('.') or not name.lower().endswith(suffixes):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                cataloged_at, for_sale = accessed.get(path, (None, False))
+                files.append((max(stat.st_atime, stat.st_mtime, cataloged_at or 0.0), path, stat.st_size,
+                              for_sale))
+        return files
+
+    def _directory_scan(self, directory: Path, suffixes: Tuple[str, ...]) -> DirectoryScan:
+        """Get a directory's eviction candidates, walking it again once the last walk is stale"""
+        scan = self._scans.get(directory)
+        if scan is None or time.time() - scan.scanned_at >= self.rescan_interval:
+            files = self._scan(directory, suffixes)
+            # For-sale files count toward the total but are never candidates
+            heap = [(last_used, path, size) for last_used, path, size, for_sale in files if not for_sale]
+            heapq.heapify(heap)
+            scan = self._scans[directory] = DirectoryScan(heap=heap, total=sum(entry[2] for entry in files),
+                                                          scanned_at=time.time())
+            DIRECTORY_BYTES.set(scan.total, directory=str(directory))
+        return scan
+
+    def _evict_directory(self, directory: Path, max_bytes: int, suffixes: Tuple[str, ...],
+                         limit: int) -> Tuple[int, int]:
+        """Delete up to limit least recently used files while the directory is over budget"""
+        scan = self._directory_scan(directory, suffixes)
+        cutoff = time.time() - self.min_age
+        freed = evicted = 0
+        while scan.heap and scan.total > max_bytes and evicted < limit:
+            last_used, path, _ = heapq.heappop(scan.heap)
+            # Checked under the pin lock, so a job cannot pin or list the file while it is deleted
+            with self._lock:
+                if path in self._pins:
+                    continue
+                asset = self.catalog.get(path) if self.catalog is not None else None
+                if asset is not None and asset.for_sale:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime > cutoff:
+                    # Written recently; the next walk finds it again
+                    continue
+                used = max(stat.st_atime, stat.st_mtime, (asset.accessed_at or 0.0) if asset else 0.0)
+                if used > last_used:
+                    # Used since the walk, so it goes back in line
+                    heapq.heappush(scan.heap, (used, path, stat.st_size))
+                    continue
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    continue
+            if self.catalog is not None:
+                self.catalog.remove(path)
+            scan.total -= stat.st_size
+            freed += stat.st_size
+            evicted += 1
+
+        if evicted:
+            EVICTED_FILES.inc(evicted, directory=str(directory))
+            EVICTED_BYTES.inc(freed, directory=str(directory))
+            DIRECTORY_BYTES.set(scan.total, directory=str(directory))
+            logger.info(f"Evicted {evicted} files ({freed} bytes) from {directory}")
+        return freed, evicted
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Lightweight Tracing for the Poster Pipeline
+
+Records nested, timed spans with attributes around each stage of poster
+generation (prompt building, Replicate predictions, downloads, overlay
+rendering) and exports finished spans to a local JSON-lines file, either in a
+flat format or as OTLP/JSON export requests that an OpenTelemetry collector's
+file receiver can ingest.
+
+Tracing is off until an exporter is configured; spans are then no-ops that
+cost a function call. The summary tool reports latency percentiles per span
+name across a run:
+
+    POSTER_TRACE_FILE=traces.jsonl python ai_poster_pipeline.py
+    python -m services.tracing traces.jsonl
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kind and status codes
+OTLP_SPAN_KIND_INTERNAL = 1
+OTLP_STATUS_OK = 1
+OTLP_STATUS_ERROR = 2
+
+SERVICE_NAME = 'florida-surf-poster'
+
+
+@dataclass
+class Span:
+    """A timed operation within a trace"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = 'ok'
+    error: Optional[str] = None
+
+    recording = True
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set an attribute, converting values JSON cannot hold to strings"""
+        if not isinstance(value, (str, int, float, bool)) and value is not None:
+            value = str(value)
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        """Set several attributes"""
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException) -> None:
+        """Mark the span as failed"""
+        self.status = 'error'
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_seconds(self) -> float:
+        """Wall time of the span"""
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the flat JSON-lines representation of the span"""
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_seconds': self.duration_seconds,
+            'attributes': self.attributes,
+            'status': self.status,
+            'error': self.error,
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Get the span as an OTLP/JSON ExportTraceServiceRequest"""
+        status = {'code': OTLP_STATUS_ERROR if self.status == 'error' else OTLP_STATUS_OK}
+        if self.error:
+            status['message'] = self.error
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': OTLP_SPAN_KIND_INTERNAL,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            'status': status,
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return {'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': [span]}],
+        }]}
+
+
+class _NullSpan(Span):
+    """Span that records nothing, used while tracing is off"""
+
+    recording = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+
+NULL_SPAN: Span = _NullSpan(name='', trace_id='', span_id='')
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    """Encode an attribute as an OTLP KeyValue"""
+    if isinstance(value, bool):
+        encoded = {'boolValue': value}
+    elif isinstance(value, int):
+        encoded = {'intValue': str(value)}
+    elif isinstance(value, float):
+        encoded = {'doubleValue': value}
+    else:
+        encoded = {'stringValue': '' if value is None else str(value)}
+    return {'key': key, 'value': encoded}
+
+
+def _from_otlp_attribute(value: Dict[str, Any]) -> Any:
+    """Decode an OTLP AnyValue"""
+    if 'intValue' in value:
+        return int(value['intValue'])
+    for kind in ('boolValue', 'doubleValue', 'stringValue'):
+        if kind in value:
+            return value[kind]
+    return None
+
+
+class JsonLinesExporter:
+    """Appends finished spans to a file, one JSON document per line"""
+
+    def __init__(self, path: Union[str, Path], otlp: bool = False):
+        """
+        Initialize the exporter.
+
+        Args:
+            path: File to append spans to
+            otlp: Write OTLP/JSON export requests instead of flat span records
+        """
+        self.path = Path(path)
+        self.otlp = otlp
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def export(self, span: Span) -> None:
+        """Write one finished span"""
+        line = json.dumps(span.to_otlp() if self.otlp else span.to_dict(), separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self) -> None:
+        """Close the output file"""
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """Creates spans and hands finished ones to its exporters"""
+
+    def __init__(self, exporters: Optional[List[Any]] = None):
+        """
+        Initialize the tracer.
+
+        Args:
+            exporters: Objects with an export(span) method; no exporters disables tracing
+        """
+        self.exporters = list(exporters or [])
+        self._current: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether spans are recorded"""
+        return bool(self.exporters)
+
+    def current_span(self) -> Span:
+        """Get the innermost active span in this context"""
+        return self._current.get() or NULL_SPAN
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Time a block of work as a child of the current span.
+
+        Exceptions mark the span as failed and propagate.
+        """
+        if not self.exporters:
+            yield NULL_SPAN
+            return
+
+        parent = self._current.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+        )
+        span.set_attributes(**attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            self._current.reset(token)
+            for exporter in self.exporters:
+                try:
+                    exporter.export(span)
+                except Exception as e:
+                    logger.warning(f"Span export failed: {e}")
+
+    def shutdown(self) -> None:
+        """Close all exporters"""
+        for exporter in self.exporters:
+            close = getattr(exporter, 'close', None)
+            if close is not None:
+                close()
+        self.exporters = []
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer"""
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> Tracer:
+    """Replace the process-wide tracer, returning the previous one"""
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+def span(name: str, **attributes: Any):
+    """Open a span on the process-wide tracer"""
+    return _tracer.span(name, **attributes)
+
+
+def current_span() -> Span:
+    """Get the innermost active span of the process-wide tracer"""
+    return _tracer.current_span()
+
+
+def tracing_enabled() -> bool:
+    """Whether the process-wide tracer records spans"""
+    return _tracer.enabled
+
+
+def configure_tracing(path: Union[str, Path], otlp: bool = False) -> Tracer:
+    """Export spans of the process-wide tracer to a JSON-lines file"""
+    tracer = Tracer([JsonLinesExporter(path, otlp=otlp)])
+    set_tracer(tracer).shutdown()
+    logger.info(f"Tracing to {path} ({'otlp' if otlp else 'jsonl'})")
+    return tracer
+
+
+def configure_from_environment() -> Optional[Tracer]:
+    """
+    Enable tracing from POSTER_TRACE_FILE, in the POSTER_TRACE_FORMAT
+    format ('jsonl' or 'otlp'), if it is set.
+    """
+    path = os.getenv('POSTER_TRACE_FILE')
+    if not path:
+        return None
+    return configure_tracing(path, otlp=os.getenv('POSTER_TRACE_FORMAT', 'jsonl').lower() == 'otlp')
+
+
+def read_spans(path: Union[str, Path]) -> List[Dict[str, Any]]:
+    """Read flat span records from a trace file in either export format"""
+    spans = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'resourceSpans' not in record:
+                spans.append(record)
+                continue
+            for resource_spans in record['resourceSpans']:
+                for scope_spans in resource_spans.get('scopeSpans', []):
+                    for otlp_span in scope_spans.get('spans', []):
+                        start, end = int(otlp_span['startTimeUnixNano']), int(otlp_span['endTimeUnixNano'])
+                        spans.append({
+                            'name': otlp_span['name'],
+                            'trace_id': otlp_span['traceId'],
+                            'span_id': otlp_span['spanId'],
+                            'parent_id': otlp_span.get('parentSpanId'),
+                            'start_ns': start,
+                            'end_ns': end,
+                            'duration_seconds': (end - start) / 1e9,
+                            'attributes': {
+                                attribute['key']: _from_otlp_attribute(attribute['value'])
+                                for attribute in otlp_span.get('attributes', [])
+                            },
+                            'status': 'error' if otlp_span.get('status', {}).get('code') == OTLP_STATUS_ERROR else 'ok',
+                        })
+    return spans
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    Get latency statistics per span name.
+
+    Returns:
+        Dict mapping span names to count, errors, p50, p90, p99, max and total seconds
+    """
+    durations: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for record in spans:
+        durations.setdefault(record['name'], []).append(record['duration_seconds'])
+        if record.get('status') == 'error':
+            errors[record['name']] = errors.get(record['name'], 0) + 1
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        summary[name] = {
+            'count': len(values),
+            'errors': errors.get(name, 0),
+            'p50': percentile(values, 0.50),
+            'p90': percentile(values, 0.90),
+            'p99': percentile(values, 0.99),
+            'max': values[-1],
+            'total': sum(values),
+        }
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Print per-stage latency percentiles of a trace file"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize poster pipeline traces")
+    parser.add_argument('trace_file', help="JSON-lines trace file (flat or OTLP)")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    summary = summarize(read_spans(args.trace_file))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+
+    print(f"📊 {sum(row['count'] for row in summary.values())} spans in {args.trace_file}")
+    print(f"{'span':<40} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'total s':>9}")
+    for name, row in sorted(summary.items(), key=lambda item: -item[1]['total']):
+        print(f"{name:<40} {row['count']:>6} {row['errors']:>6} {row['p50'] * 1000:>9.1f} "
+              f"{row['p90'] * 1000:>9.1f} {row['p99'] * 1000:>9.1f} {row['total']:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Tests for the map generator backends
+"""
+
+import base64
+import time
+
+import pytest
+from PIL import Image
+
+from services.backends import LocalBackend, SimulatedFailure
+from services.downloads import Downloader
+from services.predictions import WEBHOOKS, PredictionClient, WebhookReceiver
+from services.replicate import FloridaMapGenerator, MapStyle
+
+
+MODEL_INPUT = {'prompt': "Vintage Florida map", 'width': 128, 'height': 128}
+
+
+def open_output(output):
+    """Open the image a local backend prediction returned"""
+    return Image.open(output[0][len('file://'):])
+
+
+def test_local_backend_is_deterministic(tmp_path):
+    """Equal inputs give identical templates, a different seed a different one"""
+    first = LocalBackend(output_dir=str(tmp_path / "a")).run('local/model', MODEL_INPUT)
+    second = LocalBackend(output_dir=str(tmp_path / "b")).run('local/model', MODEL_INPUT)
+    reseeded = LocalBackend(output_dir=str(tmp_path / "c")).run('local/model', {**MODEL_INPUT, 'seed': 3})
+
+    assert open_output(first).tobytes() == open_output(second).tobytes()
+    assert open_output(first).tobytes() != open_output(reseeded).tobytes()
+    assert open_output(first).size == (128, 128)
+
+
+
+def test_local_backend_removes_its_own_directory(tmp_path):
+    """A temporary output directory goes with the backend, one it was given stays"""
+    owned = LocalBackend()
+    given = LocalBackend(output_dir=str(tmp_path / "given"))
+    for backend in (owned, given):
+        backend.run('local/model', MODEL_INPUT)
+        backend.close()
+
+    assert not owned.output_dir.exists()
+    assert list(given.output_dir.iterdir())
+
+def test_local_backend_failure_rate(tmp_path):
+    """A failure rate of 1 fails every prediction"""
+    backend = LocalBackend(output_dir=str(tmp_path), failure_rate=1.0)
+
+    with pytest.raises(SimulatedFailure):
+        backend.run('local/model', MODEL_INPUT)
+
+
+def test_generator_runs_offline_without_token(tmp_path, monkeypatch):
+    """The generator needs no token with the local backend, blocking or not"""
+    monkeypatch.delenv('REPLICATE_API_TOKEN', raising=False)
+    backend = LocalBackend(output_dir=str(tmp_path / "generated"), latency=0.05)
+    downloader = Downloader(sleep=lambda seconds: None, allow_file_urls=True)
+    generator = FloridaMapGenerator(backend=backend, downloader=downloader)
+
+    try:
+        path = generator.generate_map_template(MapStyle.RETRO, width=160, height=160,
+                                               save_path=str(tmp_path / "retro.png"))
+        handle = generator.submit_map_template(MapStyle.VINTAGE, width=160, height=160,
+                                               save_path=str(tmp_path / "vintage.png"))
+        finished, = generator.predictions.wait_all([handle], min_interval=0.02)
+        served = generator.save_map_template(finished)
+    finally:
+        backend.close()
+
+    assert Image.open(path).size == (160, 160)
+    assert finished.output[0].startswith('http://127.0.0.1:')
+    assert Image.open(served).size == (160, 160)
+
+
+def test_stand_in_signs_webhooks(tmp_path, monkeypatch):
+    """The stand-in's deliveries pass a receiver that requires signatures, so nothing is polled"""
+    secret = "whsec_" + base64.b64encode(b"local webhook key").decode()
+    monkeypatch.setenv('REPLICATE_WEBHOOK_SECRET', secret)
+    backend = LocalBackend(output_dir=str(tmp_path), latency=0.05, serve=True)
+    delivered = WEBHOOKS.value(result='ok')
+
+    try:
+        with WebhookReceiver() as webhook:
+            client = PredictionClient('local', base_url=backend.server.url, webhook=webhook)
+            handles = [client.submit('local/model', {**MODEL_INPUT, 'seed': seed}) for seed in range(3)]
+            start = time.perf_counter()
+            finished = client.wait_all(handles, max_interval=30)
+    finally:
+        backend.close()
+
+    assert time.perf_counter() - start < 5
+    assert all(handle.status == 'succeeded' for handle in finished)
+    assert WEBHOOKS.value(result='ok') - delivered == 3
@@ -0,0 +1,43 @@
+"""
+Tests for the poster rendering benchmark suite
+"""
+
+from benchmarks.poster_benchmark import BenchmarkResult, compare_to_baseline, run_pipeline_case, run_poster_case
+
+
+def test_poster_case_reports_stages(tmp_path):
+    """A tiny in-process case reports timings, throughput and counters"""
+    result = run_poster_case(str(tmp_path), breaks=20, size=256, style='classic', repeat=1)
+
+    assert result.name == "poster/classic/256px/20breaks"
+    assert result.seconds > 0 and result.throughput > 0
+    assert result.peak_rss_mb > 0
+    assert 'labels' in result.stages and 'save' in result.stages
+    assert result.counters['breaks_placed'] <= 20
+
+
+def test_compare_to_baseline_flags_regressions():
+    """Only cases slower than baseline * (1 + threshold) are reported"""
+    results = [
+        BenchmarkResult(name='fast', seconds=1.1, throughput=1.0, peak_rss_mb=1.0),
+        BenchmarkResult(name='slow', seconds=1.5, throughput=1.0, peak_rss_mb=1.0),
+        BenchmarkResult(name='new', seconds=9.0, throughput=1.0, peak_rss_mb=1.0),
+    ]
+    baseline = {'fast': {'seconds': 1.0}, 'slow': {'seconds': 1.0}}
+
+    regressions = compare_to_baseline(results, baseline, threshold=0.25)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith('slow:')
+
+
+def test_pipeline_case_runs_offline(tmp_path, monkeypatch):
+    """The whole pipeline runs on the offline backend without a token"""
+    monkeypatch.delenv('REPLICATE_API_TOKEN', raising=False)
+
+    result = run_pipeline_case(str(tmp_path), styles=2, size=256, repeat=1)
+
+    assert result.name == "pipeline/2styles/256px"
+    assert result.stages['pipeline.template'] > 0
+    assert result.stages['pipeline.overlay'] > 0
+    assert len(list(tmp_path.glob("pipeline_256_0/ai_generated_posters/*.png"))) == 2
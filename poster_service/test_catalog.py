@@ -0,0 +1,91 @@
+"""
+Tests for the SQLite asset catalog
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from services import catalog as catalog_module
+from services.catalog import POSTER, SCHEMA, TEMPLATE, AssetCatalog
+
+
+def test_records_replace_and_totals_follow(tmp_path):
+    """Re-recording a path replaces its record, and totals track every change"""
+    catalog = AssetCatalog(tmp_path / "catalog.sqlite3")
+    poster = tmp_path / "poster.png"
+    poster.write_bytes(b"x" * 10)
+
+    catalog.record(poster, POSTER, inputs_hash='first', style='classic')
+    poster.write_bytes(b"x" * 25)
+    catalog.record(poster, POSTER, inputs_hash='second', style='vintage')
+    catalog.record(tmp_path / "template.png", TEMPLATE, inputs_hash='key', size=100)
+
+    assert catalog.totals() == {TEMPLATE: (1, 100), POSTER: (1, 25)}
+    assert catalog.find(POSTER, 'second').style == 'vintage'
+    assert catalog.find(POSTER, 'first') is None
+
+    assert catalog.remove(poster)
+    assert catalog.totals()[POSTER] == (0, 0)
+    catalog.close()
+
+
+def test_concurrent_writers(tmp_path):
+    """Writers on many threads never lose a record"""
+    catalog = AssetCatalog(tmp_path / "catalog.sqlite3")
+
+    def write(worker):
+        for i in range(50):
+            catalog.record(tmp_path / f"{worker}_{i}.png", POSTER, inputs_hash=f"{worker}:{i}", size=1)
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert catalog.totals()[POSTER] == (400, 400)
+    assert catalog.find(POSTER, '7:49').path.endswith('7_49.png')
+    catalog.close()
+
+
+def test_migrates_version_1_catalogs(tmp_path):
+    """Catalogs from before access tracking gain access times and for-sale flags"""
+    path = tmp_path / "catalog.sqlite3"
+    with sqlite3.connect(path) as connection:
+        connection.executescript(SCHEMA)
+        connection.execute("INSERT INTO assets (path, kind, bytes, created_at) "
+                           "VALUES ('/old.png', 'poster', 5, 1.0)")
+        connection.execute("PRAGMA user_version = 1")
+    connection.close()
+
+    catalog = AssetCatalog(path)
+    asset = catalog.get('/old.png')
+    assert (asset.accessed_at, asset.for_sale) == (1.0, False)
+
+    assert catalog.mark_for_sale('/old.png')
+    catalog.record('/old.png', POSTER, size=5)
+    assert catalog.get('/old.png').for_sale
+    assert catalog.usage_under('/')['/old.png'][1]
+    catalog.close()
+
+
+def test_failed_migration_leaves_catalog_untouched(tmp_path, monkeypatch):
+    """A migration that fails part way rolls back its statements and its version bump"""
+    path = tmp_path / "catalog.sqlite3"
+    with sqlite3.connect(path) as connection:
+        connection.executescript(SCHEMA)
+        connection.execute("PRAGMA user_version = 1")
+    connection.close()
+    monkeypatch.setitem(catalog_module.MIGRATIONS, 1,
+                        catalog_module.MIGRATIONS[1] + "UPDATE no_such_table SET x = 1;")
+
+    with pytest.raises(sqlite3.OperationalError):
+        AssetCatalog(path)
+
+    with sqlite3.connect(path) as connection:
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(assets)")]
+        assert connection.execute("PRAGMA user_version").fetchone()[0] == 1
+    connection.close()
+    assert 'accessed_at' not in columns
@@ -0,0 +1,86 @@
+"""
+Tests for concurrent template generation and the prediction rate limiter
+"""
+
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from services.rate_limit import RateLimiter
+from services.replicate import FloridaMapGenerator, MapStyle
+
+
+# Simulated prediction latency per style, so completion order differs from style order
+LATENCIES = {style: 0.05 * (len(MapStyle) - i) for i, style in enumerate(MapStyle)}
+
+
+@pytest.fixture
+def generator(monkeypatch, tmp_path):
+    """Map generator backed by a fake replicate client that tracks concurrency"""
+    state = {'running': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    def run(model, input):
+        style = next(s for s in MapStyle if FloridaMapGenerator.STYLE_PROMPTS[s]['prompt'] in input['prompt'])
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(LATENCIES[style])
+        with lock:
+            state['running'] -= 1
+        if style == MapStyle.RETRO:
+            raise RuntimeError("prediction failed")
+        return [f"https://example.invalid/{style.value}.png"]
+
+    monkeypatch.setitem(sys.modules, 'replicate', types.SimpleNamespace(run=run))
+    map_generator = FloridaMapGenerator(api_token='r8_test_token', rate_limiter=RateLimiter(1000, burst=100))
+    monkeypatch.setattr(map_generator, '_download_image',
+                        lambda url, style, save_path=None: save_path)
+    map_generator.state = state
+    return map_generator
+
+
+def test_all_styles_run_concurrently(generator, tmp_path):
+    """A full style set takes about one prediction's latency with enough workers"""
+    completed = []
+
+    start = time.perf_counter()
+    maps = generator.generate_all_styles(str(tmp_path), max_concurrency=len(MapStyle),
+                                         on_complete=completed.append)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 2 * max(LATENCIES.values())
+    assert set(maps) == set(MapStyle) - {MapStyle.RETRO}
+    assert [result.style for result in completed if result.ok][0] == MapStyle.BOTANICAL
+    failed, = [result for result in completed if not result.ok]
+    assert failed.style == MapStyle.RETRO and 'prediction failed' in str(failed.error)
+
+
+def test_concurrency_cap(generator, tmp_path):
+    """No more than max_concurrency predictions run at once"""
+    results = list(generator.iter_generate_styles(list(MapStyle), str(tmp_path), max_concurrency=2))
+
+    assert len(results) == len(MapStyle)
+    assert generator.state['peak'] == 2
+
+
+def test_rate_limiter_spaces_out_calls():
+    """Calls beyond the burst wait for the bucket to refill"""
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(rate=2, burst=2, clock=lambda: now[0], sleep=sleep)
+
+    waits = [limiter.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.5)
+    assert waits[3] == pytest.approx(0.5)
+    assert now[0] == pytest.approx(1.0)
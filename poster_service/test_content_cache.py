@@ -0,0 +1,88 @@
+"""
+Tests for the content-addressed cache and cached poster renders
+"""
+
+import json
+import os
+
+from PIL import Image
+
+from services.content_cache import ContentCache, hash_inputs
+from services.poster import FloridaSurfBreakPosterService, PosterStyle
+
+
+def test_put_get_and_metadata(tmp_path):
+    """Entries round-trip with their metadata sidecar"""
+    cache = ContentCache(tmp_path / "cache", suffix=".png")
+    key = hash_inputs({"style": "classic", "title": "A"})
+
+    assert cache.get(key) is None
+    cache.put_bytes(key, b"poster", metadata={"style": "classic"})
+
+    assert cache.get(key).read_bytes() == b"poster"
+    assert cache.get_metadata(key) == {"style": "classic"}
+    assert cache.stats() == {"hits": 1, "misses": 1, "bytes": 6}
+    assert not [p for p in (tmp_path / "cache").rglob(".*")]
+
+
+def test_lru_eviction_respects_budget(tmp_path):
+    """The least recently used entries are evicted first"""
+    cache = ContentCache(tmp_path / "cache", max_bytes=350)
+    keys = [hash_inputs({"n": n}) for n in range(3)]
+    for age, key in enumerate(keys):
+        cache.put_bytes(key, b"x" * 100, metadata={})
+        os.utime(cache.path_for(key), (age, age))
+
+    # Touching the oldest entry makes the middle one least recently used
+    assert cache.get(keys[0]) is not None
+    cache.put_bytes(hash_inputs({"n": 3}), b"x" * 100)
+
+    assert cache.size() <= 350
+    assert cache.get(keys[1]) is None
+    assert cache.get_metadata(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+
+
+def test_eviction_walks_without_the_lock(tmp_path):
+    """Lookups proceed while eviction walks the cache, and an entry hit meanwhile is kept"""
+    cache = ContentCache(tmp_path / "cache", max_bytes=10_000)
+    keys = [hash_inputs({"n": n}) for n in range(3)]
+    for age, key in enumerate(keys):
+        cache.put_bytes(key, b"x" * 100)
+        os.utime(cache.path_for(key), (age, age))
+    cache.max_bytes = 200
+    walk = cache._entries
+
+    def walk_during_lookup():
+        entries = walk()
+        assert not cache._lock.locked()
+        assert cache.get(keys[0]) is not None
+        return entries
+    cache._entries = walk_during_lookup
+
+    assert cache.evict() == 100
+    assert [cache.get(key) is not None for key in keys] == [True, False, True]
+    assert cache.size() == 200
+
+
+def test_poster_cache_hits_and_invalidation(tmp_path):
+    """Unchanged inputs are served from cache; any changed input re-renders"""
+    data_path = tmp_path / "breaks.json"
+    data_path.write_text(json.dumps([
+        {"name": "Sebastian Inlet", "latitude": 27.86, "longitude": -80.45, "break_type": "Beach/jetty"},
+    ]))
+    template = tmp_path / "template.png"
+    Image.new("RGB", (300, 300), (220, 230, 240)).save(template)
+    cache = ContentCache(tmp_path / "cache", suffix=".png")
+    service = FloridaSurfBreakPosterService(data_path=str(data_path), output_cache=cache)
+
+    assert service.generate_poster(str(template), str(tmp_path / "a.png"), title="Cached")
+    assert service.generate_poster(str(template), str(tmp_path / "b.png"), title="Cached")
+    assert (tmp_path / "a.png").read_bytes() == (tmp_path / "b.png").read_bytes()
+    assert cache.hits == 1
+
+    service.generate_poster(str(template), str(tmp_path / "c.png"), PosterStyle.MINIMALIST, title="Cached")
+    Image.new("RGB", (300, 300), (10, 20, 30)).save(template)
+    service.generate_poster(str(template), str(tmp_path / "d.png"), title="Cached")
+    assert cache.hits == 1
+    assert cache.misses == 3
@@ -0,0 +1,72 @@
+"""
+Tests for hot-reloading the surf break dataset
+"""
+
+import json
+import os
+import time
+
+from services.poster import FloridaSurfBreakPosterService, MapBounds
+
+
+NORTH = MapBounds(min_lat=28.0, max_lat=31.0, min_lon=-87.6, max_lon=-79.9)
+SOUTH = MapBounds(min_lat=24.5, max_lat=27.0, min_lon=-82.0, max_lon=-79.9)
+
+BREAKS = [
+    {"name": "Ponce Inlet", "latitude": 29.08, "longitude": -80.92, "break_type": "Beach/jetty"},
+    {"name": "Pensacola Pier", "latitude": 30.33, "longitude": -87.14, "break_type": "Beach/pier"},
+    {"name": "Jupiter Inlet", "latitude": 26.94, "longitude": -80.07, "break_type": "Beach/jetty"},
+    {"name": "Haulover", "latitude": 25.90, "longitude": -80.12, "break_type": "Beach"},
+]
+
+
+def write_dataset(path, breaks, mtime_ns):
+    path.write_text(json.dumps(breaks))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_reload_diff_and_region_invalidation(tmp_path):
+    """Only layouts covering changed breaks are recomputed after a reload"""
+    data_path = tmp_path / "breaks.json"
+    write_dataset(data_path, BREAKS, 10**18)
+    service = FloridaSurfBreakPosterService(data_path=str(data_path))
+
+    north_layout = service._layout_breaks(1000, 1000, NORTH)
+    south_layout = service._layout_breaks(1000, 1000, SOUTH)
+    assert [p.surf_break.name for p in south_layout] == ["Jupiter Inlet", "Haulover"]
+
+    diffs = []
+    service.add_reload_listener(diffs.append)
+
+    updated = [dict(b) for b in BREAKS[:3]]
+    updated[2]["latitude"] = 26.95
+    updated.append({"name": "Sebastian Inlet", "latitude": 27.86, "longitude": -80.45, "break_type": "Beach/jetty"})
+    write_dataset(data_path, updated, 2 * 10**18)
+
+    diff = service.check_for_updates()
+    assert diffs == [diff]
+    assert [b.name for b in diff.added] == ["Sebastian Inlet"]
+    assert [b.name for b in diff.removed] == ["Haulover"]
+    assert [(old.latitude, new.latitude) for old, new in diff.moved] == [(26.94, 26.95)]
+
+    assert service._layout_breaks(1000, 1000, NORTH) is north_layout
+    assert [p.surf_break.name for p in service._layout_breaks(1000, 1000, SOUTH)] == ["Jupiter Inlet"]
+    assert service.check_for_updates() is None
+
+
+def test_watcher_picks_up_changes(tmp_path):
+    """The background watcher reloads the data file when it changes"""
+    data_path = tmp_path / "breaks.json"
+    write_dataset(data_path, BREAKS, 10**18)
+    service = FloridaSurfBreakPosterService(data_path=str(data_path))
+
+    service.start_watching(interval=0.01)
+    try:
+        write_dataset(data_path, BREAKS[:1], 2 * 10**18)
+        deadline = time.monotonic() + 5
+        while len(service.surf_breaks) != 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        service.stop_watching()
+
+    assert [b.name for b in service.surf_breaks] == ["Ponce Inlet"]
@@ -0,0 +1,98 @@
+"""
+Tests for streaming, resumable downloads
+"""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.downloads import Downloader, DownloadError
+
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB
+
+
+@pytest.fixture
+def server():
+    """Local file server that drops the first connection halfway and honours Range"""
+    state = {'requests': [], 'drop_first': True}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state['requests'].append(self.headers.get('Range'))
+            if self.path == '/missing.png':
+                self.send_error(404)
+                return
+            start = 0
+            if self.headers.get('Range'):
+                start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            body = PAYLOAD[start:]
+            self.send_response(206 if start else 200)
+            self.send_header('Content-Length', str(len(body)))
+            if start:
+                self.send_header('Content-Range', f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+            self.end_headers()
+            if state['drop_first']:
+                state['drop_first'] = False
+                self.wfile.write(body[:len(body) // 2])
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    state['url'] = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_resumes_dropped_download(server, tmp_path):
+    """A dropped connection is retried from where the partial file ends"""
+    dest = tmp_path / "maps" / "template.png"
+
+    result = Downloader(sleep=lambda seconds: None).download(
+        f"{server['url']}/template.png", dest, sha256=hashlib.sha256(PAYLOAD).hexdigest())
+
+    assert dest.read_bytes() == PAYLOAD
+    assert result.retries == 1 and result.resumed
+    assert server['requests'] == [None, f"bytes={len(PAYLOAD) // 2}-"]
+    assert not (tmp_path / "maps" / "template.png.part").exists()
+
+
+def test_checksum_mismatch_leaves_nothing_behind(server, tmp_path):
+    """Content that fails validation is never renamed into place"""
+    server['drop_first'] = False
+    dest = tmp_path / "template.png"
+
+    with pytest.raises(DownloadError, match="Checksum mismatch"):
+        Downloader().download(f"{server['url']}/template.png", dest, sha256="0" * 64)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_client_errors_are_not_retried(server, tmp_path):
+    """A 404 fails on the first attempt"""
+    with pytest.raises(DownloadError):
+        Downloader(sleep=lambda seconds: None).download(f"{server['url']}/missing.png", tmp_path / "x.png")
+
+    assert len(server['requests']) == 1
+
+
+def test_local_files_need_opting_in(tmp_path):
+    """file:// URLs are copied only when allowed, and other schemes never"""
+    secret = tmp_path / "secret.txt"
+    secret.write_bytes(PAYLOAD)
+
+    with pytest.raises(DownloadError, match="not allowed"):
+        Downloader().download(secret.as_uri(), tmp_path / "stolen.png")
+    with pytest.raises(DownloadError, match="not allowed"):
+        Downloader(allow_file_urls=True).download_bytes("ftp://example.invalid/template.png")
+    assert not (tmp_path / "stolen.png").exists()
+
+    assert Downloader(allow_file_urls=True).download_bytes(secret.as_uri()).data == PAYLOAD
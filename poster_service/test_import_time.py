@@ -0,0 +1,74 @@
+"""
+Import-time budget tests
+
+Render workers and CLI calls import the pipeline modules on every start, so
+importing them must stay cheap and free of side effects.
+
+Wall-clock budgets depend on the machine and its load, so they are only
+checked when POSTER_IMPORT_BUDGETS=1 is set, e.g. on a quiet benchmark host.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+SERVICE_DIR = Path(__file__).parent
+
+# Cumulative import time allowed for each module, in microseconds
+IMPORT_BUDGETS_US = {
+    'services.poster': 150_000,
+    'services.replicate': 50_000,
+    'ai_poster_pipeline': 200_000,
+}
+
+# Dependencies that must only be imported when they are actually used
+LAZY_DEPENDENCIES = {'replicate', 'requests', 'dotenv'}
+
+
+def import_profile(module):
+    """Import a module in a fresh interpreter and parse its -X importtime report"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SERVICE_DIR, capture_output=True, text=True, check=True
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        cumulative[name.strip()] = int(cumulative_us)
+    return result.stdout, cumulative
+
+
+def test_imports_are_side_effect_free():
+    """Importing the services prints nothing and skips optional dependencies"""
+    for module in IMPORT_BUDGETS_US:
+        stdout, imported = import_profile(module)
+        assert stdout == ''
+        assert not LAZY_DEPENDENCIES & set(imported), module
+
+
+@pytest.mark.skipif(os.getenv('POSTER_IMPORT_BUDGETS') != '1',
+                    reason="wall-clock budget; set POSTER_IMPORT_BUDGETS=1 to check it")
+def test_import_time_budget():
+    """Each module imports within its budget"""
+    for module, budget in IMPORT_BUDGETS_US.items():
+        _, imported = import_profile(module)
+        assert imported[module] <= budget, f"{module} took {imported[module]}us"
+
+
+def test_overlay_works_without_replicate():
+    """The pipeline imports and constructs generators without the replicate package"""
+    code = (
+        "import sys; sys.modules['replicate'] = None\n"
+        "from ai_poster_pipeline import AIPosterPipeline\n"
+        "from services.replicate import FloridaMapGenerator\n"
+        "FloridaMapGenerator(api_token='r8_test')\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=SERVICE_DIR,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
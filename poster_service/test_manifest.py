@@ -0,0 +1,34 @@
+"""
+Tests for collection run manifests
+"""
+
+from services.manifest import CollectionManifest
+
+
+def test_manifest_checkpoints_and_resumes(tmp_path):
+    """Progress survives reopening, but not a change of inputs or artifacts"""
+    path = tmp_path / "run_manifest.json"
+    template = tmp_path / "template.png"
+    template.write_bytes(b"template")
+
+    manifest = CollectionManifest(path)
+    assert manifest.start_job('classic', 'inputs-1') == CollectionManifest.PENDING
+    manifest.record('classic', CollectionManifest.OVERLAY)
+    manifest.record('classic', CollectionManifest.TEMPLATE, template=template)
+
+    reopened = CollectionManifest(path)
+    assert reopened.start_job('classic', 'inputs-1') == CollectionManifest.OVERLAY
+    assert reopened.artifact('classic', 'template') == template
+
+    template.write_bytes(b"edited")
+    assert reopened.artifact('classic', 'template') is None
+    assert reopened.start_job('classic', 'inputs-2') == CollectionManifest.PENDING
+    assert reopened.artifact('classic', 'template') is None
+
+
+def test_unreadable_manifest_starts_over(tmp_path):
+    """A corrupt manifest is ignored rather than failing the run"""
+    path = tmp_path / "run_manifest.json"
+    path.write_text("{not json")
+
+    assert CollectionManifest(path).start_job('classic', 'inputs') == CollectionManifest.PENDING
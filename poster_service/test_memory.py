@@ -0,0 +1,126 @@
+"""
+Tests for render memory estimates and memory budgets
+"""
+
+import json
+
+import pytest
+from PIL import Image
+
+from services.memory import (
+    BudgetPolicy,
+    MemoryBudget,
+    MemoryBudgetExceeded,
+    RssSampler,
+    estimate_render_memory,
+    plan_render,
+)
+from services.poster import FloridaSurfBreakPosterService, PosterStyle
+
+
+MiB = 2 ** 20
+
+
+def make_service(tmp_path, **kwargs):
+    """Create a poster service backed by a tiny dataset"""
+    data_path = tmp_path / "breaks.json"
+    data_path.write_text(json.dumps([
+        {"name": "Sebastian Inlet", "latitude": 27.86, "longitude": -80.45, "break_type": "Beach/jetty"},
+    ]))
+    return FloridaSurfBreakPosterService(data_path=str(data_path), **kwargs)
+
+
+def test_estimate_grows_with_size_effects_and_workers():
+    """Bigger images, more effects and more strips in flight need more memory"""
+    small = estimate_render_memory((1000, 1000), [])
+    large = estimate_render_memory((2000, 2000), [])
+    vintage = estimate_render_memory((2000, 2000), ['sepia', 'noise'], effect_workers=1)
+    threaded = estimate_render_memory((2000, 2000), ['sepia', 'noise'], effect_workers=8)
+
+    assert large.peak_bytes == 4 * small.peak_bytes
+    assert vintage.peak_bytes > large.peak_bytes
+    assert threaded.peak_bytes > vintage.peak_bytes
+    assert set(large.phases) == {'background_effects', 'drawing', 'encode'}
+
+
+def test_plan_policies():
+    """Over budget renders are refused, tiled or downscaled per policy"""
+    effects = ['sepia', 'noise']
+    threaded = estimate_render_memory((4000, 4000), effects, effect_workers=8).peak_bytes
+    tiled = estimate_render_memory((4000, 4000), effects, effect_workers=1).peak_bytes
+
+    assert plan_render(None, (4000, 4000), effects, effect_workers=8).effect_workers == 8
+
+    with pytest.raises(MemoryBudgetExceeded):
+        plan_render(MemoryBudget(tiled, BudgetPolicy.REFUSE), (4000, 4000), effects, effect_workers=8)
+
+    plan = plan_render(MemoryBudget(tiled, BudgetPolicy.TILED), (4000, 4000), effects, effect_workers=8)
+    assert plan.tiled and not plan.downscaled and plan.estimate.peak_bytes < threaded
+
+    with pytest.raises(MemoryBudgetExceeded):
+        plan_render(MemoryBudget(tiled // 2, BudgetPolicy.TILED), (4000, 4000), effects, effect_workers=8)
+
+    plan = plan_render(MemoryBudget(tiled // 2, BudgetPolicy.DOWNSCALE), (4000, 4000), effects, effect_workers=8)
+    assert plan.downscaled and plan.size[0] < 4000
+    assert plan.estimate.peak_bytes <= tiled // 2
+
+
+def test_rss_sampler_sees_allocations():
+    """The sampler's peak covers memory allocated inside the block"""
+    with RssSampler() as sampler:
+        # Filled bytes touch every page, unlike calloc'd or pooled image buffers
+        block = b'\x01' * (32 * MiB)
+    del block
+
+    if sampler.peak_bytes is None:
+        pytest.skip("RSS is not available on this platform")
+    assert sampler.growth_bytes >= 8 * MiB
+
+
+def test_generate_poster_records_memory(tmp_path):
+    """Renders report their estimate and budget, and refused renders fail"""
+    template = tmp_path / "template.png"
+    Image.new("RGBA", (512, 512), (200, 220, 240, 255)).save(template)
+
+    reports = []
+    service = make_service(tmp_path, stats_hook=reports.append,
+                           memory_budget=MemoryBudget(64 * MiB))
+    assert service.generate_poster(str(template), str(tmp_path / "poster.png"), PosterStyle.VINTAGE)
+    counters = reports[0].counters
+    assert counters['memory_budget_bytes'] == 64 * MiB
+    assert 0 < counters['memory_estimated_bytes'] <= 64 * MiB
+
+    refusing = make_service(tmp_path, memory_budget=MemoryBudget(MiB, BudgetPolicy.REFUSE))
+    assert not refusing.generate_poster(str(template), str(tmp_path / "refused.png"))
+
+
+def test_downscaled_render_fits_budget(tmp_path):
+    """The downscale policy shrinks the poster to fit"""
+    template = tmp_path / "template.png"
+    Image.new("RGBA", (1024, 1024), (200, 220, 240, 255)).save(template)
+    budget = estimate_render_memory((1024, 1024), []).peak_bytes // 2
+
+    reports = []
+    service = make_service(tmp_path, stats_hook=reports.append,
+                           memory_budget=MemoryBudget(budget, BudgetPolicy.DOWNSCALE))
+    assert service.generate_poster(str(template), str(tmp_path / "poster.png"), PosterStyle.MINIMALIST)
+
+    assert reports[0].counters['downscaled_renders'] == 1
+    with Image.open(tmp_path / "poster.png") as poster:
+        assert poster.width < 1024
+
+
+def test_refused_render_never_decodes_template(tmp_path):
+    """Without an output cache the budget is still checked before the template is decoded"""
+    template = tmp_path / "template.png"
+    Image.new("RGBA", (512, 512), (200, 220, 240, 255)).save(template)
+    loads = []
+
+    def load_template():
+        loads.append(1)
+        return Image.open(template).convert("RGBA")
+
+    service = make_service(tmp_path, memory_budget=MemoryBudget(MiB, BudgetPolicy.REFUSE))
+    with pytest.raises(MemoryBudgetExceeded):
+        service.render_poster_bytes(str(template), template_loader=load_template)
+    assert not loads
@@ -0,0 +1,96 @@
+"""
+Tests for the metrics registry and its Prometheus text export
+"""
+
+import json
+import urllib.request
+
+import pytest
+from PIL import Image
+
+from services.content_cache import ContentCache
+from services.metrics import MetricsRegistry
+from services.poster import CACHE_LOOKUPS, RENDERS, FloridaSurfBreakPosterService, PosterStyle
+
+
+def test_prometheus_text_format():
+    """Counters, gauges and histograms render in the exposition format"""
+    registry = MetricsRegistry()
+    requests = registry.counter('demo_requests_total', "Requests", ['outcome'])
+    depth = registry.gauge('demo_queue_depth', "Queue depth")
+    latency = registry.histogram('demo_latency_seconds', "Latency", buckets=(0.1, 1.0))
+
+    requests.inc(outcome='ok')
+    requests.inc(2, outcome='error "quoted"')
+    depth.set_function(lambda: 7)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render()
+
+    assert '# TYPE demo_requests_total counter' in text
+    assert 'demo_requests_total{outcome="ok"} 1' in text
+    assert 'demo_requests_total{outcome="error \\"quoted\\""} 2' in text
+    assert 'demo_queue_depth 7' in text
+    assert 'demo_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_latency_seconds_bucket{le="1"} 2' in text
+    assert 'demo_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'demo_latency_seconds_sum 5.55' in text
+    assert 'demo_latency_seconds_count 3' in text
+
+
+def test_registry_validates_metrics():
+    """Labels must match, counters only go up, names are not reused"""
+    registry = MetricsRegistry()
+    renders = registry.counter('demo_renders_total', "Renders", ['style'])
+
+    assert registry.counter('demo_renders_total', "Renders", ['style']) is renders
+    with pytest.raises(ValueError):
+        registry.gauge('demo_renders_total', "Renders", ['style'])
+    with pytest.raises(ValueError):
+        renders.inc(shape='square')
+    with pytest.raises(ValueError):
+        renders.inc(-1, style='vintage')
+
+
+def test_textfile_and_http_export(tmp_path):
+    """Metrics can be written to a file or scraped over HTTP"""
+    registry = MetricsRegistry()
+    registry.counter('demo_total', "Demo").inc(3)
+
+    path = tmp_path / "metrics" / "poster.prom"
+    registry.write_textfile(path)
+    assert 'demo_total 3' in path.read_text()
+
+    server = registry.serve(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers['Content-Type'].startswith('text/plain')
+            assert 'demo_total 3' in response.read().decode('utf-8')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_poster_service_counts_renders_and_cache(tmp_path):
+    """Renders and output cache hits and misses are counted"""
+    data_path = tmp_path / "breaks.json"
+    data_path.write_text(json.dumps([
+        {"name": "Sebastian Inlet", "latitude": 27.86, "longitude": -80.45, "break_type": "Beach/jetty"},
+    ]))
+    template = tmp_path / "template.png"
+    Image.new("RGBA", (200, 200), (200, 220, 240, 255)).save(template)
+    service = FloridaSurfBreakPosterService(data_path=str(data_path),
+                                            output_cache=ContentCache(tmp_path / "cache"))
+
+    renders = RENDERS.value(style='minimalist')
+    hits, misses = CACHE_LOOKUPS.value(result='hit'), CACHE_LOOKUPS.value(result='miss')
+
+    for _ in range(2):
+        assert service.generate_poster(str(template), str(tmp_path / "poster.png"), PosterStyle.MINIMALIST)
+
+    assert RENDERS.value(style='minimalist') == renders + 1
+    assert CACHE_LOOKUPS.value(result='miss') == misses + 1
+    assert CACHE_LOOKUPS.value(result='hit') == hits + 1
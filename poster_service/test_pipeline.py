@@ -0,0 +1,165 @@
+"""
+Tests for the AI poster pipeline on the offline generator backend
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from ai_poster_pipeline import AIPosterPipeline, OverlayVariant
+from benchmarks.poster_benchmark import make_synthetic_dataset
+from services.backends import LocalBackend
+from services.poster import DecodedTemplate, MapBounds, PosterStyle
+from services.replicate import MapStyle
+
+
+def make_pipeline(tmp_path, monkeypatch, latency=0.0):
+    """Offline pipeline that records templates opened from disk"""
+    monkeypatch.delenv('REPLICATE_API_TOKEN', raising=False)
+    data_path = make_synthetic_dataset(tmp_path / "breaks.json", 20)
+    backend = LocalBackend(output_dir=str(tmp_path / "generated"), latency=latency)
+    pipeline = AIPosterPipeline(backend=backend, base_dir=str(tmp_path), data_path=str(data_path))
+
+    opened = []
+    original_open = Image.open
+
+    def tracking_open(fp, *args, **kwargs):
+        if str(fp).startswith(str(pipeline.templates_dir)):
+            opened.append(fp)
+        return original_open(fp, *args, **kwargs)
+
+    monkeypatch.setattr(Image, 'open', tracking_open)
+    return pipeline, opened
+
+
+def test_poster_renders_from_memory_and_template_is_saved(tmp_path, monkeypatch):
+    """The template is never read back, and is written in the background"""
+    pipeline, opened = make_pipeline(tmp_path, monkeypatch)
+
+    poster = pipeline.generate_single_poster(MapStyle.CLASSIC, "Handoff", width=96, height=96)
+    written = pipeline.flush_template_writes()
+    pipeline.close()
+
+    assert not opened
+    assert Image.open(poster).size == (96, 96)
+    assert written == [str(pipeline.templates_dir / "template_classic.png")]
+    assert Image.open(written[0]).size == (96, 96)
+
+
+def test_template_persistence_is_optional(tmp_path, monkeypatch):
+    """Without persistence no template file is written, but the poster still is"""
+    pipeline, opened = make_pipeline(tmp_path, monkeypatch)
+
+    poster = pipeline.generate_custom_poster("Neon Florida map", "Neon", "neon",
+                                             width=96, height=96, persist_template=False)
+    pipeline.close()
+
+    assert not opened
+    assert Image.open(poster).size == (96, 96)
+    assert not list(pipeline.templates_dir.iterdir())
+
+
+def test_collection_overlaps_generation_and_rendering(tmp_path, monkeypatch):
+    """Generation runs concurrently, rendering within its own limit"""
+    pipeline, _ = make_pipeline(tmp_path, monkeypatch, latency=0.4)
+    generate_poster = pipeline.poster_service.generate_poster
+    rendering = []
+    most_rendering = [0]
+    lock = threading.Lock()
+
+    def tracking_generate_poster(**kwargs):
+        with lock:
+            rendering.append(1)
+            most_rendering[0] = max(most_rendering[0], len(rendering))
+        try:
+            time.sleep(0.05)
+            return generate_poster(**kwargs)
+        finally:
+            with lock:
+                rendering.pop()
+
+    monkeypatch.setattr(pipeline.poster_service, 'generate_poster', tracking_generate_poster)
+    styles = list(MapStyle)[:4]
+
+    start = time.perf_counter()
+    posters = pipeline.generate_poster_collection("Pipelined", styles, width=64, height=64,
+                                                  generation_concurrency=4, render_concurrency=1,
+                                                  queue_size=1)
+    elapsed = time.perf_counter() - start
+    pipeline.close()
+
+    # Sequentially this takes at least 4 * 0.4s of generation alone
+    assert elapsed < 1.4
+    assert most_rendering[0] == 1
+    assert list(posters) == styles
+    assert all(Image.open(path).size == (64, 64) for path in posters.values())
+
+
+def test_collection_resumes_from_manifest(tmp_path, monkeypatch):
+    """A rerun skips finished posters and renders missing ones from saved templates"""
+    pipeline, _ = make_pipeline(tmp_path, monkeypatch)
+    styles = list(MapStyle)[:3]
+    first = pipeline.generate_poster_collection("Resume", styles, width=64, height=64)
+
+    generations = []
+    generate_map_bytes = pipeline.map_generator.generate_map_bytes
+    monkeypatch.setattr(pipeline.map_generator, 'generate_map_bytes',
+                        lambda *args, **kwargs: generations.append(1) or generate_map_bytes(*args, **kwargs))
+    renders = []
+    generate_poster = pipeline.poster_service.generate_poster
+    monkeypatch.setattr(pipeline.poster_service, 'generate_poster',
+                        lambda **kwargs: renders.append(1) or generate_poster(**kwargs))
+
+    Path(first[styles[0]]).unlink()
+    second = pipeline.generate_poster_collection("Resume", styles, width=64, height=64)
+    assert second == first
+    assert not generations and len(renders) == 1
+
+    # Changed inputs invalidate the checkpoint
+    pipeline.generate_poster_collection("Resume", styles[:1], width=96, height=96)
+    pipeline.close()
+    assert len(generations) == 1
+
+
+def test_variants_share_one_template(tmp_path, monkeypatch):
+    """Many overlays come from one generation and one decode"""
+    pipeline, opened = make_pipeline(tmp_path, monkeypatch)
+    generations, decodes = [], []
+    generate_map_bytes = pipeline.map_generator.generate_map_bytes
+    monkeypatch.setattr(pipeline.map_generator, 'generate_map_bytes',
+                        lambda *args, **kwargs: generations.append(1) or generate_map_bytes(*args, **kwargs))
+    from_bytes = DecodedTemplate.from_bytes
+    monkeypatch.setattr(DecodedTemplate, 'from_bytes',
+                        lambda *args, **kwargs: decodes.append(1) or from_bytes(*args, **kwargs))
+
+    posters = pipeline.generate_poster_variants(MapStyle.CLASSIC, [
+        OverlayVariant(PosterStyle.CLASSIC, title="Statewide"),
+        OverlayVariant(PosterStyle.VINTAGE, title="Space Coast", name="space_coast",
+                       bounds=MapBounds(min_lat=27.5, max_lat=29.0, min_lon=-81.2, max_lon=-80.2)),
+        OverlayVariant(PosterStyle.MINIMALIST),
+    ], width=64, height=64, render_concurrency=3)
+    pipeline.close()
+
+    assert len(generations) == 1 and len(decodes) == 1 and not opened
+    assert list(posters) == ['classic', 'space_coast', 'minimalist']
+    assert all(Image.open(path).size == (64, 64) for path in posters.values())
+
+
+def test_status_and_lookups_use_the_catalog(tmp_path, monkeypatch):
+    """Status counts and poster lookups come from the catalog, not directory listings"""
+    pipeline, _ = make_pipeline(tmp_path, monkeypatch)
+    poster = pipeline.generate_single_poster(MapStyle.VINTAGE, "Catalog", width=64, height=64)
+    monkeypatch.setattr(Path, 'glob', lambda *args: pytest.fail("status listed a directory"))
+
+    status = pipeline.get_pipeline_status()
+    template_key = pipeline.map_generator.style_template_key(MapStyle.VINTAGE, 64, 64)
+    found = pipeline.find_poster(template_key, PosterStyle.VINTAGE, "Catalog")
+    missing = pipeline.find_poster(template_key, PosterStyle.VINTAGE, "Other title")
+    pipeline.close()
+
+    assert (status['templates_generated'], status['posters_generated']) == (1, 1)
+    assert status['posters_bytes'] == Path(poster).stat().st_size
+    assert found == str(Path(poster).resolve()) and missing is None
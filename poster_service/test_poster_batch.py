@@ -0,0 +1,131 @@
+"""
+Tests for batch poster builds from job files
+"""
+
+import json
+
+import pytest
+from PIL import Image
+
+from ai_poster_pipeline import AIPosterPipeline
+from benchmarks.poster_benchmark import make_synthetic_dataset
+from poster_batch import BatchRunner, JobFileError, build_job_graph, load_job_file, main
+from services.backends import LocalBackend
+
+
+JOB_FILE = """
+collection: Nightly
+profiles:
+  web: {width: 64, height: 64, format: png}
+  print: {width: 96, height: 96, format: jpg}
+defaults: {profiles: [web]}
+posters:
+  - {name: classic_north, style: classic, title: North Florida}
+  - {name: classic_south, style: classic, title: South Florida,
+     bounds: {min_lat: 24.5, max_lat: 27.0, min_lon: -82.5, max_lon: -79.8}}
+  - {name: neon, prompt: Neon Florida map, poster_style: vintage, profiles: [web, print]}
+"""
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.delenv('REPLICATE_API_TOKEN', raising=False)
+    data_path = make_synthetic_dataset(tmp_path / "breaks.json", 20)
+    pipeline = AIPosterPipeline(backend=LocalBackend(output_dir=str(tmp_path / "generated")),
+                                base_dir=str(tmp_path / "build"), data_path=str(data_path))
+    yield pipeline
+    pipeline.close()
+
+
+def write_job_file(tmp_path, text=JOB_FILE, name="jobs.yaml"):
+    path = tmp_path / name
+    path.write_text(text)
+    return path
+
+
+def test_job_graph_dedupes_templates(tmp_path, pipeline):
+    """Posters with identical generation inputs share one template"""
+    graph = build_job_graph(load_job_file(write_job_file(tmp_path)), pipeline)
+
+    assert len(graph.renders) == 4
+    assert sorted((node.name, node.width, len(node.renders)) for node in graph.templates.values()) == [
+        ('classic', 64, 2), ('neon', 64, 1), ('neon', 96, 1)]
+    assert {render.output_path.name for render in graph.renders} == {
+        'classic_north_web.png', 'classic_south_web.png', 'neon_web.png', 'neon_print.jpg'}
+
+
+def test_invalid_job_file(tmp_path, pipeline):
+    """Mistakes in the job file are reported before anything runs"""
+    with pytest.raises(JobFileError, match="map style"):
+        build_job_graph({'posters': [{'style': 'cubist'}]}, pipeline)
+    with pytest.raises(JobFileError, match="not available"):
+        build_job_graph({'posters': [{'style': 'classic', 'poster_style': 'retro'}]}, pipeline)
+    with pytest.raises(JobFileError, match="unknown profile"):
+        build_job_graph({'posters': [{'style': 'classic', 'profiles': ['huge']}]}, pipeline)
+    with pytest.raises(JobFileError, match="Invalid JSON"):
+        load_job_file(write_job_file(tmp_path, "{", name="jobs.json"))
+    with pytest.raises(JobFileError, match="both be written"):
+        build_job_graph({'posters': [{'style': 'classic', 'name': 'North Shore'},
+                                     {'style': 'vintage', 'name': 'north_shore'}]}, pipeline)
+
+
+def test_job_names_stay_in_output_dir(tmp_path, pipeline):
+    """Names from the job file cannot steer posters or templates out of their directories"""
+    graph = build_job_graph({'posters': [{'name': '../../escape', 'prompt': 'Neon Florida map'}]}, pipeline)
+
+    (render,) = graph.renders
+    (node,) = graph.templates.values()
+    assert render.output_path == pipeline.output_dir / "escape_default.png"
+    assert node.name == 'escape'
+
+
+def test_batch_run_and_resume(tmp_path, pipeline):
+    """Every poster is built once, and a rerun finds them all done"""
+    graph = build_job_graph(load_job_file(write_job_file(tmp_path)), pipeline)
+    lines = []
+    runner = BatchRunner(pipeline, generation_concurrency=2, render_workers=2, progress=lines.append)
+
+    report = runner.run(graph)
+
+    assert (report.rendered, report.failed, report.templates_generated, report.templates_shared) == (4, 0, 3, 1)
+    assert len([line for line in lines if '✅' in line]) == 4
+    assert Image.open(pipeline.output_dir / "neon_print.jpg").size == (96, 96)
+
+    rerun = runner.run(graph)
+    assert (rerun.rendered, rerun.resumed, rerun.templates_generated) == (0, 4, 0)
+
+
+def test_renders_that_cannot_be_submitted_fail(tmp_path, pipeline, monkeypatch):
+    """A render pool refusing work fails the remaining posters instead of hanging the run"""
+    graph = build_job_graph(load_job_file(write_job_file(tmp_path)), pipeline)
+    runner = BatchRunner(pipeline, generation_concurrency=2, render_workers=2, queue_size=1,
+                         progress=lambda line: None)
+
+    def broken_pool(*args):
+        raise RuntimeError("pool is broken")
+    monkeypatch.setattr(runner, '_render_call', broken_pool)
+
+    report = runner.run(graph)
+
+    assert (report.rendered, report.failed) == (0, 4)
+    assert set(report.failures.values()) == {"pool is broken"}
+
+
+def test_cli_renders_in_processes(tmp_path, monkeypatch):
+    """The CLI builds a JSON job file with process render workers and writes a report"""
+    monkeypatch.delenv('REPLICATE_API_TOKEN', raising=False)
+    monkeypatch.setenv('POSTER_GENERATOR_BACKEND', 'local')
+    monkeypatch.setenv('POSTER_LOCAL_OUTPUT_DIR', str(tmp_path / "generated"))
+    data_path = make_synthetic_dataset(tmp_path / "breaks.json", 20)
+    job_file = write_job_file(tmp_path, json.dumps({
+        'data': str(data_path),
+        'profiles': {'small': {'width': 64, 'height': 64}},
+        'posters': [{'style': 'vintage'}, {'style': 'retro'}],
+    }), name="jobs.json")
+
+    code = main([str(job_file), '--output-dir', str(tmp_path / "build"), '--processes',
+                 '--render-workers', '2', '--report', str(tmp_path / "report.json")])
+
+    assert code == 0
+    assert json.loads((tmp_path / "report.json").read_text())['rendered'] == 2
+    assert (tmp_path / "build" / "ai_generated_posters" / "vintage_small.png").exists()
@@ -0,0 +1,114 @@
+"""
+Tests for the poster service background effects and render stats
+
+Checks that the strip-parallel effects are deterministic and match
+the whole-image reference implementations.
+"""
+
+import json
+import random
+
+from PIL import Image, ImageEnhance
+
+from services.poster import FloridaSurfBreakPosterService, PosterStyle
+
+
+def make_service(tmp_path, **kwargs):
+    """Create a poster service backed by a tiny dataset"""
+    data_path = tmp_path / "breaks.json"
+    data_path.write_text(json.dumps([
+        {"name": "Sebastian Inlet", "latitude": 27.86, "longitude": -80.45, "break_type": "Beach/jetty"},
+        {"name": "Pensacola Pier", "latitude": 30.33, "longitude": -87.14, "break_type": "Beach/pier"},
+    ]))
+    return FloridaSurfBreakPosterService(data_path=str(data_path), **kwargs)
+
+
+def make_image(width=300, height=700):
+    """Create a reproducible RGBA test image"""
+    rng = random.Random(42)
+    return Image.frombytes("RGBA", (width, height), rng.randbytes(width * height * 4))
+
+
+def test_sepia_matches_reference(tmp_path):
+    """Sepia strips match the per-pixel sepia formula"""
+    service = make_service(tmp_path)
+    image = make_image()
+
+    result = service._apply_sepia(image)
+
+    for pixel, gray in zip(result.getdata(), image.convert("L").getdata()):
+        expected = (
+            min(255, int(gray * 0.393 + gray * 0.769 + gray * 0.189)),
+            min(255, int(gray * 0.349 + gray * 0.686 + gray * 0.168)),
+            min(255, int(gray * 0.272 + gray * 0.534 + gray * 0.131)),
+            255,
+        )
+        assert pixel == expected
+
+
+def test_contrast_matches_image_enhance(tmp_path):
+    """Strip contrast uses the whole-image mean like ImageEnhance.Contrast"""
+    service = make_service(tmp_path)
+    image = make_image()
+
+    expected = ImageEnhance.Contrast(image).enhance(1.1)
+
+    assert service._add_subtle_texture(image).tobytes() == expected.tobytes()
+
+
+def test_noise_independent_of_thread_count(tmp_path):
+    """Noise output depends on the seed only, not on the worker count"""
+    image = make_image()
+
+    single = make_service(tmp_path, effect_workers=1)._add_noise(image)
+    threaded = make_service(tmp_path, effect_workers=8)._add_noise(image)
+    reseeded = make_service(tmp_path, effect_workers=8, effect_seed=7)._add_noise(image)
+
+    assert single.tobytes() == threaded.tobytes()
+    assert single.tobytes() != reseeded.tobytes()
+    assert single.getchannel("A").tobytes() == image.getchannel("A").tobytes()
+
+
+
+def test_effects_share_one_pool(tmp_path):
+    """Every effect call reuses the service's thread pool until the service is closed"""
+    service = make_service(tmp_path, effect_workers=4)
+    image = make_image()
+
+    service._add_noise(service._apply_sepia(image))
+    pool = service._effect_pool
+    service._add_noise(image)
+
+    assert pool is not None and service._effect_pool is pool
+    service.close()
+    assert service._effect_pool is None
+
+def test_noise_is_subtle(tmp_path):
+    """Roughly a tenth of the pixels change, by at most 20 levels"""
+    service = make_service(tmp_path)
+    image = Image.new("RGBA", (256, 512), (128, 128, 128, 255))
+
+    result = service._add_noise(image)
+
+    changed = [pixel for pixel in result.getdata() if pixel != (128, 128, 128, 255)]
+    assert 0.07 < len(changed) / (256 * 512) < 0.11
+    assert all(108 <= pixel[0] <= 148 and pixel[0] == pixel[1] == pixel[2] for pixel in changed)
+
+
+def test_render_stats_hook(tmp_path):
+    """generate_poster reports a per-stage timing breakdown and counters"""
+    reports = []
+    service = make_service(tmp_path, stats_hook=reports.append)
+    template = tmp_path / "template.png"
+    make_image(400, 400).save(template)
+
+    assert service.generate_poster(str(template), str(tmp_path / "poster.png"),
+                                   PosterStyle.VINTAGE, title="Timed")
+
+    stats, = reports
+    assert set(stats.stages) == {'template_load', 'background_effects', 'markers',
+                                 'labels', 'legend', 'title', 'save'}
+    assert stats.counters['breaks_placed'] == 2
+    assert stats.counters['labels_drawn'] == 5
+    assert stats.counters['pixels_processed'] == 400 * 400 * 2
+    assert stats.counters['bytes_written'] == (tmp_path / "poster.png").stat().st_size
@@ -0,0 +1,177 @@
+"""
+Tests for non-blocking predictions against a local stand-in for the Replicate API
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.predictions import PredictionClient, PredictionTimeout, WebhookReceiver, verify_webhook_signature
+from services.rate_limit import RateLimiter
+from services.replicate import FloridaMapGenerator, MapStyle
+
+
+WEBHOOK_SECRET = "whsec_" + base64.b64encode(b"test webhook key").decode()
+
+
+def signed_headers(body, timestamp=None, secret=WEBHOOK_SECRET):
+    """Headers of a webhook delivery signed the way Replicate signs them"""
+    webhook_id, timestamp = "msg_1", str(int(time.time() if timestamp is None else timestamp))
+    key = base64.b64decode(secret.split('_', 1)[1])
+    signature = hmac.new(key, f"{webhook_id}.{timestamp}.".encode() + body, hashlib.sha256).digest()
+    return {'Content-Type': 'application/json', 'webhook-id': webhook_id, 'webhook-timestamp': timestamp,
+            'webhook-signature': f"v1,{base64.b64encode(signature).decode()}"}
+
+
+@pytest.fixture
+def api():
+    """Stand-in API whose predictions succeed after `runtime` seconds, or never if it is None"""
+    state = {'predictions': {}, 'runtime': 0.2, 'requests': [], 'canceled': []}
+    lock = threading.Lock()
+
+    def snapshot(prediction):
+        if prediction['status'] == 'starting' and state['runtime'] is not None \
+                and time.monotonic() - prediction['created'] >= state['runtime']:
+            prediction.update(status='succeeded', output=[f"https://example.invalid/{prediction['id']}.png"])
+        return {key: value for key, value in prediction.items() if key not in ('created', 'webhook')}
+
+    def complete_later(prediction):
+        time.sleep(state['runtime'])
+        body = json.dumps(snapshot(prediction)).encode('utf-8')
+        request = urllib.request.Request(prediction['webhook'], data=body, method='POST',
+                                         headers=signed_headers(body))
+        urllib.request.urlopen(request).close()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(200 if self.command == 'GET' else 201)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            state['requests'].append(('POST', self.path))
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+            if self.path.endswith('/cancel'):
+                prediction = state['predictions'][self.path.split('/')[3]]
+                prediction['status'] = 'canceled'
+                state['canceled'].append(prediction['id'])
+                self._reply(snapshot(prediction))
+                return
+            with lock:
+                prediction_id = f"p{len(state['predictions'])}"
+                prediction = state['predictions'][prediction_id] = {
+                    'id': prediction_id, 'status': 'starting', 'input': body['input'],
+                    'output': None, 'error': None, 'created': time.monotonic(),
+                    'webhook': body.get('webhook'),
+                }
+            if prediction['webhook']:
+                threading.Thread(target=complete_later, args=(prediction,), daemon=True).start()
+            self._reply(snapshot(prediction))
+
+        def do_GET(self):
+            state['requests'].append(('GET', self.path))
+            self._reply(snapshot(state['predictions'][self.path.split('/')[3]]))
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    state['url'] = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_dozens_in_flight_from_one_thread(api):
+    """Many predictions run at once without a thread per prediction"""
+    client = PredictionClient('r8_test_token', base_url=api['url'])
+    threads = threading.active_count()
+
+    start = time.perf_counter()
+    handles = [client.submit('black-forest-labs/flux-schnell', {'prompt': f"map {i}"}) for i in range(30)]
+    finished = client.wait_all(handles, min_interval=0.05, max_interval=0.2)
+
+    assert time.perf_counter() - start < 2
+    assert threading.active_count() <= threads + 2
+    assert sorted(handle.id for handle in finished) == sorted(handle.id for handle in handles)
+    assert all(handle.result() == [f"https://example.invalid/{handle.id}.png"] for handle in finished)
+    assert ('POST', '/v1/models/black-forest-labs/flux-schnell/predictions') in api['requests']
+
+
+def test_timeout_cancels_prediction(api):
+    """A prediction past its timeout is canceled and raises PredictionTimeout"""
+    api['runtime'] = None
+    client = PredictionClient('r8_test_token', base_url=api['url'])
+
+    handle = client.submit('stability-ai/sdxl:abc123', {'prompt': "map"}, timeout=0.2)
+    finished, = client.wait_all([handle], min_interval=0.05)
+
+    assert api['canceled'] == [handle.id]
+    assert ('POST', '/v1/predictions') in api['requests']
+    with pytest.raises(PredictionTimeout):
+        finished.result()
+
+
+def test_webhook_completes_without_polling(api):
+    """Webhook deliveries finish handles long before the first poll is due"""
+    with WebhookReceiver(secret=WEBHOOK_SECRET) as webhook:
+        client = PredictionClient('r8_test_token', base_url=api['url'], webhook=webhook)
+        handles = [client.submit('black-forest-labs/flux-schnell', {'prompt': f"map {i}"}) for i in range(5)]
+
+        start = time.perf_counter()
+        finished = client.wait_all(handles, max_interval=30)
+
+    assert time.perf_counter() - start < 5
+    assert all(handle.status == 'succeeded' for handle in finished)
+    assert not [request for request in api['requests'] if request[0] == 'GET']
+
+
+def test_webhooks_must_be_signed_and_fresh(monkeypatch):
+    """Unsigned, forged and replayed deliveries are all refused"""
+    monkeypatch.delenv('REPLICATE_WEBHOOK_SECRET', raising=False)
+    with pytest.raises(ValueError, match="secret"):
+        WebhookReceiver()
+    assert WebhookReceiver(allow_unsigned=True).secret is None
+
+    body = b'{"id": "p0", "status": "succeeded"}'
+    assert verify_webhook_signature(WEBHOOK_SECRET, signed_headers(body), body)
+    assert not verify_webhook_signature(WEBHOOK_SECRET, signed_headers(body), body + b" ")
+    assert not verify_webhook_signature(WEBHOOK_SECRET, signed_headers(body, time.time() - 600), body)
+    assert not verify_webhook_signature(WEBHOOK_SECRET, {**signed_headers(body), 'webhook-timestamp': "soon"},
+                                        body)
+
+    with WebhookReceiver(secret=WEBHOOK_SECRET) as webhook:
+        request = urllib.request.Request(webhook.url, data=body, method='POST',
+                                         headers=signed_headers(body, time.time() - 600))
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request)
+        assert error.value.code == 401
+
+
+def test_generator_submits_and_saves_templates(api, monkeypatch, tmp_path):
+    """The map generator submits templates and saves them once their predictions finish"""
+    generator = FloridaMapGenerator(
+        api_token='r8_test_token', rate_limiter=RateLimiter(1000, burst=100),
+        prediction_client=PredictionClient('r8_test_token', base_url=api['url']),
+    )
+    monkeypatch.setattr(generator, '_download_image', lambda url, style, save_path=None: save_path)
+
+    handles = [generator.submit_map_template(style, save_path=str(tmp_path / f"{style.value}.png"))
+               for style in (MapStyle.CLASSIC, MapStyle.VINTAGE)]
+    paths = [generator.save_map_template(handle)
+             for handle in generator.predictions.poll(handles, min_interval=0.05)]
+
+    assert sorted(paths) == sorted(str(tmp_path / f"{style}.png") for style in ('classic', 'vintage'))
+    assert all('15% of image width' in prediction['input']['prompt'] for prediction in api['predictions'].values())
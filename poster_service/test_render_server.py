@@ -0,0 +1,111 @@
+"""
+Tests for the local render server
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from PIL import Image
+
+from services.poster import FloridaSurfBreakPosterService, PosterStyle
+from services.render_server import JobPriority, QueueFullError, RenderJob, RenderServer
+
+
+@pytest.fixture
+def poster_service(tmp_path):
+    data_path = tmp_path / "breaks.json"
+    data_path.write_text(json.dumps([
+        {"name": "Sebastian Inlet", "latitude": 27.86, "longitude": -80.45, "break_type": "Beach/jetty"},
+    ]))
+    return FloridaSurfBreakPosterService(data_path=str(data_path))
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    path = tmp_path / "template.png"
+    Image.new("RGB", (400, 400), (200, 220, 240)).save(path)
+    return str(path)
+
+
+def post(url, payload, content_type="application/json"):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST",
+                                     headers={"Content-Type": content_type})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_render_over_http(poster_service, template_path, tmp_path):
+    """A waiting HTTP submission returns once the poster is written"""
+    render_server = RenderServer(poster_service, workers=2, template_root=str(tmp_path),
+                                 output_root=str(tmp_path / "posters"))
+    render_server.start()
+    http_server = render_server.serve_http(port=0)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{http_server.server_address[1]}"
+
+    try:
+        status, job = post(f"{url}/render", {
+            "template": template_path,
+            "output": "poster.png",
+            "style": "vintage",
+            "title": "Test Edition",
+            "priority": "preview",
+            "wait": True,
+        })
+        assert status == 200
+        assert job["status"] == "done"
+        assert (tmp_path / "posters" / "poster.png").exists()
+
+        with urllib.request.urlopen(f"{url}/jobs/{job['id']}") as response:
+            assert json.loads(response.read())["status"] == "done"
+        with urllib.request.urlopen(f"{url}/health") as response:
+            assert json.loads(response.read())["completed"] == 1
+
+        status, body = post(f"{url}/render", {"template": template_path})
+        assert status == 400
+
+        for output in ("../escaped.png", str(tmp_path / "escaped.png")):
+            status, body = post(f"{url}/render", {"template": template_path, "output": output})
+            assert status == 400
+            assert "outside" in body["error"]
+        status, body = post(f"{url}/render", {"template": template_path, "output": "plain.png"},
+                            content_type="text/plain")
+        assert status == 415
+        assert not (tmp_path / "escaped.png").exists()
+        assert render_server.status()["completed"] == 1
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+        render_server.stop()
+
+
+def test_previews_render_before_prints(poster_service, template_path, tmp_path):
+    """Queued preview jobs are picked up ahead of earlier print jobs"""
+    render_server = RenderServer(poster_service, workers=1)
+    print_job = render_server.submit(RenderJob(template_path, str(tmp_path / "print.png")))
+    preview_job = render_server.submit(RenderJob(
+        template_path, str(tmp_path / "preview.png"),
+        style=PosterStyle.MINIMALIST, priority=JobPriority.PREVIEW
+    ))
+
+    render_server.start()
+    render_server.stop()
+
+    assert preview_job.status == print_job.status == "done"
+    assert preview_job.started_at <= print_job.started_at
+
+
+def test_backpressure_when_saturated(poster_service, template_path, tmp_path):
+    """Submissions beyond the queue bound are rejected"""
+    render_server = RenderServer(poster_service, workers=1, max_queue=1)
+    render_server.submit(RenderJob(template_path, str(tmp_path / "a.png")))
+
+    with pytest.raises(QueueFullError):
+        render_server.submit(RenderJob(template_path, str(tmp_path / "b.png")))
+    assert render_server.status()["queue_depth"] == 1
@@ -0,0 +1,129 @@
+"""
+Tests for error classification, retries, retry budgets and circuit breakers
+"""
+
+import types
+
+import pytest
+
+from services.backends import LocalBackend
+from services.rate_limit import RateLimiter
+from services.replicate import FloridaMapGenerator, MapStyle
+from services.resilience import (CircuitBreaker, CircuitOpenError, ErrorClass, RetryBudget,
+                                 RetryBudgetExhausted, RetryPolicy, call_with_retries, classify_error,
+                                 safe_to_resend)
+
+
+class HTTPError(Exception):
+    """Stand-in for an HTTP client error carrying a response"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.response = types.SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def flaky(failures, error):
+    """Function failing with error the first `failures` calls"""
+    calls = []
+
+    def function():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error
+        return 'ok'
+
+    function.calls = calls
+    return function
+
+
+def test_classify_error():
+    """Rate limits and 5xx are retryable, client errors and unknown bugs are not"""
+    assert classify_error(HTTPError(429, {'Retry-After': '7'})).error_class is ErrorClass.RATE_LIMITED
+    assert classify_error(HTTPError(429, {'Retry-After': '7'})).retry_after == 7
+    assert classify_error(HTTPError(503)).error_class is ErrorClass.TRANSIENT
+    assert classify_error(TimeoutError()).retryable
+    assert not classify_error(HTTPError(422)).retryable
+    assert not classify_error(KeyError('prompt')).retryable
+
+
+def test_retries_with_backoff_and_budget():
+    """Transient errors are retried with growing delays until the budget runs out"""
+    sleeps = []
+    policy = RetryPolicy(max_attempts=10, base_delay=1.0, max_delay=8.0)
+
+    result = call_with_retries(flaky(3, HTTPError(503)), 'test', policy, sleep=sleeps.append)
+    assert result == 'ok'
+    assert len(sleeps) == 3 and all(delay <= 2 ** retry for retry, delay in enumerate(sleeps))
+
+    budget = RetryBudget(2)
+    function = flaky(5, HTTPError(502))
+    with pytest.raises(RetryBudgetExhausted):
+        call_with_retries(function, 'test', policy, budget=budget, sleep=lambda seconds: None)
+    assert len(function.calls) == 3 and budget.remaining == 0
+
+    permanent = flaky(1, HTTPError(401))
+    with pytest.raises(HTTPError):
+        call_with_retries(permanent, 'test', policy, sleep=lambda seconds: None)
+    assert len(permanent.calls) == 1
+
+
+
+class ReadTimeout(Exception):
+    """Stand-in for a timeout waiting for the response to a request already sent"""
+
+
+class NewConnectionError(Exception):
+    """Stand-in for urllib3's failure to connect"""
+
+
+def test_non_idempotent_calls_retry_only_unsent_requests():
+    """A call that must not run twice is retried after a refusal or a failed connect, never after a lost answer"""
+    unsent = ConnectionError(NewConnectionError("connection refused"))
+    assert safe_to_resend(HTTPError(429)) and safe_to_resend(unsent)
+    assert not safe_to_resend(ReadTimeout()) and not safe_to_resend(HTTPError(503))
+
+    for error in (HTTPError(429), unsent):
+        function = flaky(1, error)
+        assert call_with_retries(function, 'test', sleep=lambda seconds: None, idempotent=False) == 'ok'
+        assert len(function.calls) == 2
+    for error in (ReadTimeout(), HTTPError(502), ConnectionError("connection reset by peer")):
+        function = flaky(1, error)
+        with pytest.raises(type(error)):
+            call_with_retries(function, 'test', sleep=lambda seconds: None, idempotent=False)
+        assert len(function.calls) == 1
+
+def test_circuit_breaker_opens_and_recovers():
+    """The breaker fails fast once open and closes after a successful trial call"""
+    now = [0.0]
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    policy = RetryPolicy(max_attempts=1)
+
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            call_with_retries(flaky(1, HTTPError(500)), 'test', policy, breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    function = flaky(0, None)
+    with pytest.raises(CircuitOpenError):
+        call_with_retries(function, 'test', policy, breaker)
+    assert not function.calls
+
+    now[0] = 10
+    assert call_with_retries(function, 'test', policy, breaker) == 'ok'
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_generator_retries_simulated_failures(tmp_path, monkeypatch):
+    """Transient backend failures no longer drop styles from a batch"""
+    monkeypatch.delenv('REPLICATE_API_TOKEN', raising=False)
+    backend = LocalBackend(output_dir=str(tmp_path / "generated"), failure_rate=0.5, seed=4)
+    generator = FloridaMapGenerator(backend=backend, rate_limiter=RateLimiter(1000, burst=100),
+                                    retry_policy=RetryPolicy(max_attempts=6, base_delay=0.001))
+    # Half the calls fail, so keep the breaker out of it
+    generator.BREAKER_FAILURE_THRESHOLD = 100
+
+    maps = generator.generate_all_styles(str(tmp_path / "maps"), width=64, height=64,
+                                         retry_budget=RetryBudget(100))
+
+    assert set(maps) == set(MapStyle)
+    assert generator.breaker('flux-schnell').state == CircuitBreaker.CLOSED
@@ -0,0 +1,104 @@
+"""
+Tests for coalescing identical concurrent render requests
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from services.poster import POSTER_REQUESTS, FloridaSurfBreakPosterService, MapBounds, PosterStyle
+from services.singleflight import CoalescingPosterService, SingleFlight, render_job_key
+
+
+def test_concurrent_calls_share_one_execution():
+    """Callers arriving while a call is in flight wait for its result"""
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "poster"
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(flight.do, "job", slow) for _ in range(8)]
+        while flight.stats()["renders_coalesced"] < 7:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert {result for result, _ in results} == {"poster"}
+    assert flight.stats() == {"renders_executed": 1, "renders_coalesced": 7, "renders_in_flight": 0}
+
+
+def test_errors_reach_every_waiter():
+    """A failed call raises in the leader and every coalesced caller"""
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError("render failed")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, "job", failing) for _ in range(3)]
+        while flight.stats()["renders_coalesced"] < 2:
+            time.sleep(0.001)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_job_key_is_canonical(tmp_path):
+    """Default bounds and output location don't change the job hash"""
+    template = tmp_path / "template.png"
+    Image.new("RGB", (64, 64)).save(template)
+    bounds = FloridaSurfBreakPosterService.DEFAULT_BOUNDS
+
+    key = render_job_key(str(template), "a.png", PosterStyle.CLASSIC, None, "Title")
+    assert key == render_job_key(str(template), "b/c.png", PosterStyle.CLASSIC, bounds, "Title")
+    assert key != render_job_key(str(template), "a.jpg", PosterStyle.CLASSIC, None, "Title")
+    assert key != render_job_key(str(template), "a.png", PosterStyle.VINTAGE, None, "Title")
+    assert key != render_job_key(str(template), "a.png", PosterStyle.CLASSIC,
+                                 MapBounds(24.5, 27.0, -82.0, -79.9), "Title")
+
+
+def test_coalescing_poster_service(tmp_path):
+    """Identical posters are written to every requested output"""
+    data_path = tmp_path / "breaks.json"
+    data_path.write_text(json.dumps([
+        {"name": "Sebastian Inlet", "latitude": 27.86, "longitude": -80.45, "break_type": "Beach/jetty"},
+    ]))
+    template = tmp_path / "template.png"
+    Image.new("RGB", (300, 300), (220, 230, 240)).save(template)
+    service = CoalescingPosterService(FloridaSurfBreakPosterService(data_path=str(data_path)))
+    counted = {outcome: POSTER_REQUESTS.value(style='classic', outcome=outcome)
+               for outcome in ('rendered', 'cached', 'coalesced', 'failed')}
+
+    outputs = [tmp_path / f"poster_{i}.png" for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(
+            lambda output: service.generate_poster(str(template), str(output), title="Burst"),
+            outputs
+        ))
+
+    assert all(results)
+    assert len({output.read_bytes() for output in outputs}) == 1
+    stats = service.stats()
+    assert stats["renders_executed"] + stats["renders_coalesced"] == 4
+    assert not service.generate_poster(str(tmp_path / "missing.png"), str(outputs[0]))
+
+    # Every request is counted, shared renders under their own outcome
+    counts = {outcome: POSTER_REQUESTS.value(style='classic', outcome=outcome) - before
+              for outcome, before in counted.items()}
+    assert counts['coalesced'] == stats["renders_coalesced"]
+    assert counts['rendered'] + counts['cached'] == stats["renders_executed"]
+    assert counts['failed'] == 1
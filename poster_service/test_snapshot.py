@@ -0,0 +1,86 @@
+"""
+Tests for the binary surf break dataset snapshot
+"""
+
+import json
+import os
+
+from services.poster import FloridaSurfBreakPosterService, SurfBreak
+from services.snapshot import BreakTable, snapshot_path_for
+
+
+BREAKS = [
+    {"name": "Sebastian Inlet", "latitude": 27.86, "longitude": -80.45, "break_type": "Beach/jetty"},
+    {"name": "Ponce Inlet", "latitude": 29.08, "longitude": -80.92, "break_type": "Beach/jetty"},
+    {"name": "Pensacola Pier", "latitude": 30.33, "longitude": -87.14, "break_type": "Beach/pier"},
+    {"name": "No Coordinates", "latitude": None, "longitude": None, "break_type": "Reef"},
+    {"name": "Café Reef", "latitude": 24.55, "longitude": -81.78},
+]
+
+
+def write_dataset(path, breaks):
+    path.write_text(json.dumps(breaks))
+    return path
+
+
+def test_snapshot_round_trip(tmp_path):
+    """A rebuilt snapshot yields the same breaks as the JSON source"""
+    data_path = write_dataset(tmp_path / "breaks.json", BREAKS)
+
+    first = FloridaSurfBreakPosterService(data_path=str(data_path))
+    assert snapshot_path_for(data_path).exists()
+    assert not isinstance(first.surf_breaks, BreakTable)
+
+    second = FloridaSurfBreakPosterService(data_path=str(data_path))
+    assert isinstance(second.surf_breaks, BreakTable)
+    assert list(second.surf_breaks) == list(first.surf_breaks)
+    assert second.surf_breaks[-1] == SurfBreak("Café Reef", 24.55, -81.78, "Unknown")
+    assert second.surf_breaks.break_types == ("Beach/jetty", "Beach/pier", "Unknown")
+
+
+def test_snapshot_rebuilt_when_source_changes(tmp_path):
+    """Editing the JSON invalidates the snapshot"""
+    data_path = write_dataset(tmp_path / "breaks.json", BREAKS)
+    FloridaSurfBreakPosterService(data_path=str(data_path))
+
+    write_dataset(data_path, BREAKS[:2])
+    os.utime(data_path, ns=(0, 0))
+
+    service = FloridaSurfBreakPosterService(data_path=str(data_path))
+    assert [b.name for b in service.surf_breaks] == ["Sebastian Inlet", "Ponce Inlet"]
+
+
+def test_snapshot_reused_when_source_only_touched(tmp_path):
+    """A new mtime with identical contents keeps the snapshot"""
+    data_path = write_dataset(tmp_path / "breaks.json", BREAKS)
+    FloridaSurfBreakPosterService(data_path=str(data_path))
+
+    os.utime(data_path, ns=(10**18, 10**18))
+
+    service = FloridaSurfBreakPosterService(data_path=str(data_path))
+    assert isinstance(service.surf_breaks, BreakTable)
+    assert len(service.surf_breaks) == 4
+
+
+def test_corrupt_snapshot_is_rebuilt(tmp_path):
+    """A snapshot with a bad header is ignored and replaced"""
+    data_path = write_dataset(tmp_path / "breaks.json", BREAKS)
+    snapshot_path_for(data_path).write_bytes(b"not a snapshot")
+
+    service = FloridaSurfBreakPosterService(data_path=str(data_path))
+    assert len(service.surf_breaks) == 4
+    assert snapshot_path_for(data_path).read_bytes().startswith(b"FLSB")
+
+
+def test_truncated_snapshot_is_rebuilt(tmp_path):
+    """A snapshot cut short is ignored and replaced instead of yielding damaged breaks"""
+    data_path = write_dataset(tmp_path / "breaks.json", BREAKS)
+    FloridaSurfBreakPosterService(data_path=str(data_path))
+    snapshot_path = snapshot_path_for(data_path)
+    intact = snapshot_path.read_bytes()
+    snapshot_path.write_bytes(intact[:-6])
+
+    service = FloridaSurfBreakPosterService(data_path=str(data_path))
+    assert not isinstance(service.surf_breaks, BreakTable)
+    assert [b.break_type for b in service.surf_breaks] == ["Beach/jetty", "Beach/jetty", "Beach/pier", "Unknown"]
+    assert snapshot_path.read_bytes() == intact
@@ -0,0 +1,130 @@
+"""
+Tests for disk budgets and LRU eviction of generated assets
+"""
+
+import os
+
+from services.catalog import POSTER, AssetCatalog
+from services.content_cache import ContentCache
+from services.storage import StorageManager
+
+
+def make_files(directory, count, size=100):
+    """Write files whose access and modification times are an hour apart, oldest first"""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = directory / f"poster_{i}.png"
+        path.write_bytes(b"x" * size)
+        os.utime(path, (1_000_000 + i * 3600, 1_000_000 + i * 3600))
+        paths.append(path)
+    return paths
+
+
+def test_evicts_least_recently_used_first(tmp_path):
+    """Files go oldest first, and a catalog access keeps a file however old it is"""
+    catalog = AssetCatalog(tmp_path / "catalog.sqlite3")
+    paths = make_files(tmp_path / "posters", 5)
+    for path in paths:
+        catalog.record(path, POSTER)
+    os.utime(paths[0], (1_000_000, 1_000_000))
+    catalog.touch(paths[0])
+    (tmp_path / "posters" / "collection_manifest.json").write_text("{}")
+
+    storage = StorageManager(catalog, min_age=0)
+    storage.add_budget(tmp_path / "posters", 300)
+
+    assert storage.enforce() == 200
+    assert [path.exists() for path in paths] == [True, False, False, True, True]
+    assert catalog.get(paths[1]) is None
+    assert catalog.totals()[POSTER] == (3, 300)
+    assert (tmp_path / "posters" / "collection_manifest.json").exists()
+    assert storage.usage() == {str((tmp_path / "posters").resolve()): (300, 300)}
+    catalog.close()
+
+
+def test_pinned_and_for_sale_files_are_kept(tmp_path):
+    """Pinned files and files marked for sale survive even an unreachable budget"""
+    catalog = AssetCatalog(tmp_path / "catalog.sqlite3")
+    paths = make_files(tmp_path / "posters", 4)
+    for path in paths:
+        catalog.record(path, POSTER)
+    catalog.mark_for_sale(paths[0])
+
+    storage = StorageManager(catalog, min_age=0)
+    storage.add_budget(tmp_path / "posters", 0)
+    with storage.pinned([paths[1]]):
+        with storage.pinned([paths[1]]):
+            pass
+        assert storage.is_pinned(paths[1])
+        storage.enforce()
+
+    assert [path.exists() for path in paths] == [True, True, False, False]
+    assert not storage.is_pinned(paths[1])
+    catalog.close()
+
+
+def test_evicts_in_batches_and_skips_fresh_files(tmp_path):
+    """A pass deletes at most batch_size files, and never one written moments ago"""
+    paths = make_files(tmp_path / "templates", 6)
+    fresh = tmp_path / "templates" / "fresh.png"
+    fresh.write_bytes(b"x" * 100)
+    cache = ContentCache(tmp_path / "cache", max_bytes=10_000, suffix=".png")
+    for i in range(3):
+        cache.put_bytes(f"{i:064x}", b"y" * 100)
+    cache.max_bytes = 100
+
+    storage = StorageManager(batch_size=2, min_age=60)
+    storage.add_budget(tmp_path / "templates", 0)
+    storage.add_cache(cache)
+
+    storage.step()
+    assert sum(path.exists() for path in paths) == 4
+    assert cache.size() == 100
+
+    storage.enforce()
+    assert not any(path.exists() for path in paths)
+    assert fresh.exists()
+
+
+def test_passes_reuse_the_last_walk(tmp_path, monkeypatch):
+    """Passes and usage reports share one walk, and passes still honour sales and uses made since it"""
+    catalog = AssetCatalog(tmp_path / "catalog.sqlite3")
+    paths = make_files(tmp_path / "posters", 6)
+    for path in paths:
+        catalog.record(path, POSTER)
+        os.utime(path, (1_000_000, 1_000_000))
+    storage = StorageManager(catalog, batch_size=1, min_age=0)
+    storage.add_budget(tmp_path / "posters", 300)
+    walks = []
+    scan = storage._scan
+
+    def counted_scan(*args):
+        walks.append(args)
+        return scan(*args)
+    monkeypatch.setattr(storage, '_scan', counted_scan)
+
+    # The files share one modification time, so the catalog's access times decide the order
+    storage.step()
+    catalog.mark_for_sale(paths[1])
+    catalog.touch(paths[2])
+    storage.step()
+    storage.step()
+    usage = storage.usage()
+
+    assert len(walks) == 1
+    assert usage == {str((tmp_path / "posters").resolve()): (300, 300)}
+    assert [path.exists() for path in paths] == [False, True, True, False, False, True]
+    catalog.close()
+
+
+def test_cache_eviction_can_be_bounded(tmp_path):
+    """A bounded eviction removes only the oldest few entries"""
+    cache = ContentCache(tmp_path / "cache", max_bytes=10_000, suffix=".png")
+    for i in range(4):
+        cache.put_bytes(f"{i:064x}", b"y" * 100)
+        os.utime(cache.path_for(f"{i:064x}"), (1_000_000 + i, 1_000_000 + i))
+    cache.max_bytes = 0
+
+    assert cache.evict(max_entries=3) == 300
+    assert [cache.path_for(f"{i:064x}").exists() for i in range(4)] == [False, False, False, True]
@@ -0,0 +1,103 @@
+"""
+Tests for caching generated map templates by their generation inputs
+"""
+
+import sys
+import types
+
+import pytest
+
+from services.backends import LocalBackend
+from services.content_cache import ContentCache
+from services.rate_limit import RateLimiter
+from services.replicate import FloridaMapGenerator, MapStyle
+
+
+@pytest.fixture
+def generator(monkeypatch, tmp_path):
+    """Map generator with a template cache and a fake replicate client that records predictions"""
+    predictions = []
+
+    def run(model, input):
+        predictions.append(input)
+        return [f"https://example.invalid/{len(predictions)}.png"]
+
+    def download(url, style, save_path=None):
+        with open(save_path, 'w') as f:
+            f.write(url)
+        return save_path
+
+    monkeypatch.setitem(sys.modules, 'replicate', types.SimpleNamespace(run=run))
+    map_generator = FloridaMapGenerator(api_token='r8_test_token', rate_limiter=RateLimiter(1000, burst=100),
+                                        template_cache=ContentCache(tmp_path / "templates", suffix=".png"))
+    monkeypatch.setattr(map_generator, '_download_image', download)
+    map_generator.model_inputs = predictions
+    return map_generator
+
+
+def test_identical_inputs_reuse_template(generator, tmp_path):
+    """A second generation with the same inputs is copied from the cache"""
+    first = generator.generate_map_template(MapStyle.VINTAGE, save_path=str(tmp_path / "a.png"), seed=7)
+    second = generator.generate_map_template(MapStyle.VINTAGE, save_path=str(tmp_path / "b.png"), seed=7)
+
+    assert len(generator.model_inputs) == 1
+    assert generator.model_inputs[0]['seed'] == 7
+    assert open(first).read() == open(second).read() == "https://example.invalid/1.png"
+
+    key = generator.template_cache_key('flux-schnell', generator.model_inputs[0]['prompt'], 1024, 1024, 7)
+    metadata = generator.template_cache.get_metadata(key)
+    assert metadata['style'] == 'vintage'
+    assert metadata['source_url'] == "https://example.invalid/1.png"
+    assert 'created_at' in metadata
+
+
+def test_changed_inputs_miss(generator, tmp_path):
+    """Seed, size and model are all part of the key"""
+    path = str(tmp_path / "map.png")
+    generator.generate_map_template(MapStyle.CLASSIC, save_path=path)
+    generator.generate_map_template(MapStyle.CLASSIC, save_path=path, seed=1)
+    generator.generate_map_template(MapStyle.CLASSIC, save_path=path, width=512)
+    generator.generate_map_template(MapStyle.CLASSIC, save_path=path, model='flux-dev')
+    generator.generate_custom_map("Neon Florida map", "neon", save_path=path)
+
+    assert len(generator.model_inputs) == 5
+
+
+def test_force_regenerate(generator, tmp_path):
+    """Forcing a regeneration runs a new prediction and replaces the cached template"""
+    path = str(tmp_path / "map.png")
+    generator.generate_custom_map("Neon Florida map", "neon", save_path=path)
+    generator.generate_custom_map("Neon Florida map", "neon", save_path=path, force_regenerate=True)
+    generator.generate_custom_map("Neon Florida map", "neon", save_path=path)
+
+    assert len(generator.model_inputs) == 2
+    assert open(path).read() == "https://example.invalid/2.png"
+
+
+def test_backends_never_share_templates(generator, tmp_path):
+    """A template the local backend made up is never a cache hit for Replicate"""
+    local = FloridaMapGenerator(backend=LocalBackend(output_dir=str(tmp_path / "generated")),
+                                template_cache=generator.template_cache)
+    local.persist_template(local.generate_map_bytes(MapStyle.VINTAGE, width=64, height=64, seed=7),
+                           str(tmp_path / "local.png"))
+    assert generator.template_cache.read_bytes(local.style_template_key(MapStyle.VINTAGE, 64, 64, seed=7))
+
+    key = generator.style_template_key(MapStyle.VINTAGE, 64, 64, seed=7)
+    assert generator.template_cache.read_bytes(key) is None
+    generator.generate_map_template(MapStyle.VINTAGE, width=64, height=64, seed=7,
+                                    save_path=str(tmp_path / "replicate.png"))
+    assert len(generator.model_inputs) == 1
+
+
+def test_failed_persist_leaves_no_temporary_file(tmp_path, monkeypatch):
+    """A template that cannot be renamed into place leaves neither it nor its temporary file"""
+    local = FloridaMapGenerator(backend=LocalBackend(output_dir=str(tmp_path / "generated")))
+    template = local.generate_map_bytes(MapStyle.VINTAGE, width=64, height=64)
+
+    def broken_replace(source, destination):
+        raise OSError("disk full")
+    monkeypatch.setattr('services.replicate.os.replace', broken_replace)
+
+    with pytest.raises(OSError, match="disk full"):
+        local.persist_template(template, str(tmp_path / "out" / "map.png"))
+    assert list((tmp_path / "out").iterdir()) == []
@@ -0,0 +1,123 @@
+"""
+Tests for pipeline tracing, trace export and the latency summary
+"""
+
+import json
+
+import pytest
+from PIL import Image
+
+from services.poster import FloridaSurfBreakPosterService, PosterStyle
+from services.tracing import (
+    JsonLinesExporter,
+    Tracer,
+    read_spans,
+    set_tracer,
+    span,
+    summarize,
+)
+
+
+class CollectingExporter:
+    """Keeps finished spans in memory"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, finished):
+        self.spans.append(finished)
+
+
+@pytest.fixture
+def exporter():
+    """Route the process-wide tracer to an in-memory exporter"""
+    collecting = CollectingExporter()
+    previous = set_tracer(Tracer([collecting]))
+    yield collecting
+    set_tracer(previous)
+
+
+def test_spans_nest_and_record_errors(exporter):
+    """Child spans share the trace and point at their parent"""
+    with span('outer', style='vintage') as outer:
+        with span('inner') as inner:
+            inner.set_attribute('bytes', 42)
+        with pytest.raises(ValueError):
+            with span('failing'):
+                raise ValueError("boom")
+
+    by_name = {finished.name: finished for finished in exporter.spans}
+    assert [finished.name for finished in exporter.spans] == ['inner', 'failing', 'outer']
+    assert by_name['inner'].trace_id == outer.trace_id
+    assert by_name['inner'].parent_id == outer.span_id
+    assert by_name['outer'].parent_id is None
+    assert by_name['inner'].attributes == {'bytes': 42}
+    assert by_name['failing'].status == 'error' and 'boom' in by_name['failing'].error
+    assert by_name['outer'].end_ns >= by_name['inner'].end_ns
+
+
+def test_disabled_tracing_records_nothing():
+    """Without exporters spans are shared no-ops"""
+    previous = set_tracer(Tracer())
+    try:
+        with span('ignored') as ignored:
+            ignored.set_attribute('bytes', 1)
+        assert not ignored.recording
+        assert ignored.attributes == {}
+    finally:
+        set_tracer(previous)
+
+
+@pytest.mark.parametrize('otlp', [False, True])
+def test_export_formats_round_trip(tmp_path, otlp):
+    """Both export formats read back into the same span records"""
+    path = tmp_path / "traces.jsonl"
+    previous = set_tracer(Tracer([JsonLinesExporter(path, otlp=otlp)]))
+    try:
+        with span('pipeline', model='flux-schnell'):
+            with span('download', bytes=1024, cached=False):
+                pass
+    finally:
+        set_tracer(previous).shutdown()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert ('resourceSpans' in lines[0]) == otlp
+
+    spans = read_spans(path)
+    assert [record['name'] for record in spans] == ['download', 'pipeline']
+    assert spans[0]['attributes'] == {'bytes': 1024, 'cached': False}
+    assert spans[0]['parent_id'] == spans[1]['span_id']
+
+
+def test_summary_percentiles():
+    """The summary reports nearest-rank percentiles per span name"""
+    spans = [{'name': 'render', 'duration_seconds': i / 100, 'status': 'ok'} for i in range(1, 101)]
+    spans.append({'name': 'download', 'duration_seconds': 2.0, 'status': 'error'})
+
+    summary = summarize(spans)
+
+    assert summary['render']['count'] == 100
+    assert summary['render']['p50'] == pytest.approx(0.50)
+    assert summary['render']['p90'] == pytest.approx(0.90)
+    assert summary['render']['p99'] == pytest.approx(0.99)
+    assert summary['download']['errors'] == 1
+
+
+def test_generate_poster_traces_render_stages(tmp_path, exporter):
+    """Poster renders emit a span per render stage under the poster span"""
+    data_path = tmp_path / "breaks.json"
+    data_path.write_text(json.dumps([
+        {"name": "Sebastian Inlet", "latitude": 27.86, "longitude": -80.45, "break_type": "Beach/jetty"},
+    ]))
+    template = tmp_path / "template.png"
+    Image.new("RGBA", (300, 300), (200, 220, 240, 255)).save(template)
+
+    service = FloridaSurfBreakPosterService(data_path=str(data_path))
+    assert service.generate_poster(str(template), str(tmp_path / "poster.png"), PosterStyle.VINTAGE)
+
+    poster_span = exporter.spans[-1]
+    assert poster_span.name == 'poster.generate_poster'
+    assert poster_span.attributes['style'] == 'vintage'
+    assert poster_span.attributes['bytes_written'] > 0
+    stages = {finished.name for finished in exporter.spans if finished.parent_id == poster_span.span_id}
+    assert {'render.template_load', 'render.background_effects', 'render.save'} <= stages